@@ -0,0 +1,130 @@
+"""
+Local stand-in for the job sites the agent applies to.
+
+Serves Ashby- and Greenhouse-style application forms (hidden resume inputs
+included), a small resume PDF for /apply-job's resume_url, and the form
+submission endpoints, counting what was submitted:
+
+    GET  /ashby/<company>             Ashby layout, resume input #_systemfield_resume
+    GET  /greenhouse/<company>        Greenhouse layout, form inside an iframe
+    GET  /resume.pdf                  resume to download
+    POST /submit/<layout>/<company>   records the submission
+    GET  /stats                       submission counts per layout
+"""
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LAYOUTS = {
+    "ashby": "ashby.html",
+    "greenhouse": "greenhouse.html",
+    "greenhouse-embed": "greenhouse_embed.html",
+}
+
+RESUME_PDF = b"""%PDF-1.4
+1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj
+2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj
+3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >> endobj
+4 0 obj << /Length 44 >> stream
+BT /F1 18 Tf 72 720 Td (Ada Lovelace) Tj ET
+endstream endobj
+trailer << /Root 1 0 R >>
+%%EOF
+"""
+
+SUBMITTED_PAGE = """<!DOCTYPE html>
+<html><head><title>Application submitted</title></head>
+<body><h1>Application submitted</h1><p>Thanks for applying to {company}.</p></body></html>
+"""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    server_version = "FixtureATS/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["resume.pdf"]:
+            return self._send(RESUME_PDF, "application/pdf")
+        if parts == ["stats"]:
+            return self._send(json.dumps(self.server.stats()).encode(), "application/json")
+        if len(parts) in (2, 3) and parts[0] in ("ashby", "greenhouse"):
+            layout = parts[0] if len(parts) == 2 else f"{parts[0]}-{parts[2]}"
+            if layout in LAYOUTS:
+                html = self.server.render(layout, company=parts[1])
+                return self._send(html.encode(), "text/html; charset=utf-8")
+        self._send(b"Not found", "text/plain", 404)
+
+    def do_POST(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if len(parts) != 3 or parts[0] != "submit":
+            return self._send(b"Not found", "text/plain", 404)
+        # A multipart part with a non-empty filename means the resume was attached
+        has_resume = b'filename="' in body and b'filename=""' not in body
+        self.server.record_submission(parts[1], has_resume)
+        page = SUBMITTED_PAGE.replace("{company}", parts[2])
+        self._send(page.encode(), "text/html; charset=utf-8")
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 8765, host: str = "127.0.0.1"):
+        super().__init__((host, port), FixtureHandler)
+        self._templates = {}
+        self._lock = threading.Lock()
+        self._submissions = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def render(self, layout: str, **values) -> str:
+        if layout not in self._templates:
+            with open(os.path.join(FIXTURES_DIR, LAYOUTS[layout]), encoding="utf-8") as f:
+                self._templates[layout] = f.read()
+        html = self._templates[layout]
+        for key, value in values.items():
+            html = html.replace("{" + key + "}", value)
+        return html
+
+    def record_submission(self, layout: str, has_resume: bool):
+        with self._lock:
+            counts = self._submissions.setdefault(layout, {"submitted": 0, "with_resume": 0})
+            counts["submitted"] += 1
+            counts["with_resume"] += int(has_resume)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {layout: dict(counts) for layout, counts in self._submissions.items()}
+
+    def start(self):
+        """
+        Serve on a daemon thread and return self.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True, name="fixture-server").start()
+        return self
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the fixture ATS pages")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = FixtureServer(args.port)
+    print(f"🧪 Fixture ATS pages on {server.base_url} (/ashby/acme, /greenhouse/acme)")
+    server.serve_forever()
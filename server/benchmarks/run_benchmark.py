@@ -0,0 +1,323 @@
+"""
+Offline end-to-end benchmark for bu.py.
+
+Starts the fixture ATS server and a bu.py server running on the stub LLM, fires
+--tasks /apply-job requests with at most --concurrency in flight, waits for
+each to finish and reports:
+
+- p50/p95/max task time (submit to done, as a client sees it)
+- per-phase breakdown from the task traces (/api/trace-phases)
+- peak RSS of the server and its Chrome processes, and peak Chrome count
+- fixture submissions, to catch runs that got faster by not applying
+
+    cd server
+    python -m benchmarks.run_benchmark --tasks 20 --concurrency 4
+
+With --baseline report.json the run fails (exit 1) when p95 task time or peak
+RSS regress by more than --max-regression.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fixture_server import FixtureServer
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_URL = "http://localhost:3001"
+FINISHED_STATUSES = {"completed", "failed"}
+
+
+def percentile(values: list, fraction: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 3)
+
+
+def _read_status(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            fields[key] = value.strip()
+    return fields
+
+
+class ProcessSampler:
+    """
+    Polls /proc for the process tree under root_pid: total RSS and how many
+    Chrome processes (and Chrome instances, i.e. browser processes with a
+    debugging port) are alive. Keeps the peaks.
+    """
+
+    def __init__(self, root_pid: int, interval: float = 0.5):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak_rss_bytes = 0
+        self.peak_chrome_processes = 0
+        self.peak_chrome_instances = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="process-sampler")
+
+    def _tree(self) -> list:
+        children = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                parent = int(_read_status(int(entry)).get("PPid", 0))
+            except (OSError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+        tree, stack = [], [self.root_pid]
+        while stack:
+            pid = stack.pop()
+            tree.append(pid)
+            stack.extend(children.get(pid, []))
+        return tree
+
+    def sample(self):
+        rss = chrome_processes = chrome_instances = 0
+        for pid in self._tree():
+            try:
+                status = _read_status(pid)
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    cmdline = f.read().replace(b"\0", b" ").decode(errors="replace")
+            except OSError:
+                continue
+            rss += int(status.get("VmRSS", "0 kB").split()[0]) * 1024
+            if "chrom" in status.get("Name", "").lower():
+                chrome_processes += 1
+                if "--remote-debugging-port" in cmdline and "--type=" not in cmdline:
+                    chrome_instances += 1
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        self.peak_chrome_processes = max(self.peak_chrome_processes, chrome_processes)
+        self.peak_chrome_instances = max(self.peak_chrome_instances, chrome_instances)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_server(env: dict, log_path: str) -> subprocess.Popen:
+    """
+    Run bu.py on the stub LLM in its own process group and wait until it answers.
+    """
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "bu.py"],
+        cwd=SERVER_DIR,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"bu.py exited with code {process.returncode}, see {log_path}")
+        try:
+            requests.get(f"{SERVER_URL}/metrics", timeout=2)
+            return process
+        except requests.RequestException:
+            time.sleep(0.5)
+    stop_server(process)
+    raise RuntimeError(f"bu.py did not start within 60s, see {log_path}")
+
+
+def stop_server(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_task(job_url: str, resume_url: str, args) -> dict:
+    """
+    Submit one application and poll it to completion. Returns its timing row.
+    """
+    payload = {
+        "job_url": job_url,
+        "resume_url": resume_url,
+        "instructions": "Benchmark run",
+        "profile": "Name: Ada Lovelace\nEmail: ada@example.com\nPhone: +1 555 0100",
+        "max_steps": args.max_steps,
+        "lean": args.lean,
+    }
+    started = time.monotonic()
+    response = requests.post(f"{SERVER_URL}/apply-job", json=payload, timeout=30)
+    response.raise_for_status()
+    task_id = response.json()["task_id"]
+    status = {}
+    deadline = started + args.task_timeout
+    while time.monotonic() < deadline:
+        status = requests.get(f"{SERVER_URL}/task-status/{task_id}", timeout=10).json()
+        if status.get("status") in FINISHED_STATUSES:
+            break
+        time.sleep(args.poll_interval)
+    else:
+        requests.post(f"{SERVER_URL}/stop-task/{task_id}", timeout=30)
+        status = dict(status, status="timeout")
+    result = status.get("result") or {}
+    return {
+        "task_id": task_id,
+        "job_url": job_url,
+        "status": status.get("status"),
+        "error": status.get("error") or result.get("error"),
+        "steps": (status.get("progress") or {}).get("steps"),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def run_benchmark(args) -> dict:
+    fixtures = FixtureServer(args.fixture_port).start()
+    env = dict(
+        os.environ,
+        AGENT_LLM_FACTORY="benchmarks.stub_llm:create_stub_llm",
+        STUB_LLM_LATENCY_MS=str(args.llm_latency_ms),
+        # Each run starts cold: plans cached by earlier runs would skew it
+        FORM_PLAN_CACHE_PATH=os.path.join(tempfile.mkdtemp(prefix="bench_"), "form_plans.json"),
+        ANONYMIZED_TELEMETRY="false",
+        PYTHONUNBUFFERED="1",
+    )
+    layouts = args.layouts.split(",")
+    job_urls = [
+        f"{fixtures.base_url}/{layouts[i % len(layouts)]}/company-{i}" for i in range(args.tasks)
+    ]
+
+    server = start_server(env, args.server_log)
+    sampler = ProcessSampler(server.pid).start()
+    started = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            tasks = list(
+                pool.map(
+                    lambda url: run_task(url, f"{fixtures.base_url}/resume.pdf", args),
+                    job_urls,
+                )
+            )
+        wall_seconds = time.monotonic() - started
+        ids = ",".join(task["task_id"] for task in tasks)
+        phases = requests.get(f"{SERVER_URL}/api/trace-phases", params={"ids": ids}, timeout=30).json()
+    finally:
+        sampler.stop()
+        stop_server(server)
+        fixtures.shutdown()
+
+    seconds = [task["seconds"] for task in tasks]
+    completed = [task for task in tasks if task["status"] == "completed" and not task["error"]]
+    return {
+        "config": {
+            "tasks": args.tasks,
+            "concurrency": args.concurrency,
+            "layouts": layouts,
+            "llm_latency_ms": args.llm_latency_ms,
+            "lean": args.lean,
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_minute": round(len(tasks) / wall_seconds * 60, 2) if wall_seconds else None,
+        "task_seconds": {
+            "p50": percentile(seconds, 0.5),
+            "p95": percentile(seconds, 0.95),
+            "max": max(seconds) if seconds else None,
+        },
+        "completed": len(completed),
+        "failed": len(tasks) - len(completed),
+        "submissions": fixtures.stats(),
+        "peak_rss_mb": round(sampler.peak_rss_bytes / 1024 / 1024, 1),
+        "peak_chrome_instances": sampler.peak_chrome_instances,
+        "peak_chrome_processes": sampler.peak_chrome_processes,
+        "phases": phases.get("phases", []),
+        "tasks": tasks,
+    }
+
+
+def find_regressions(report: dict, baseline: dict, max_regression: float) -> list:
+    checks = [
+        ("p95 task seconds", report["task_seconds"]["p95"], baseline["task_seconds"]["p95"]),
+        ("peak RSS MB", report["peak_rss_mb"], baseline["peak_rss_mb"]),
+    ]
+    return [
+        f"{name}: {current} vs baseline {previous} (+{(current / previous - 1) * 100:.0f}%)"
+        for name, current, previous in checks
+        if current and previous and current > previous * (1 + max_regression)
+    ]
+
+
+def print_summary(report: dict):
+    times = report["task_seconds"]
+    print(
+        f"📊 {report['completed']}/{report['completed'] + report['failed']} tasks completed "
+        f"in {report['wall_seconds']}s ({report['throughput_per_minute']}/min)"
+    )
+    print(f"⏱️  Task time p50 {times['p50']}s, p95 {times['p95']}s, max {times['max']}s")
+    print(
+        f"💾 Peak RSS {report['peak_rss_mb']}MB, "
+        f"{report['peak_chrome_instances']} Chrome instances "
+        f"({report['peak_chrome_processes']} processes)"
+    )
+    for phase in report["phases"][:12]:
+        share = phase["share_of_task_time"]
+        print(
+            f"   {phase['name']:<32} p50 {phase['p50_seconds']:>8}s  "
+            f"p95 {phase['p95_seconds']:>8}s  "
+            f"{'' if share is None else f'{share * 100:5.1f}%'}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /apply-job benchmark")
+    parser.add_argument("--tasks", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--layouts", default="ashby,greenhouse")
+    parser.add_argument("--llm-latency-ms", type=float, default=0)
+    parser.add_argument("--max-steps", type=int, default=25)
+    parser.add_argument("--lean", action="store_true")
+    parser.add_argument("--task-timeout", type=float, default=300)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--fixture-port", type=int, default=8765)
+    parser.add_argument("--server-log", default="benchmark-server.log")
+    parser.add_argument("--output", default="benchmark-report.json")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_summary(report)
+    print(f"📝 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.max_regression)
+        if regressions:
+            for regression in regressions:
+                print(f"❌ Regression: {regression}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
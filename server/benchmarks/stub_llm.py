@@ -0,0 +1,196 @@
+"""
+Deterministic stand-in for the agent's ChatOpenAI model.
+
+It reads the interactive elements out of the latest browser state and plays a
+fixed application script: open the job URL, fill every text field, upload the
+resume through playwright_file_upload, submit, then finish. No network calls;
+token usage is estimated from message sizes so LLM metrics still move.
+
+Selected in bu.py with AGENT_LLM_FACTORY=benchmarks.stub_llm:create_stub_llm.
+STUB_LLM_LATENCY_MS adds a fixed delay per call to model provider latency.
+"""
+
+import asyncio
+import json
+import os
+import re
+
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "0"))
+
+ELEMENT_LINE = re.compile(r"\[(\d+)\]<(\w+)([^\n]*)")
+ATTRIBUTE = re.compile(r"\b(id|name|type)=(\S+)")
+TASK_URL = re.compile(r"Please go to (\S+) and")
+RESUME_PATH = re.compile(r"use the file at: (\S+)\. Only")
+
+# First matching hint in a field's id/name decides what is typed into it
+FIELD_VALUES = [
+    ("first", "Ada"),
+    ("last", "Lovelace"),
+    ("email", "ada@example.com"),
+    ("phone", "+1 555 0100"),
+    ("linkedin", "https://www.linkedin.com/in/ada-lovelace"),
+    ("name", "Ada Lovelace"),
+]
+DEFAULT_ANSWER = "I enjoy building reliable software and would love to help the team ship."
+SKIPPED_INPUT_TYPES = {"file", "submit", "button", "hidden", "checkbox", "radio"}
+
+
+def _message_text(message) -> str:
+    try:
+        return message.text
+    except Exception:
+        return str(getattr(message, "content", "") or "")
+
+
+def _interactive_elements(state: str) -> list:
+    elements = []
+    for match in ELEMENT_LINE.finditer(state):
+        attributes = dict(ATTRIBUTE.findall(match.group(3)))
+        elements.append(
+            {
+                "index": int(match.group(1)),
+                "tag": match.group(2).lower(),
+                "key": attributes.get("id") or attributes.get("name"),
+                "type": attributes.get("type", "").lower(),
+                "line": match.group(0),
+            }
+        )
+    return elements
+
+
+def _field_value(key: str) -> str:
+    key = (key or "").lower()
+    for hint, value in FIELD_VALUES:
+        if hint in key:
+            return value
+    return DEFAULT_ANSWER
+
+
+class StubChatModel:
+    """
+    browser_use chat model protocol (model, provider, name, ainvoke) backed by
+    a fixed script. One instance per task: it remembers what it already did.
+    """
+
+    _verified_api_keys = True
+
+    def __init__(self, model: str = "stub", latency_ms: float = STUB_LLM_LATENCY_MS):
+        self.model = model
+        self.latency_ms = latency_ms
+        self.filled = set()
+        self.navigated = False
+        self.uploaded = False
+        self.submitted = False
+        self.calls = 0
+
+    @property
+    def provider(self):
+        return "stub"
+
+    @property
+    def name(self):
+        return "stub"
+
+    @property
+    def model_name(self):
+        return self.model
+
+    def next_actions(self, task: str, state: str) -> list:
+        """
+        The script's next action(s) for the current browser state.
+        """
+        if "Application submitted" in state:
+            return [{"done": {"text": "Application submitted", "success": True}}]
+        if self.submitted:
+            return [{"done": {"text": "Submitted, but no confirmation page", "success": False}}]
+
+        elements = _interactive_elements(state)
+        fields = [
+            e
+            for e in elements
+            if e["tag"] == "textarea"
+            or (e["tag"] == "input" and e["type"] not in SKIPPED_INPUT_TYPES)
+        ]
+        if not fields and not self.navigated:
+            url = TASK_URL.search(task)
+            if url:
+                self.navigated = True
+                return [{"navigate": {"url": url.group(1)}}]
+
+        for field in fields:
+            key = field["key"] or f"index-{field['index']}"
+            if key not in self.filled:
+                self.filled.add(key)
+                return [{"input": {"index": field["index"], "text": _field_value(key)}}]
+
+        resume = RESUME_PATH.search(task)
+        if resume and not self.uploaded:
+            self.uploaded = True
+            selector = "#resume" if "job_application" in state else "#_systemfield_resume"
+            return [
+                {
+                    "playwright_file_upload": {
+                        "file_path": resume.group(1),
+                        "selector": selector,
+                    }
+                }
+            ]
+
+        for element in elements:
+            if "Submit" in element["line"] and (
+                element["tag"] == "button" or element["type"] == "submit"
+            ):
+                self.submitted = True
+                return [{"click": {"index": element["index"]}}]
+
+        return [{"done": {"text": "No application form found", "success": False}}]
+
+    def complete(self, messages, output_format):
+        if output_format is None:
+            return "ok"
+        fields = getattr(output_format, "model_fields", {})
+        if "action" in fields:
+            texts = [_message_text(m) for m in messages]
+            task = "\n".join(texts)
+            state = texts[-1] if texts else ""
+            return output_format.model_validate(
+                {
+                    "evaluation_previous_goal": "Scripted step",
+                    "memory": f"Step {self.calls}",
+                    "next_goal": "Continue the application",
+                    "action": self.next_actions(task, state),
+                }
+            )
+        # Judge and other structured side calls: only required fields, benign values
+        values = {}
+        for name, field in fields.items():
+            if not field.is_required():
+                continue
+            annotation = field.annotation
+            values[name] = True if annotation is bool else 0 if annotation is int else ""
+        return output_format.model_validate(values)
+
+    async def ainvoke(self, messages, output_format=None, **kwargs):
+        self.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        completion = self.complete(messages, output_format)
+        prompt_chars = sum(len(_message_text(m)) for m in messages)
+        completion_chars = len(
+            completion if isinstance(completion, str) else json.dumps(completion.model_dump(mode="json"))
+        )
+        usage = ChatInvokeUsage(
+            prompt_tokens=prompt_chars // 4,
+            prompt_cached_tokens=0,
+            prompt_cache_creation_tokens=None,
+            prompt_image_tokens=None,
+            completion_tokens=completion_chars // 4,
+            total_tokens=(prompt_chars + completion_chars) // 4,
+        )
+        return ChatInvokeCompletion(completion=completion, usage=usage)
+
+
+def create_stub_llm(model: str = None):
+    return StubChatModel(f"stub-{model}" if model else "stub")
@@ -0,0 +1,248 @@
+"""
+Micro-benchmark for the playwright_file_upload action on large pages.
+
+Runs bu.upload_file_with_playwright (the action body, unchanged) against
+generated application pages and records, per case:
+
+- wall time, and the part of it spent in the action's fixed sleeps
+- CDP round trips: Playwright is connected to Chrome through a counting
+  DevTools proxy, the same way bu.py connects it (connect_over_cdp)
+- whether the resume input was found and the file set
+
+Cases are the cross product of page size (elements besides the form),
+layout (where the form lives) and how the resume input is hidden:
+
+    cd server
+    python -m benchmarks.upload_bench
+    python -m benchmarks.upload_bench --sizes 10000 --layouts iframe --hidden display-none
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from html import escape
+
+import aiohttp
+from aiohttp import web
+
+import bu
+
+SIZES = [100, 1000, 10000]
+LAYOUTS = ["inline", "iframe", "nested-iframe", "decoy-iframes"]
+HIDDEN = ["visible", "display-none", "visually-hidden"]
+
+HIDDEN_STYLES = {
+    "visible": "",
+    "display-none": "display: none",
+    "visually-hidden": "position: absolute; width: 1px; height: 1px; overflow: hidden; clip: rect(0 0 0 0)",
+}
+FILLER_TEXT = ["Benefits", "Our team", "Apply now", "Upload your portfolio later", "Read more", "Privacy"]
+
+
+def build_filler(elements: int) -> str:
+    """
+    `elements` button/div/span/a nodes in groups of four, a few of them with
+    upload-like text so the action's keyword scan has matches to inspect.
+    """
+    rows = []
+    for i in range(elements // 4):
+        text = FILLER_TEXT[i % len(FILLER_TEXT)]
+        rows.append(
+            f'<div class="row-{i % 7}"><span>{text} {i}</span>'
+            f'<a href="#item-{i}">Details</a><button type="button">Save {i}</button></div>'
+        )
+    return "\n".join(rows)
+
+
+def build_form(hidden: str) -> str:
+    return f"""
+<form id="application-form">
+  <label for="_systemfield_name">Name</label>
+  <input type="text" id="_systemfield_name">
+  <div class="_fileUploadContainer">
+    <button type="button" onclick="document.getElementById('_systemfield_resume').click()">Upload File</button>
+    <input type="file" id="_systemfield_resume" accept=".pdf" style="{HIDDEN_STYLES[hidden]}">
+  </div>
+  <button type="submit">Submit Application</button>
+</form>"""
+
+
+def _iframe(body: str, frame_id: str) -> str:
+    document = f"<!DOCTYPE html><html><body>{body}</body></html>"
+    return f'<iframe id="{frame_id}" srcdoc="{escape(document, quote=True)}" style="width: 100%; height: 400px"></iframe>'
+
+
+def build_page(elements: int, layout: str, hidden: str) -> str:
+    form = build_form(hidden)
+    if layout == "iframe":
+        form = _iframe(form, "application-frame")
+    elif layout == "nested-iframe":
+        form = _iframe(_iframe(form, "application-frame"), "embed-frame")
+    elif layout == "decoy-iframes":
+        decoys = "".join(_iframe(f"<p>Widget {i}</p><button>Chat</button>", f"widget-{i}") for i in range(5))
+        form = decoys + form
+    return f"""<!DOCTYPE html>
+<html><head><title>Upload benchmark {elements} {layout} {hidden}</title></head>
+<body>
+<header><h1>Software Engineer</h1></header>
+<main>{build_filler(elements)}</main>
+{form}
+</body></html>"""
+
+
+class CountingCDPProxy:
+    """
+    DevTools endpoint in front of Chrome that forwards everything and counts
+    the commands clients send (each one is a round trip to the browser).
+    """
+
+    def __init__(self, chrome_url: str):
+        self.chrome_url = chrome_url
+        self.commands = Counter()
+        self.runner = None
+        self.port = None
+
+    def reset(self) -> Counter:
+        counts, self.commands = self.commands, Counter()
+        return counts
+
+    async def version(self, request):
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"{self.chrome_url}/json/version") as response:
+                data = await response.json()
+        path = data["webSocketDebuggerUrl"].split("/devtools/", 1)[1]
+        data["webSocketDebuggerUrl"] = f"ws://localhost:{self.port}/devtools/{path}"
+        return web.json_response(data)
+
+    async def devtools(self, request):
+        client = web.WebSocketResponse(max_msg_size=0)
+        await client.prepare(request)
+        ws_url = self.chrome_url.replace("http://", "ws://") + request.path
+        async with aiohttp.ClientSession() as http:
+            async with http.ws_connect(ws_url, max_msg_size=0) as chrome:
+
+                async def to_chrome():
+                    async for message in client:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        self.commands[json.loads(message.data).get("method", "?")] += 1
+                        await chrome.send_str(message.data)
+                    await chrome.close()
+
+                async def to_client():
+                    async for message in chrome:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        await client.send_str(message.data)
+                    await client.close()
+
+                await asyncio.gather(to_chrome(), to_client(), return_exceptions=True)
+        return client
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/json/version", self.version)
+        app.router.add_get("/json/version/", self.version)
+        app.router.add_get("/devtools/{path:.*}", self.devtools)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        self.port = bu.find_available_port(9400)
+        await web.TCPSite(self.runner, "localhost", self.port).start()
+        return f"http://localhost:{self.port}"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+async def run_case(proxy: CountingCDPProxy, resume_path: str, elements: int, layout: str, hidden: str, verbose: bool) -> dict:
+    case_id = f"upload-bench-{elements}-{layout}-{hidden}"
+    await bu.playwright_page.set_content(build_page(elements, layout, hidden), wait_until="load")
+    bu.current_task_id.set(case_id)
+    with bu.traces_lock:
+        bu.task_traces.pop(case_id, None)
+    params = bu.PlaywrightFileUploadAction(file_path=resume_path, selector="#_systemfield_resume")
+
+    proxy.reset()
+    output = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(output):
+        result = await bu.upload_file_with_playwright(params, None)
+    wall = time.perf_counter() - started
+    commands = proxy.reset()
+
+    with bu.traces_lock:
+        spans = bu.task_traces.pop(case_id, {"spans": []})["spans"]
+    sleep_seconds = sum(s["end"] - s["start"] for s in spans if s["cat"] == "sleep" and s["end"])
+    return {
+        "elements": elements,
+        "layout": layout,
+        "hidden": hidden,
+        "found": not result.error,
+        "error": result.error,
+        "wall_seconds": round(wall, 3),
+        "sleep_seconds": round(sleep_seconds, 3),
+        "work_seconds": round(wall - sleep_seconds, 3),
+        "cdp_round_trips": sum(commands.values()),
+        "top_cdp_methods": dict(commands.most_common(5)),
+    }
+
+
+async def run_benchmark(args) -> list:
+    process, port = await bu.start_chrome_with_debug_port()
+    proxy = CountingCDPProxy(f"http://localhost:{port}")
+    resume = tempfile.NamedTemporaryFile(prefix="resume_", suffix=".pdf", delete=False)
+    resume.write(b"%PDF-1.4\n%%EOF\n")
+    resume.close()
+    results = []
+    try:
+        await bu.connect_playwright_to_cdp(await proxy.start())
+        for elements in args.sizes:
+            for layout in args.layouts:
+                for hidden in args.hidden:
+                    for _ in range(args.repeat):
+                        row = await run_case(proxy, resume.name, elements, layout, hidden, args.verbose)
+                        results.append(row)
+                        print(
+                            f"{elements:>6} {layout:<14} {hidden:<16} "
+                            f"{'found' if row['found'] else 'MISSED':<6} "
+                            f"wall {row['wall_seconds']:>7}s  work {row['work_seconds']:>7}s  "
+                            f"cdp {row['cdp_round_trips']:>6}"
+                        )
+    finally:
+        if bu.playwright_browser:
+            await bu.playwright_browser.close()
+        await proxy.stop()
+        process.terminate()
+        os.unlink(resume.name)
+    return results
+
+
+def _csv(value: str, cast=str) -> list:
+    return [cast(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="playwright_file_upload micro-benchmark")
+    parser.add_argument("--sizes", type=lambda v: _csv(v, int), default=SIZES)
+    parser.add_argument("--layouts", type=_csv, default=LAYOUTS)
+    parser.add_argument("--hidden", type=_csv, default=HIDDEN)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="upload-benchmark.json")
+    parser.add_argument("--verbose", action="store_true", help="show the action's own output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
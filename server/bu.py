@@ -1,4 +1,5 @@
 import asyncio
+import bisect
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify, render_template, send_file
 import logging
@@ -11,8 +12,14 @@ import requests
 import uuid
 import json
 import base64
+import contextvars
+import importlib
 import io
+import itertools
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from urllib.parse import urlparse, urljoin
 from PIL import Image
 from pydantic import BaseModel, Field
@@ -23,6 +30,7 @@ load_dotenv()
 # Check for required dependencies first - before other imports
 try:
     import aiohttp  # type: ignore
+    from aiohttp import web  # type: ignore
     from playwright.async_api import Browser, Page, async_playwright  # type: ignore
 except ImportError as e:
     print(f"❌ Missing dependencies for this example: {e}")
@@ -34,10 +42,348 @@ except ImportError as e:
 from browser_use import Agent, BrowserSession, ChatOpenAI, Tools
 from browser_use.agent.views import ActionResult
 
+from cdp_client import CDPClient, CDPError, CDPSession
+from forms import (
+    FormPlanCache,
+    compact_profile,
+    describe_step,
+    extract_plan_steps,
+    fingerprint_page,
+    has_application_form,
+    prefill_page,
+    profile_fields,
+    replay_form_plan,
+)
+from llm_replay import LLMReplayCache, ReplayChatModel
+
 # Global Playwright browser instance - shared between custom actions
 playwright_browser: Browser | None = None
 playwright_page: Page | None = None
 
+# Lean mode (/apply-job "lean": true) for unattended batch runs: smaller
+# window, no live stream, replay recording or debug captures, optionally no
+# images; only a final summary screenshot is kept
+LEAN_WINDOW_SIZE = os.getenv("LEAN_WINDOW_SIZE", "1280,800")
+lean_tasks = {}
+
+# Task the running agent belongs to; set in run_agent and inherited by its actions
+current_task_id = contextvars.ContextVar("current_task_id", default=None)
+
+
+def is_lean_task(task_id: str) -> bool:
+    return task_id in lean_tasks
+
+
+# Prometheus metrics, rendered in the text exposition format by /metrics
+metrics_registry = []
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TASK_DURATION_BUCKETS = (10, 30, 60, 120, 180, 300, 450, 600, 900, 1800, 3600)
+
+
+class Metric:
+    """
+    A labelled counter, gauge or histogram. Gauges may pass collect, a callable
+    returning {labels_dict_items_tuple: value}, evaluated at scrape time.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, buckets=None, collect=None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.buckets = tuple(buckets or LATENCY_BUCKETS)
+        self.collect = collect
+        self.values = {}
+        self._lock = threading.Lock()
+        metrics_registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            series = self.values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = dict(self.values)
+        if self.collect:
+            values.update(self.collect())
+        for key, value in sorted(values.items()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+                continue
+            for bound, count in zip(self.buckets, value):
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key + (('le', str(bound)),))} {count}"
+                )
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {value[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {value[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {value[-1]}")
+        return lines
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in key) + "}"
+
+
+@contextmanager
+def timed(metric: Metric, **labels):
+    """
+    Observe the block's duration on a histogram, labelled outcome=ok|error.
+    """
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        metric.observe(time.monotonic() - started, outcome=outcome, **labels)
+
+
+def _collect_chrome_processes():
+    running = sum(
+        1
+        for instance in list(task_chrome_instances.values())
+        if instance.get("process") and _process_alive(instance["process"])
+    )
+    return {(): running}
+
+
+def _collect_task_states():
+    with lifecycle_condition:
+        states = [lifecycle["state"] for lifecycle in task_lifecycles.values()]
+    return {(("state", state),): states.count(state) for state in TASK_LIFECYCLE_STATES}
+
+
+def _collect_live_subscribers():
+    with screencasts_lock:
+        screencasts = list(task_screencasts.values())
+    return {(): sum(len(screencast.subscribers) for screencast in screencasts)}
+
+
+TASKS_TOTAL = Metric("stapply_tasks_total", "Finished tasks by outcome.", "counter")
+TASK_DURATION_SECONDS = Metric(
+    "stapply_task_duration_seconds",
+    "Time from queueing to completion, by outcome.",
+    "histogram",
+    buckets=TASK_DURATION_BUCKETS,
+)
+TASKS_BY_STATE = Metric(
+    "stapply_tasks",
+    "Tasks per lifecycle state (queued is the queue depth; done only within TASK_RETENTION_HOURS).",
+    "gauge",
+    collect=_collect_task_states,
+)
+CHROME_LAUNCH_SECONDS = Metric(
+    "stapply_chrome_launch_seconds", "Time to locate and spawn Chrome.", "histogram"
+)
+CDP_READY_SECONDS = Metric(
+    "stapply_cdp_ready_seconds", "Time from Chrome spawn until CDP answers.", "histogram"
+)
+CHROME_LAUNCH_FAILURES = Metric(
+    "stapply_chrome_launch_failures_total", "Failed Chrome launches by reason.", "counter"
+)
+CHROME_PROCESSES = Metric(
+    "stapply_chrome_processes", "Running task Chrome processes.", "gauge",
+    collect=_collect_chrome_processes,
+)
+RESUME_DOWNLOAD_SECONDS = Metric(
+    "stapply_resume_download_seconds", "Resume download time by outcome.", "histogram"
+)
+UPLOAD_ACTION_SECONDS = Metric(
+    "stapply_upload_action_seconds", "playwright_file_upload latency by outcome.", "histogram"
+)
+LLM_CALL_SECONDS = Metric("stapply_llm_call_seconds", "Agent LLM call latency.", "histogram")
+LLM_TOKENS = Metric("stapply_llm_tokens_total", "LLM tokens by kind (input/output).", "counter")
+PROFILE_PROMPT_CHARS = Metric(
+    "stapply_profile_prompt_chars_total",
+    "Profile size per task as received (raw) and as put in the agent prompt (compact).",
+    "counter",
+)
+PREFILLED_FIELDS = Metric(
+    "stapply_prefilled_fields_total", "Inputs filled by the pre-fill pass, by field.", "counter"
+)
+BLOCKED_REQUESTS = Metric(
+    "stapply_blocked_requests_total",
+    "Third-party requests failed by the resource blocklist, by resource type.",
+    "counter",
+)
+LLM_REPLAY_LOOKUPS = Metric(
+    "stapply_llm_replay_lookups_total",
+    "Agent LLM calls answered from recordings (hit) or by the model (miss).",
+    "counter",
+)
+FORM_PLAN_LOOKUPS = Metric(
+    "stapply_form_plan_lookups_total",
+    "Form plan cache lookups by outcome (miss, needs_agent, diverged).",
+    "counter",
+)
+LIVE_STREAM_SUBSCRIBERS = Metric(
+    "stapply_live_stream_subscribers", "Connected live-stream viewers.", "gauge",
+    collect=_collect_live_subscribers,
+)
+LIVE_STREAM_FRAMES_SENT = Metric(
+    "stapply_live_stream_frames_sent_total", "Frames delivered to live viewers.", "counter"
+)
+LIVE_STREAM_FRAMES_DROPPED = Metric(
+    "stapply_live_stream_frames_dropped_total",
+    "Frames dropped from full viewer buffers.",
+    "counter",
+)
+
+
+# Per-task timeline spans, exported in Chrome trace format by /task-status/<id>/trace
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "5000"))
+task_traces = {}
+traces_lock = threading.Lock()
+
+
+def add_span(task_id: str, name: str, category: str, start: float, end: float = None, **args):
+    """
+    Record a span (epoch seconds) on the task's timeline. end=None leaves it
+    open until end_span. Returns the span, or None when not recorded.
+    """
+    if not task_id:
+        return None
+    span = {"name": name, "cat": category, "start": start, "end": end, "args": args}
+    with traces_lock:
+        trace = task_traces.setdefault(task_id, {"spans": [], "dropped": 0})
+        if len(trace["spans"]) >= TRACE_MAX_SPANS:
+            trace["dropped"] += 1
+            return None
+        trace["spans"].append(span)
+    return span
+
+
+def start_span(name: str, category: str = "phase", task_id: str = None, **args):
+    return add_span(task_id or current_task_id.get(), name, category, time.time(), **args)
+
+
+def end_span(span, **args):
+    if span is not None:
+        span["args"].update(args)
+        span["end"] = time.time()
+
+
+@contextmanager
+def trace_span(name: str, category: str = "phase", task_id: str = None, **args):
+    """
+    Time the block as a span of the given (or current) task. Spans opened inside
+    it nest under it in the trace viewer.
+    """
+    span = start_span(name, category, task_id, **args)
+    try:
+        yield span
+    except BaseException as e:
+        end_span(span, error=str(e) or type(e).__name__)
+        raise
+    else:
+        end_span(span)
+
+
+async def traced_sleep(seconds: float, name: str = "sleep"):
+    with trace_span(name, "sleep", seconds=seconds):
+        await asyncio.sleep(seconds)
+
+
+def build_chrome_trace(task_id: str):
+    """
+    The task's spans as a Chrome trace (chrome://tracing, Perfetto), or None.
+    """
+    with traces_lock:
+        trace = task_traces.get(task_id)
+        if not trace:
+            return None
+        spans = list(trace["spans"])
+        dropped = trace["dropped"]
+    now = time.time()
+    events = [
+        {"ph": "M", "name": "process_name", "pid": 1, "args": {"name": f"task {task_id}"}},
+        {"ph": "M", "name": "thread_name", "pid": 1, "tid": 1, "args": {"name": "agent"}},
+    ]
+    for span in spans:
+        end = span["end"] if span["end"] is not None else now
+        events.append(
+            {
+                "name": span["name"],
+                "cat": span["cat"],
+                "ph": "X",
+                "ts": round(span["start"] * 1e6),
+                "dur": round((end - span["start"]) * 1e6),
+                "pid": 1,
+                "tid": 1,
+                "args": {**span["args"], **({"open": True} if span["end"] is None else {})},
+            }
+        )
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"task_id": task_id, "dropped_spans": dropped},
+    }
+
+
+def summarize_trace_phases(task_ids=None) -> dict:
+    """
+    Per-span-name time totals and percentiles across tasks, with each phase's
+    share of total task time.
+    """
+    with traces_lock:
+        selected = {
+            task_id: list(trace["spans"])
+            for task_id, trace in task_traces.items()
+            if task_ids is None or task_id in task_ids
+        }
+    durations = {}
+    task_seconds = 0.0
+    for spans in selected.values():
+        for span in spans:
+            if span["end"] is None:
+                continue
+            seconds = span["end"] - span["start"]
+            durations.setdefault((span["name"], span["cat"]), []).append(seconds)
+            if span["cat"] == "task":
+                task_seconds += seconds
+
+    phases = []
+    for (name, category), values in durations.items():
+        values.sort()
+        total = sum(values)
+        phases.append(
+            {
+                "name": name,
+                "category": category,
+                "count": len(values),
+                "total_seconds": round(total, 3),
+                "mean_seconds": round(total / len(values), 3),
+                "p50_seconds": round(values[len(values) // 2], 3),
+                "p95_seconds": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "max_seconds": round(values[-1], 3),
+                "share_of_task_time": round(total / task_seconds, 4) if task_seconds else None,
+            }
+        )
+    phases.sort(key=lambda phase: phase["total_seconds"], reverse=True)
+    return {"tasks": len(selected), "task_seconds": round(task_seconds, 3), "phases": phases}
+
 
 # Custom action parameter models
 class PlaywrightFileUploadAction(BaseModel):
@@ -94,6 +440,9 @@ async def start_chrome_with_debug_port(task_id: str = None, port: int = None):
     Start Chrome with remote debugging enabled.
     Returns tuple of (Chrome process, port used).
     """
+    launch_started = time.monotonic()
+    launch_started_at = time.time()
+
     # Kill any existing Chrome instances first
     await kill_existing_chrome_instances()
 
@@ -104,9 +453,12 @@ async def start_chrome_with_debug_port(task_id: str = None, port: int = None):
     # Track the port for this task
     if task_id:
         task_chrome_instances[task_id] = {"port": port, "status": "starting"}
+        set_task_state(task_id, "launching", "Launching browser", port=port)
 
     # Create temporary directory for Chrome user data
     user_data_dir = tempfile.mkdtemp(prefix="chrome_cdp_")
+    if task_id:
+        register_task_artifact(task_id, chrome_profile_dir=user_data_dir)
 
     # Chrome launch command
     chrome_paths = [
@@ -135,8 +487,12 @@ async def start_chrome_with_debug_port(task_id: str = None, port: int = None):
                 continue
 
     if not chrome_exe:
+        CHROME_LAUNCH_FAILURES.inc(reason="not_found")
         raise RuntimeError("❌ Chrome not found. Please install Chrome or Chromium.")
 
+    lean = lean_tasks.get(task_id)
+    window_size = LEAN_WINDOW_SIZE if lean is not None else "1920,1080"
+
     # Chrome command arguments
     cmd = [
         chrome_exe,
@@ -146,21 +502,30 @@ async def start_chrome_with_debug_port(task_id: str = None, port: int = None):
         "--no-first-run",
         "--no-default-browser-check",
         "--disable-extensions",
-        "--window-size=1920,1080",  # Set viewport dimensions to match screencast
+        f"--window-size={window_size}",  # Set viewport dimensions to match screencast
         "--force-device-scale-factor=1",  # Ensure consistent scaling
         "--disable-dev-shm-usage",  # Prevent shared memory issues
         "--no-sandbox",  # Required for headless mode in some environments
         "about:blank",  # Start with blank page
         "--headless=new",  # Use new headless mode
     ]
+    if lean is not None:
+        cmd += ["--mute-audio", "--disable-background-networking"]
+        if lean.get("block_resources"):
+            cmd.append("--blink-settings=imagesEnabled=false")
 
     # Start Chrome process
     process = await asyncio.create_subprocess_exec(
         *cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
     )
+    spawned = time.monotonic()
+    spawned_at = time.time()
+    CHROME_LAUNCH_SECONDS.observe(spawned - launch_started)
+    add_span(task_id, "chrome.spawn", "chrome", launch_started_at, spawned_at)
 
     # Wait for Chrome to start and CDP to be ready
     cdp_ready = False
+    browser_ws_url = None
     for _ in range(20):  # 20 second timeout
         try:
             async with aiohttp.ClientSession() as session:
@@ -170,21 +535,45 @@ async def start_chrome_with_debug_port(task_id: str = None, port: int = None):
                 ) as response:
                     if response.status == 200:
                         cdp_ready = True
+                        browser_ws_url = (await response.json()).get(
+                            "webSocketDebuggerUrl"
+                        )
                         break
         except Exception:
             pass
         await asyncio.sleep(1)
 
     if not cdp_ready:
+        CHROME_LAUNCH_FAILURES.inc(reason="cdp_timeout")
         process.terminate()
         if task_id and task_id in task_chrome_instances:
             del task_chrome_instances[task_id]
         raise RuntimeError("❌ Chrome failed to start with CDP")
 
+    CDP_READY_SECONDS.observe(time.monotonic() - spawned)
+    add_span(task_id, "chrome.cdp_ready", "chrome", spawned_at, time.time())
+
     # Update task status
     if task_id:
         task_chrome_instances[task_id]["status"] = "running"
         task_chrome_instances[task_id]["process"] = process
+        # Follow tabs through CDP target events from the start
+        if browser_ws_url:
+            try:
+                with trace_span("chrome.track_targets", "chrome", task_id):
+                    await asyncio.to_thread(
+                        start_target_tracker, task_id, port, browser_ws_url
+                    )
+            except Exception as e:
+                print(f"⚠️  Target tracking unavailable for task {task_id}: {e}")
+            try:
+                with trace_span("chrome.block_requests", "chrome", task_id):
+                    await asyncio.to_thread(
+                        start_request_blocker, task_id, browser_ws_url
+                    )
+            except Exception as e:
+                print(f"⚠️  Request blocking unavailable for task {task_id}: {e}")
+        set_task_state(task_id, "cdp_ready", "Browser is ready", port=port)
 
     return process, port
 
@@ -225,6 +614,24 @@ async def playwright_file_upload(
     """
     Custom action that uses Playwright to upload a file to file input elements.
     """
+    started = time.monotonic()
+    span = start_span("upload", "action", file=os.path.basename(params.file_path))
+    result = None
+    try:
+        result = await upload_file_with_playwright(params, browser_session)
+        return result
+    finally:
+        outcome = "ok" if result is not None and not result.error else "error"
+        UPLOAD_ACTION_SECONDS.observe(time.monotonic() - started, outcome=outcome)
+        end_span(span, outcome=outcome)
+
+
+async def upload_file_with_playwright(
+    params: PlaywrightFileUploadAction, browser_session: BrowserSession
+):
+    """
+    Body of the playwright_file_upload action.
+    """
 
     print(f"Uploading file: {params.file_path}")
     print(f"Selector: {params.selector}")
@@ -248,27 +655,28 @@ async def playwright_file_upload(
 
         # Wait for the page to be ready and try multiple strategies
         print("⏳ Waiting for page to be ready and dynamic content to load...")
-        try:
-            await playwright_page.wait_for_load_state(
-                "networkidle", timeout=15000
-            )  # Increased timeout
-            print("✅ Page is ready (networkidle)")
-        except Exception as networkidle_error:
-            print(
-                f"⚠️  NetworkIdle timeout, trying 'domcontentloaded' instead: {networkidle_error}"
-            )
+        with trace_span("upload.wait_for_load", "wait"):
             try:
                 await playwright_page.wait_for_load_state(
-                    "domcontentloaded", timeout=5000
+                    "networkidle", timeout=15000
+                )  # Increased timeout
+                print("✅ Page is ready (networkidle)")
+            except Exception as networkidle_error:
+                print(
+                    f"⚠️  NetworkIdle timeout, trying 'domcontentloaded' instead: {networkidle_error}"
                 )
-                print("✅ Page is ready (domcontentloaded)")
-            except Exception as dom_error:
-                print(f"⚠️  DOM load also failed, continuing anyway: {dom_error}")
-                print("🔄 Proceeding without waiting for page load state...")
+                try:
+                    await playwright_page.wait_for_load_state(
+                        "domcontentloaded", timeout=5000
+                    )
+                    print("✅ Page is ready (domcontentloaded)")
+                except Exception as dom_error:
+                    print(f"⚠️  DOM load also failed, continuing anyway: {dom_error}")
+                    print("🔄 Proceeding without waiting for page load state...")
 
         # Additional wait for dynamic content to load
         print("⏳ Waiting additional time for dynamic content...")
-        await asyncio.sleep(3)  # Give more time for JavaScript to render components
+        await traced_sleep(3, "upload.sleep_dynamic_content")  # Give more time for JavaScript to render components
 
         # Try to trigger dynamic content loading with JavaScript
         print("🔄 Triggering dynamic content with JavaScript...")
@@ -303,9 +711,9 @@ async def playwright_file_upload(
             await playwright_page.evaluate(
                 "window.scrollTo(0, document.body.scrollHeight)"
             )
-            await asyncio.sleep(1)
+            await traced_sleep(1, "upload.sleep_scroll")
             await playwright_page.evaluate("window.scrollTo(0, 0)")
-            await asyncio.sleep(1)
+            await traced_sleep(1, "upload.sleep_scroll")
         except Exception as scroll_error:
             print(f"⚠️  Scrolling failed: {scroll_error}")
 
@@ -504,7 +912,7 @@ async def playwright_file_upload(
                 print("  ✅ Element clicked successfully")
 
                 # Wait a moment for any file input to appear
-                await asyncio.sleep(1)
+                await traced_sleep(1, "upload.sleep_after_click")
 
                 # Now try to find file inputs again
                 print("  🔍 Looking for file inputs after click...")
@@ -601,44 +1009,47 @@ async def playwright_file_upload(
             print(
                 "📸 Taking screenshot and saving HTML after file input search failed..."
             )
-            try:
-                # Check if page has meaningful content before taking screenshot
-                html_content = await playwright_page.content()
-                body_content = await playwright_page.evaluate(
-                    "() => document.body.innerText.trim()"
-                )
+            if is_lean_task(current_task_id.get()):
+                print("⏭️  Lean mode: skipping debug screenshot/HTML")
+            else:
+                try:
+                    # Check if page has meaningful content before taking screenshot
+                    html_content = await playwright_page.content()
+                    body_content = await playwright_page.evaluate(
+                        "() => document.body.innerText.trim()"
+                    )
 
-                if (
-                    body_content and len(body_content) > 50
-                ):  # Only screenshot if page has substantial content
-                    screenshot_path = os.path.join(os.getcwd(), "screenshots")
-                    os.makedirs(screenshot_path, exist_ok=True)
+                    if (
+                        body_content and len(body_content) > 50
+                    ):  # Only screenshot if page has substantial content
+                        screenshot_path = get_debug_screenshots_dir()
+                        os.makedirs(screenshot_path, exist_ok=True)
 
-                    failed_screenshot = os.path.join(
-                        screenshot_path, "file_input_not_found.png"
-                    )
-                    await playwright_page.screenshot(
-                        path=failed_screenshot, full_page=True
-                    )
-                    print(f"✅ Failed search screenshot saved: {failed_screenshot}")
+                        failed_screenshot = os.path.join(
+                            screenshot_path, "file_input_not_found.png"
+                        )
+                        await playwright_page.screenshot(
+                            path=failed_screenshot, full_page=True
+                        )
+                        print(f"✅ Failed search screenshot saved: {failed_screenshot}")
 
-                    # Save HTML when search fails
-                    failed_html = os.path.join(
-                        screenshot_path, "file_input_not_found.html"
-                    )
-                    with open(failed_html, "w", encoding="utf-8") as f:
-                        f.write(html_content)
-                    print(f"✅ Failed search HTML saved: {failed_html}")
-                else:
+                        # Save HTML when search fails
+                        failed_html = os.path.join(
+                            screenshot_path, "file_input_not_found.html"
+                        )
+                        with open(failed_html, "w", encoding="utf-8") as f:
+                            f.write(html_content)
+                        print(f"✅ Failed search HTML saved: {failed_html}")
+                    else:
+                        print(
+                            "⚠️  Skipping screenshot - page appears to be blank or have minimal content"
+                        )
+
+                except Exception as screenshot_error:
                     print(
-                        "⚠️  Skipping screenshot - page appears to be blank or have minimal content"
+                        f"⚠️  Failed to take failed search screenshot/HTML: {screenshot_error}"
                     )
 
-            except Exception as screenshot_error:
-                print(
-                    f"⚠️  Failed to take failed search screenshot/HTML: {screenshot_error}"
-                )
-
             return ActionResult(
                 error="No file input element found on the page. Make sure you are on a page with a file upload form."
             )
@@ -646,14 +1057,15 @@ async def playwright_file_upload(
         print("✅ File input element found")
 
         # Take a screenshot after successfully finding the file input
-        print("📸 Taking screenshot after finding file input...")
-        try:
-            screenshot_path = os.path.join(os.getcwd(), "screenshots")
-            found_screenshot = os.path.join(screenshot_path, "file_input_found.png")
-            await playwright_page.screenshot(path=found_screenshot, full_page=True)
-            print(f"✅ File input found screenshot saved: {found_screenshot}")
-        except Exception as screenshot_error:
-            print(f"⚠️  Failed to take file input found screenshot: {screenshot_error}")
+        if not is_lean_task(current_task_id.get()):
+            print("📸 Taking screenshot after finding file input...")
+            try:
+                screenshot_path = get_debug_screenshots_dir()
+                found_screenshot = os.path.join(screenshot_path, "file_input_found.png")
+                await playwright_page.screenshot(path=found_screenshot, full_page=True)
+                print(f"✅ File input found screenshot saved: {found_screenshot}")
+            except Exception as screenshot_error:
+                print(f"⚠️  Failed to take file input found screenshot: {screenshot_error}")
 
         # Set the file on the input element
         print("🔍 Step 5: Uploading file to input element...")
@@ -669,7 +1081,7 @@ async def playwright_file_upload(
         # Wait a moment for the file to be processed
         print("🔍 Step 6: Waiting for file processing...")
         print("⏳ Waiting 1 second for file to be processed...")
-        await asyncio.sleep(1)
+        await traced_sleep(1, "upload.sleep_processing")
 
         # Verify the file was set by checking the input value
         print("🔍 Verifying file upload...")
@@ -734,7 +1146,7 @@ def download_resume(resume_url: str) -> str:
         raise ValueError(f"Invalid resume URL format: {resume_url}")
 
     # Create uploads directory if it doesn't exist
-    uploads_dir = os.path.join(os.path.dirname(__file__), "uploads")
+    uploads_dir = get_uploads_dir()
     try:
         os.makedirs(uploads_dir, exist_ok=True)
     except Exception as e:
@@ -835,139 +1247,2514 @@ def cleanup_resume(file_path: str):
         print(f"⚠️  Failed to cleanup resume file: {str(e)}")
 
 
-app = Flask(__name__, template_folder="templates")
-logging.basicConfig(level=logging.INFO)
+# Artifact retention limits (overridable via environment)
+ARTIFACT_GLOBAL_BUDGET_BYTES = (
+    int(os.getenv("ARTIFACT_GLOBAL_BUDGET_MB", "2048")) * 1024 * 1024
+)
+ARTIFACT_TASK_BUDGET_BYTES = int(os.getenv("ARTIFACT_TASK_BUDGET_MB", "256")) * 1024 * 1024
+ARTIFACT_MAX_AGE_SECONDS = int(os.getenv("ARTIFACT_MAX_AGE_HOURS", "24")) * 3600
+ARTIFACT_SWEEP_INTERVAL_SECONDS = int(os.getenv("ARTIFACT_SWEEP_INTERVAL_SECONDS", "300"))
 
-# Enable CORS for all routes to allow Next.js frontend to connect
-try:
-    from flask_cors import CORS
+# Per-task artifact bookkeeping: frames dir, Chrome profile, resume and LRU timestamp
+task_artifacts = {}
+artifacts_lock = threading.RLock()
 
-    CORS(app, resources={r"/*": {"origins": "*"}})
-except ImportError:
-    print("⚠️  flask-cors not installed. Install with: pip install flask-cors")
 
-    # Add manual CORS headers as fallback
-    @app.after_request
-    def after_request(response):
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        response.headers.add(
-            "Access-Control-Allow-Headers", "Content-Type,Authorization"
-        )
-        response.headers.add(
-            "Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS"
-        )
-        return response
+def get_task_frames_dir(task_id: str) -> str:
+    """
+    Directory where screencast frames for a task are saved for replay.
+    """
+    return os.path.join(os.getcwd(), task_id)
 
 
-# Global dictionary to store active Chrome sessions
-active_sessions = {}
+def get_debug_screenshots_dir() -> str:
+    """
+    Directory where upload debug screenshots and HTML dumps are saved.
+    """
+    return os.path.join(os.getcwd(), "screenshots")
 
-# Global dictionary to track task Chrome instances and their ports
-task_chrome_instances = {}
+
+def get_uploads_dir() -> str:
+    """
+    Directory where downloaded resumes are stored while a task runs.
+    """
+    return os.path.join(os.path.dirname(__file__), "uploads")
 
 
-@app.route("/screencast/<session_id>")
-def screencast_viewer(session_id):
+def _path_size(path: str) -> int:
     """
-    Serve the minimal screenshot-based viewer HTML page for a specific session.
+    Total size in bytes of a file or directory tree (0 if it doesn't exist).
     """
-    return render_template("minimal-screenshots.html", session_id=session_id)
+    try:
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        total = 0
+        for entry in os.scandir(path):
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    total += _path_size(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+        return total
+    except OSError:
+        return 0
 
 
-@app.route("/live-stream/<session_id>")
-def live_stream_viewer(session_id):
+def _remove_path(path: str) -> int:
     """
-    Serve the minimal live streaming viewer HTML page for a specific session.
+    Delete a file or directory tree, returning the number of bytes freed.
     """
-    return render_template("minimal-live.html", session_id=session_id)
+    import shutil
 
+    size = _path_size(path)
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"⚠️  Failed to remove artifact {path}: {e}")
+        return 0
+    return size
 
-@app.route("/debug-screencast/<session_id>")
-def debug_screencast_viewer(session_id):
+
+def _is_task_id(name: str) -> bool:
+    try:
+        uuid.UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+def register_task_artifact(task_id: str, **paths):
     """
-    Serve the full debug screenshot-based viewer HTML page for a specific session.
+    Record artifact paths (frames_dir, chrome_profile_dir, resume_path) owned by a task.
     """
-    return render_template("screencast.html", session_id=session_id)
+    with artifacts_lock:
+        entry = task_artifacts.setdefault(
+            task_id,
+            {
+                "frames_dir": get_task_frames_dir(task_id),
+                "chrome_profile_dir": None,
+                "resume_path": None,
+                "frames_bytes": None,
+                "last_access": time.time(),
+                "budget_exceeded": False,
+            },
+        )
+        entry.update(paths)
+        return entry
 
 
-@app.route("/debug-live/<session_id>")
-def debug_live_stream_viewer(session_id):
+def touch_task_artifacts(task_id: str):
     """
-    Serve the full debug live streaming viewer HTML page for a specific session.
+    Mark a task's artifacts as recently used so LRU eviction keeps them longer.
     """
-    return render_template("live-screencast.html", session_id=session_id)
+    with artifacts_lock:
+        entry = task_artifacts.get(task_id)
+        if entry:
+            entry["last_access"] = time.time()
 
 
-@app.route("/replay/<session_id>")
-def replay_viewer(session_id):
+def reserve_task_frame_bytes(task_id: str, nbytes: int) -> bool:
     """
-    Serve the replay viewer HTML page for a specific session.
+    Account for a frame, thumbnail or sprite sheet about to be written. Returns
+    False once the task's per-task budget would be exceeded, in which case the
+    file must not be saved.
     """
-    return render_template("replay.html", session_id=session_id)
+    with artifacts_lock:
+        entry = task_artifacts.get(task_id) or register_task_artifact(task_id)
+        if entry["frames_bytes"] is None:
+            entry["frames_bytes"] = _path_size(entry["frames_dir"])
+        if entry["frames_bytes"] + nbytes > ARTIFACT_TASK_BUDGET_BYTES:
+            if not entry["budget_exceeded"]:
+                entry["budget_exceeded"] = True
+                print(
+                    f"⚠️  Task {task_id} reached its artifact budget ({ARTIFACT_TASK_BUDGET_BYTES / 1024 / 1024:.0f}MB), no longer saving frames"
+                )
+            return False
+        entry["frames_bytes"] += nbytes
+        entry["last_access"] = time.time()
+        return True
 
 
-@app.route("/test-screenshot")
-def test_screenshot():
+def is_task_in_flight(task_id: str) -> bool:
     """
-    Test endpoint to verify screenshot functionality works.
+    A task is in flight while its agent is running or its Chrome process is alive.
+    In-flight artifacts are never evicted.
+    """
+    if task_results.get(task_id, {}).get("status") == "running":
+        return True
+    if active_sessions.get(task_id, {}).get("status") == "starting" and (
+        task_id not in task_results
+    ):
+        return True
+    instance = task_chrome_instances.get(task_id)
+    if instance:
+        process = instance.get("process")
+        if process is None or _process_alive(process):
+            return True
+    return False
+
+
+def _process_alive(process) -> bool:
+    """
+    Whether a Chrome subprocess is still running. The asyncio returncode is not
+    updated once the task's event loop has closed, so probe the pid as well.
     """
+    if process.returncode is not None:
+        return False
     try:
-        # Check if Chrome is running
-        tabs_response = requests.get("http://localhost:9222/json/list", timeout=5)
-        if not tabs_response.ok:
-            return f"❌ Chrome DevTools not accessible on port 9222<br>Status: {tabs_response.status_code}"
+        os.kill(process.pid, 0)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+    except OSError:
+        return True
 
-        tabs = tabs_response.json()
-        if not tabs:
-            return "❌ No browser tabs found"
 
-        tab_info = f"✅ Chrome DevTools accessible<br>Found {len(tabs)} tabs:<br>"
-        for i, tab in enumerate(tabs):
-            url = tab.get("url", "No URL")
-            title = tab.get("title", "No title")
-            tab_info += f"  Tab {i + 1}: {title} - {url}<br>"
+def _discover_frame_dirs():
+    """
+    Pick up task frame directories left on disk (e.g. from a previous server run).
+    """
+    root = os.getcwd()
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir() and _is_task_id(entry.name):
+            with artifacts_lock:
+                if entry.name not in task_artifacts:
+                    register_task_artifact(
+                        entry.name, last_access=entry.stat().st_mtime
+                    )
 
-        return tab_info
 
-    except Exception as e:
-        return f"❌ Error: {str(e)}"
+def _owned_paths() -> set:
+    with artifacts_lock:
+        owned = set()
+        for entry in task_artifacts.values():
+            for key in ("chrome_profile_dir", "resume_path"):
+                if entry.get(key):
+                    owned.add(os.path.abspath(entry[key]))
+        return owned
 
 
-@app.route("/test-live-stream")
-def test_live_stream():
+def collect_artifact_usage() -> dict:
     """
-    Test endpoint to verify live streaming setup.
+    Measure disk usage of all artifact categories and per-task frame directories.
     """
-    return f"""
-    <html>
-    <body style="font-family: monospace; background: #1a1a1a; color: #fff; padding: 20px;">
-        <h2>🎥 Browser Automation Viewers</h2>
-        
-        <h3>📺 Live Viewers (Minimal UI):</h3>
-        <ul>
-            <li><a href="/live-stream/test-session" target="_blank" style="color: #4CAF50;">🔴 Live Stream (Real-time)</a></li>
-            <li><a href="/screencast/test-session" target="_blank" style="color: #2196F3;">📸 Screenshots (Fallback)</a></li>
-            <li><a href="/replay/test-session" target="_blank" style="color: #ff9800;">📹 Replay (Saved Screenshots)</a></li>
-        </ul>
-        
-        <h3>🛠️ Debug Viewers (Full UI):</h3>
-        <ul>
-            <li><a href="/debug-live/test-session" target="_blank" style="color: #4CAF50;">Live Stream Debug</a></li>
-            <li><a href="/debug-screencast/test-session" target="_blank" style="color: #2196F3;">Screenshots Debug</a></li>
-        </ul>
-        
-        <h3>🔌 APIs:</h3>
-        <ul>
-            <li><a href="/api/live-stream/test-session" target="_blank" style="color: #ff9800;">Raw Live Stream API</a></li>
-            <li><a href="/api/task-instances" target="_blank" style="color: #9c27b0;">All Task Instances</a></li>
-            <li><a href="/api/task-ready/test-session" target="_blank" style="color: #e91e63;">Task Readiness Check</a></li>
-            <li><a href="/api/task-screenshots/test-session" target="_blank" style="color: #795548;">Task Screenshots List</a></li>
-        </ul>
-        
-        <h3>✨ Features:</h3>
-        <ul style="color: #ccc; line-height: 1.6;">
-            <li>🔄 <strong>Smart Loading:</strong> Detects when browser is ready</li>
-            <li>📱 <strong>Minimal UI:</strong> Full-screen browser content only</li>
+    _discover_frame_dirs()
+    tasks = []
+    frames_total = 0
+    with artifacts_lock:
+        snapshot = list(task_artifacts.items())
+    for task_id, entry in snapshot:
+        frames_bytes = _path_size(entry["frames_dir"])
+        profile_bytes = (
+            _path_size(entry["chrome_profile_dir"]) if entry["chrome_profile_dir"] else 0
+        )
+        with artifacts_lock:
+            entry["frames_bytes"] = frames_bytes
+        frames_total += frames_bytes
+        tasks.append(
+            {
+                "task_id": task_id,
+                "frames_bytes": frames_bytes,
+                "chrome_profile_bytes": profile_bytes,
+                "last_access": entry["last_access"],
+                "in_flight": is_task_in_flight(task_id),
+                "budget_exceeded": entry["budget_exceeded"],
+            }
+        )
+
+    profile_dirs = [
+        os.path.join(tempfile.gettempdir(), name)
+        for name in os.listdir(tempfile.gettempdir())
+        if name.startswith("chrome_cdp_")
+    ]
+    categories = {
+        "frames": frames_total,
+        "debug_screenshots": _path_size(get_debug_screenshots_dir()),
+        "uploads": _path_size(get_uploads_dir()),
+        "chrome_profiles": sum(_path_size(p) for p in profile_dirs),
+    }
+    tasks.sort(key=lambda t: t["last_access"])
+    return {
+        "total_bytes": sum(categories.values()),
+        "global_budget_bytes": ARTIFACT_GLOBAL_BUDGET_BYTES,
+        "task_budget_bytes": ARTIFACT_TASK_BUDGET_BYTES,
+        "max_age_seconds": ARTIFACT_MAX_AGE_SECONDS,
+        "categories": categories,
+        "tasks": tasks,
+    }
+
+
+def sweep_artifacts() -> dict:
+    """
+    Evict artifacts: anything older than the max age first, then finished tasks'
+    frames in LRU order until usage fits the global budget. Artifacts belonging to
+    in-flight tasks are always skipped.
+    """
+    now = time.time()
+    removed = []
+    freed = 0
+
+    def evict(path, reason):
+        nonlocal freed
+        size = _remove_path(path)
+        if size:
+            freed += size
+            removed.append({"path": path, "bytes": size, "reason": reason})
+
+    _discover_frame_dirs()
+    owned = _owned_paths()
+
+    # Chrome profiles: drop those whose task has finished, plus stale orphans
+    tmp_root = tempfile.gettempdir()
+    with artifacts_lock:
+        snapshot = list(task_artifacts.items())
+    for task_id, entry in snapshot:
+        profile = entry.get("chrome_profile_dir")
+        if profile and not is_task_in_flight(task_id) and os.path.exists(profile):
+            evict(profile, "task_finished")
+            with artifacts_lock:
+                entry["chrome_profile_dir"] = None
+    for name in os.listdir(tmp_root):
+        path = os.path.join(tmp_root, name)
+        if not name.startswith("chrome_cdp_") or os.path.abspath(path) in owned:
+            continue
+        try:
+            if now - os.path.getmtime(path) > ARTIFACT_MAX_AGE_SECONDS:
+                evict(path, "orphaned")
+        except OSError:
+            continue
+
+    # Resumes and debug captures: age-based, skipping files held by running tasks
+    for directory in (get_uploads_dir(), get_debug_screenshots_dir()):
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.abspath(path) in owned:
+                continue
+            try:
+                if now - os.path.getmtime(path) > ARTIFACT_MAX_AGE_SECONDS:
+                    evict(path, "expired")
+            except OSError:
+                continue
+
+    # Task frames: expire by age, then LRU until within the global budget
+    candidates = sorted(
+        (
+            (entry["last_access"], task_id, entry)
+            for task_id, entry in snapshot
+            if not is_task_in_flight(task_id) and os.path.exists(entry["frames_dir"])
+        ),
+        key=lambda c: c[0],
+    )
+    usage = collect_artifact_usage()["total_bytes"]
+    for last_access, task_id, entry in candidates:
+        expired = now - last_access > ARTIFACT_MAX_AGE_SECONDS
+        if not expired and usage <= ARTIFACT_GLOBAL_BUDGET_BYTES:
+            break
+        size = _remove_path(entry["frames_dir"])
+        usage -= size
+        freed += size
+        removed.append(
+            {
+                "path": entry["frames_dir"],
+                "bytes": size,
+                "reason": "expired" if expired else "over_budget",
+            }
+        )
+        with artifacts_lock:
+            task_artifacts.pop(task_id, None)
+        drop_task_manifest(task_id)
+
+    if removed:
+        print(f"🧹 Artifact sweep freed {freed / 1024 / 1024:.1f}MB ({len(removed)} items)")
+    return {"freed_bytes": freed, "removed": removed}
+
+
+def start_artifact_sweeper():
+    """
+    Run sweep_artifacts and prune_finished_tasks periodically in a daemon thread.
+    """
+
+    def loop():
+        while True:
+            try:
+                sweep_artifacts()
+            except Exception as e:
+                logging.error(f"Artifact sweep failed: {str(e)}")
+            try:
+                prune_finished_tasks()
+            except Exception as e:
+                logging.error(f"Task pruning failed: {str(e)}")
+            time.sleep(ARTIFACT_SWEEP_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=loop, daemon=True, name="artifact-sweeper")
+    thread.start()
+    return thread
+
+
+# Saved frames never change, so browsers may cache them for a year
+FRAME_CACHE_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+# In-memory index of saved frames per task, kept in sync as frames are written
+task_frame_manifests = {}
+manifests_lock = threading.Lock()
+
+
+def _parse_frame_number(filename: str):
+    if not (filename.startswith("screenshot_") and filename.endswith(".png")):
+        return None
+    try:
+        return int(filename[len("screenshot_") : -len(".png")])
+    except ValueError:
+        return None
+
+
+def frame_urls(task_id: str, filename: str, number: int, generation: str) -> dict:
+    """
+    URLs of a frame and its thumbnail. Frame numbers restart after eviction, so
+    the manifest generation is part of the URL: a cached URL never changes content.
+    """
+    return {
+        "url": f"/api/task-screenshots/{task_id}/{filename}?g={generation}",
+        "thumbnail_url": f"/api/task-screenshots/{task_id}/thumbs/{number}?g={generation}",
+    }
+
+
+def get_task_manifest(task_id: str, create: bool = False) -> dict:
+    """
+    Return the frame manifest for a task, building it from disk only the first
+    time a task is seen (e.g. frames recorded before a server restart).
+    Tasks without a frames directory get an uncached empty manifest unless
+    create is set.
+    """
+    with manifests_lock:
+        manifest = task_frame_manifests.get(task_id)
+        if manifest is not None:
+            return manifest
+
+        frames = []
+        screenshots_dir = get_task_frames_dir(task_id)
+        exists = os.path.isdir(screenshots_dir)
+        generation = uuid.uuid4().hex[:8] if exists or create else "empty"
+        if exists:
+            for entry in os.scandir(screenshots_dir):
+                number = _parse_frame_number(entry.name)
+                if number is None:
+                    continue
+                file_stat = entry.stat()
+                frames.append(
+                    {
+                        "filename": entry.name,
+                        "number": number,
+                        "size": file_stat.st_size,
+                        "created": file_stat.st_mtime,
+                        **frame_urls(task_id, entry.name, number, generation),
+                    }
+                )
+            frames.sort(key=lambda x: x["number"])
+
+        manifest = {
+            "frames": frames,
+            "numbers": [f["number"] for f in frames],
+            "next_number": frames[-1]["number"] + 1 if frames else 1,
+            "generation": generation,
+        }
+        if exists or create:
+            task_frame_manifests[task_id] = manifest
+        return manifest
+
+
+def record_task_frame(task_id: str, image_data: bytes):
+    """
+    Save a screencast frame for replay and append it to the task's manifest.
+    The frame is written under a temporary name first; its number is allocated,
+    the file renamed into place and the entry appended in one step under
+    manifests_lock, so frames are listed in number order and a client polling
+    with ?since=<last frame> never skips one written by a slower writer.
+    Returns the manifest entry, or None if the frame was not saved.
+    """
+    if not reserve_task_frame_bytes(task_id, len(image_data)):
+        return None
+
+    manifest = get_task_manifest(task_id, create=True)
+    screenshots_dir = get_task_frames_dir(task_id)
+    tmp_path = os.path.join(screenshots_dir, f"frame.{uuid.uuid4().hex}.tmp")
+    try:
+        os.makedirs(screenshots_dir, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(image_data)
+        with manifests_lock:
+            number = manifest["next_number"]
+            filename = f"screenshot_{number}.png"
+            os.replace(tmp_path, os.path.join(screenshots_dir, filename))
+            manifest["next_number"] += 1
+            entry = {
+                "filename": filename,
+                "number": number,
+                "size": len(image_data),
+                "created": time.time(),
+                **frame_urls(task_id, filename, number, manifest["generation"]),
+            }
+            manifest["numbers"].append(number)
+            manifest["frames"].append(entry)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+    schedule_frame_preview(task_id, number, image_data)
+    return entry
+
+
+def drop_task_manifest(task_id: str):
+    """
+    Forget a task's manifest (called when its frames are evicted from disk).
+    """
+    with manifests_lock:
+        task_frame_manifests.pop(task_id, None)
+
+
+# Low-resolution previews for replay scrubbing, generated off the request path
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "160"))
+THUMBNAIL_HEIGHT = int(os.getenv("THUMBNAIL_HEIGHT", "90"))
+SPRITE_SEGMENT_FRAMES = int(os.getenv("SPRITE_SEGMENT_FRAMES", "50"))
+SPRITE_COLUMNS = 10
+
+preview_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("THUMBNAIL_WORKERS", "1")),
+    thread_name_prefix="frame-previews",
+)
+
+
+def get_thumbnail_path(task_id: str, number: int) -> str:
+    return os.path.join(get_task_frames_dir(task_id), "thumbs", f"thumb_{number}.jpg")
+
+
+def get_sprite_path(task_id: str, segment: int) -> str:
+    return os.path.join(
+        get_task_frames_dir(task_id), "sprites", f"sprite_{segment}.jpg"
+    )
+
+
+def generate_thumbnail(task_id: str, number: int, image_data: bytes = None):
+    """
+    Write a JPEG thumbnail for a saved frame, letterboxed to the sprite cell size.
+    Returns the thumbnail path, or None if the source frame is missing or the
+    task's artifact budget is used up.
+    """
+    thumb_path = get_thumbnail_path(task_id, number)
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    if image_data is None:
+        frame_path = os.path.join(
+            get_task_frames_dir(task_id), f"screenshot_{number}.png"
+        )
+        if not os.path.exists(frame_path):
+            return None
+        with open(frame_path, "rb") as f:
+            image_data = f.read()
+
+    with Image.open(io.BytesIO(image_data)) as image:
+        image = image.convert("RGB")
+        image.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT), Image.BILINEAR)
+        cell = Image.new("RGB", (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT))
+        cell.paste(
+            image,
+            (
+                (THUMBNAIL_WIDTH - image.width) // 2,
+                (THUMBNAIL_HEIGHT - image.height) // 2,
+            ),
+        )
+
+    buffer = io.BytesIO()
+    cell.save(buffer, "JPEG", quality=70)
+    if not reserve_task_frame_bytes(task_id, buffer.tell()):
+        return None
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+    tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+
+def segment_frame_numbers(segment: int) -> range:
+    start = segment * SPRITE_SEGMENT_FRAMES + 1
+    return range(start, start + SPRITE_SEGMENT_FRAMES)
+
+
+def segment_frame_count(manifest: dict, segment: int) -> int:
+    """
+    How many of the segment's frames are in the manifest. A segment is complete
+    only when all are; the latest segment fills up as frames arrive. Caller
+    must hold manifests_lock.
+    """
+    numbers = segment_frame_numbers(segment)
+    return bisect.bisect_right(manifest["numbers"], numbers[-1]) - bisect.bisect_left(
+        manifest["numbers"], numbers[0]
+    )
+
+
+def build_sprite_sheet(task_id: str, segment: int) -> bytes:
+    """
+    Compose the thumbnails of one segment into a grid sprite sheet (JPEG bytes).
+    Complete segments are persisted to disk; partial ones are built on demand.
+    """
+    sprite_path = get_sprite_path(task_id, segment)
+    if os.path.exists(sprite_path):
+        with open(sprite_path, "rb") as f:
+            return f.read()
+
+    numbers = segment_frame_numbers(segment)
+    rows = -(-SPRITE_SEGMENT_FRAMES // SPRITE_COLUMNS)
+    sheet = Image.new(
+        "RGB", (SPRITE_COLUMNS * THUMBNAIL_WIDTH, rows * THUMBNAIL_HEIGHT)
+    )
+    manifest = get_task_manifest(task_id)
+    with manifests_lock:
+        available = set(manifest["numbers"])
+        complete = segment_frame_count(manifest, segment) == len(numbers)
+
+    for slot, number in enumerate(numbers):
+        if number not in available:
+            continue
+        thumb_path = generate_thumbnail(task_id, number)
+        if not thumb_path:
+            continue
+        with Image.open(thumb_path) as thumb:
+            sheet.paste(
+                thumb,
+                (
+                    (slot % SPRITE_COLUMNS) * THUMBNAIL_WIDTH,
+                    (slot // SPRITE_COLUMNS) * THUMBNAIL_HEIGHT,
+                ),
+            )
+
+    buffer = io.BytesIO()
+    sheet.save(buffer, "JPEG", quality=70)
+    data = buffer.getvalue()
+    # Over budget, the sheet is still served, just rebuilt on every request
+    if complete and reserve_task_frame_bytes(task_id, len(data)):
+        os.makedirs(os.path.dirname(sprite_path), exist_ok=True)
+        tmp_path = f"{sprite_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, sprite_path)
+    return data
+
+
+def schedule_frame_preview(task_id: str, number: int, image_data: bytes):
+    """
+    Queue thumbnail generation for a newly recorded frame, and the segment's
+    sprite sheet once its last frame has arrived.
+    """
+
+    def work():
+        try:
+            generate_thumbnail(task_id, number, image_data)
+            if number % SPRITE_SEGMENT_FRAMES == 0:
+                build_sprite_sheet(task_id, number // SPRITE_SEGMENT_FRAMES - 1)
+        except Exception as e:
+            logging.warning(f"Preview generation failed for {task_id}#{number}: {e}")
+
+    preview_executor.submit(work)
+
+
+# Task lifecycle: queued -> launching -> cdp_ready -> navigating -> running -> done.
+# Transitions are pushed to /api/task-events and long-polling /api/task-ready
+# waiters, so readiness never has to be probed from Chrome.
+# Coroutines (async serving mode) waiting on lifecycle/progress updates,
+# keyed by (channel, task_id). Publishers run on arbitrary threads, so each
+# waiter is woken through its own event loop.
+async_waiters = {}
+async_waiters_lock = threading.Lock()
+
+
+def notify_async_waiters(channel: str, task_id: str):
+    """
+    Wake every coroutine waiting on a task's channel.
+    """
+    with async_waiters_lock:
+        waiters = list(async_waiters.get((channel, task_id), ()))
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # Loop already closed
+
+
+async def wait_async(channel: str, task_id: str, check, timeout: float):
+    """
+    Await until check() returns something truthy (or timeout), re-checking
+    each time the channel is notified. Returns the last check() result.
+    """
+    loop = asyncio.get_running_loop()
+    event = asyncio.Event()
+    key = (channel, task_id)
+    waiter = (loop, event)
+    with async_waiters_lock:
+        async_waiters.setdefault(key, set()).add(waiter)
+    try:
+        deadline = loop.time() + timeout
+        while True:
+            event.clear()
+            result = check()
+            remaining = deadline - loop.time()
+            if result or remaining <= 0:
+                return result
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with async_waiters_lock:
+            waiters = async_waiters.get(key)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del async_waiters[key]
+
+
+TASK_LIFECYCLE_STATES = (
+    "queued",
+    "launching",
+    "cdp_ready",
+    "navigating",
+    "running",
+    "done",
+)
+BROWSER_READY_STATES = ("cdp_ready", "navigating", "running")
+task_lifecycles = {}
+lifecycle_condition = threading.Condition()
+
+
+def set_task_state(task_id: str, state: str, message: str = None, **details):
+    """
+    Move a task to a new lifecycle state and wake everyone waiting on it.
+    "done" is terminal; later transitions are ignored.
+    """
+    with lifecycle_condition:
+        lifecycle = task_lifecycles.setdefault(
+            task_id, {"state": None, "version": 0, "history": []}
+        )
+        if lifecycle["state"] == "done" or lifecycle["state"] == state:
+            return
+        lifecycle["version"] += 1
+        lifecycle["state"] = state
+        lifecycle["history"].append(
+            {
+                "state": state,
+                "message": message,
+                "timestamp": time.time(),
+                "version": lifecycle["version"],
+                **details,
+            }
+        )
+        lifecycle_condition.notify_all()
+        started_at = lifecycle["history"][0]["timestamp"]
+    notify_async_waiters("lifecycle", task_id)
+    mark_task_changed(task_id)
+    if state == "done":
+        outcome = details.get("outcome", "unknown")
+        TASKS_TOTAL.inc(outcome=outcome)
+        TASK_DURATION_SECONDS.observe(time.time() - started_at, outcome=outcome)
+
+
+def wait_for_task_state(task_id: str, after_version: int, timeout: float):
+    """
+    Block until the task's lifecycle version exceeds after_version (or timeout)
+    and return the transitions since then.
+    """
+    deadline = time.time() + timeout
+    with lifecycle_condition:
+        while True:
+            lifecycle = task_lifecycles.get(task_id)
+            if lifecycle and lifecycle["version"] > after_version:
+                return [e for e in lifecycle["history"] if e["version"] > after_version]
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return []
+            lifecycle_condition.wait(remaining)
+
+
+async def wait_for_task_state_async(task_id: str, after_version: int, timeout: float):
+    """
+    Coroutine counterpart of wait_for_task_state for the async server.
+    """
+    return await wait_async(
+        "lifecycle",
+        task_id,
+        lambda: wait_for_task_state(task_id, after_version, 0),
+        timeout,
+    )
+
+
+def describe_task_readiness(task_id: str) -> dict:
+    """
+    Readiness payload derived purely from the lifecycle state machine.
+    """
+    with lifecycle_condition:
+        lifecycle = task_lifecycles.get(task_id)
+        if not lifecycle:
+            return {
+                "ready": False,
+                "status": "not_started",
+                "state": None,
+                "version": 0,
+                "message": "Browser is starting up...",
+            }
+        last = lifecycle["history"][-1]
+        state = lifecycle["state"]
+        version = lifecycle["version"]
+
+    if state in BROWSER_READY_STATES:
+        ready, status, message = True, "ready", "Browser is ready"
+    elif state == "done":
+        # The browser stays viewable after the agent finishes unless it was torn down
+        ready = task_id in task_chrome_instances
+        status = "ready" if ready else last.get("outcome", "done")
+        message = "Browser is ready" if ready else "Task has finished"
+    else:
+        ready, status, message = False, state, "Browser is starting up..."
+
+    return {
+        "ready": ready,
+        "status": status,
+        "state": state,
+        "version": version,
+        "outcome": last.get("outcome"),
+        "message": message,
+    }
+
+
+def build_lifecycle_events(task_id: str, transitions: list):
+    """
+    SSE payloads for a batch of transitions. Intermediate transitions report
+    readiness from their own state; the last one uses the task's current readiness.
+    Returns (events, done).
+    """
+    readiness = describe_task_readiness(task_id)
+    events = []
+    for transition in transitions:
+        if transition is transitions[-1]:
+            ready, status = readiness["ready"], readiness["status"]
+        else:
+            ready = transition["state"] in BROWSER_READY_STATES
+            status = "ready" if ready else transition["state"]
+        events.append({"type": "lifecycle", **transition, "ready": ready, "status": status})
+    return events, readiness["state"] == "done"
+
+
+# Shared by the Flask and aiohttp versions of the readiness and event routes;
+# those only differ in how they wait and write
+TASK_EVENTS_WAIT_SECONDS = 15
+TASK_READY_MAX_WAIT_SECONDS = 60
+
+
+def keepalive_event() -> dict:
+    return {"type": "keepalive", "timestamp": time.time()}
+
+
+def is_task_known(task_id: str) -> bool:
+    with lifecycle_condition:
+        return task_id in task_lifecycles
+
+
+def task_ready_wait(version, wait) -> float:
+    """
+    How long /api/task-ready long-polls: only with a version to wait past,
+    and at most TASK_READY_MAX_WAIT_SECONDS.
+    """
+    if version is None or not wait or wait <= 0:
+        return 0
+    return min(wait, TASK_READY_MAX_WAIT_SECONDS)
+
+
+def lifecycle_stream_round(task_id: str, version: int, transitions: list) -> tuple:
+    """
+    One round of /api/task-events after waiting past version. Returns
+    (payloads to send, new version, whether the stream ends). The stream also
+    ends if the task is forgotten while it waits.
+    """
+    if not transitions:
+        return [keepalive_event()], version, not is_task_known(task_id)
+    events, done = build_lifecycle_events(task_id, transitions)
+    return events, transitions[-1]["version"], done
+
+
+# Step-level agent progress, kept in a bounded ring buffer per task
+AGENT_PROGRESS_BUFFER_SIZE = int(os.getenv("AGENT_PROGRESS_BUFFER_SIZE", "200"))
+task_progress = {}
+progress_condition = threading.Condition()
+
+
+def _get_task_progress(task_id: str) -> dict:
+    # Caller must hold progress_condition
+    return task_progress.setdefault(
+        task_id,
+        {
+            "events": deque(maxlen=AGENT_PROGRESS_BUFFER_SIZE),
+            "seq": 0,
+            "steps": 0,
+            "llm_calls": 0,
+            "llm_latency_ms": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "models": {},
+            "model": None,
+            "current_step": None,
+        },
+    )
+
+
+def publish_progress_event(task_id: str, event: dict) -> dict:
+    """
+    Append an event to the task's ring buffer and wake stream subscribers.
+    """
+    with progress_condition:
+        progress = _get_task_progress(task_id)
+        progress["seq"] += 1
+        event = {"seq": progress["seq"], "timestamp": time.time(), **event}
+        progress["events"].append(event)
+        progress_condition.notify_all()
+    notify_async_waiters("progress", task_id)
+    if event["type"] == "step":
+        mark_task_changed(task_id)
+    return event
+
+
+def record_llm_call(task_id: str, latency_ms: float, usage, model: str = None):
+    """
+    Attribute one LLM call (latency and token usage) to the task's current step
+    and to the model that answered it.
+    """
+    input_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    output_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_CALL_SECONDS.observe(latency_ms / 1000)
+    now = time.time()
+    add_span(
+        task_id,
+        "llm.call",
+        "llm",
+        now - latency_ms / 1000,
+        now,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        model=model,
+    )
+    LLM_TOKENS.inc(input_tokens, kind="input", model=model or "unknown")
+    LLM_TOKENS.inc(output_tokens, kind="output", model=model or "unknown")
+    with progress_condition:
+        progress = _get_task_progress(task_id)
+        progress["llm_calls"] += 1
+        progress["llm_latency_ms"] += latency_ms
+        progress["input_tokens"] += input_tokens
+        progress["output_tokens"] += output_tokens
+        if model:
+            per_model = progress["models"].setdefault(
+                model, {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0}
+            )
+            per_model["llm_calls"] += 1
+            per_model["input_tokens"] += input_tokens
+            per_model["output_tokens"] += output_tokens
+        step = progress["current_step"]
+        if step is not None:
+            step["llm_calls"] += 1
+            step["llm_latency_ms"] += latency_ms
+            step["input_tokens"] += input_tokens
+            step["output_tokens"] += output_tokens
+
+
+def get_progress_events(task_id: str, after_seq: int = 0) -> list:
+    with progress_condition:
+        progress = task_progress.get(task_id)
+        if not progress:
+            return []
+        return [e for e in progress["events"] if e["seq"] > after_seq]
+
+
+def wait_for_progress(task_id: str, after_seq: int, timeout: float) -> list:
+    """
+    Block until events newer than after_seq exist (or timeout) and return them.
+    """
+    deadline = time.time() + timeout
+    with progress_condition:
+        while True:
+            events = get_progress_events(task_id, after_seq)
+            if events:
+                return events
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return []
+            progress_condition.wait(remaining)
+
+
+async def wait_for_progress_async(task_id: str, after_seq: int, timeout: float) -> list:
+    """
+    Coroutine counterpart of wait_for_progress for the async server.
+    """
+    return await wait_async(
+        "progress", task_id, lambda: get_progress_events(task_id, after_seq), timeout
+    )
+
+
+def progress_stream_cursor(last_event_id, since) -> int:
+    """
+    Where /task-status/<id>/events resumes: Last-Event-ID on a reconnect,
+    else ?since=<seq>, else the start of the buffer.
+    """
+    for value in (last_event_id, since):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def progress_stream_round(task_id: str, seq: int, events: list) -> tuple:
+    """
+    One round of /task-status/<id>/events after waiting past seq. Returns
+    ([(event id or None, payload)], new seq, whether the stream ends).
+    """
+    messages = [(event["seq"], event) for event in events]
+    if events:
+        seq = events[-1]["seq"]
+    if task_lifecycles.get(task_id, {}).get("state") == "done":
+        # Flush anything published while the task was finishing
+        for event in get_progress_events(task_id, seq):
+            messages.append((event["seq"], event))
+            seq = event["seq"]
+        messages.append((None, {"type": "done", "status": task_results.get(task_id, {}).get("status")}))
+        return messages, seq, True
+    if not events:
+        messages.append((None, keepalive_event()))
+    return messages, seq, False
+
+
+def summarize_task_progress(task_id: str):
+    """
+    Compact progress totals for /task-status responses.
+    """
+    with progress_condition:
+        progress = task_progress.get(task_id)
+        if not progress:
+            return None
+        last_step = next(
+            (e for e in reversed(progress["events"]) if e["type"] == "step"), None
+        )
+        return {
+            "steps": progress["steps"],
+            "llm_calls": progress["llm_calls"],
+            "llm_latency_ms": round(progress["llm_latency_ms"], 1),
+            "input_tokens": progress["input_tokens"],
+            "output_tokens": progress["output_tokens"],
+            "model": progress["model"],
+            "models": {model: dict(usage) for model, usage in progress["models"].items()},
+            "last_step": last_step,
+            "last_seq": progress["seq"],
+            "prefilled": progress.get("prefilled"),
+            "llm_replay": progress.get("llm_replay"),
+            "blocked": progress.get("blocked"),
+            "form_plan": progress.get("form_plan"),
+            "budget": summarize_task_budget(task_id, progress),
+        }
+
+
+# Per-task budgets; 0 means unlimited. /apply-job "budget": {"max_tokens",
+# "max_seconds"} overrides the defaults per task. The step cap is agent.run's
+# own max_steps
+TASK_MAX_TOKENS = int(os.getenv("TASK_MAX_TOKENS", "0"))
+TASK_MAX_SECONDS = float(os.getenv("TASK_MAX_SECONDS", "0"))
+task_budgets = {}
+
+
+def parse_task_budget(budget) -> dict:
+    """
+    Validate a {"max_tokens": int, "max_seconds": number} override. Raises ValueError.
+    """
+    if not isinstance(budget, dict):
+        raise ValueError("budget must be an object")
+    parsed = {}
+    for key, value in budget.items():
+        if key not in ("max_tokens", "max_seconds"):
+            raise ValueError(f"Unknown budget setting: {key}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"budget.{key} must be a non-negative number")
+        parsed[key] = int(value) if key == "max_tokens" else float(value)
+    return parsed
+
+
+def start_task_budget(task_id: str) -> dict:
+    """
+    Fix the task's limits and start its clock (called when the agent run begins).
+    """
+    budget = {
+        "max_tokens": TASK_MAX_TOKENS,
+        "max_seconds": TASK_MAX_SECONDS,
+        **task_budgets.get(task_id, {}),
+    }
+    budget["started"] = time.monotonic()
+    budget["exceeded"] = None
+    task_budgets[task_id] = budget
+    return budget
+
+
+def finish_task_budget(task_id: str):
+    budget = task_budgets.get(task_id)
+    if budget and "started" in budget:
+        budget["finished"] = round(time.monotonic() - budget["started"], 1)
+
+
+def check_task_budget(task_id: str):
+    """
+    Name of the first budget (tokens, seconds) the task has used up, or None.
+    """
+    budget = task_budgets.get(task_id)
+    if not budget or "started" not in budget:
+        return None
+    with progress_condition:
+        progress = _get_task_progress(task_id)
+        tokens = progress["input_tokens"] + progress["output_tokens"]
+    if budget["max_tokens"] and tokens >= budget["max_tokens"]:
+        return "tokens"
+    if budget["max_seconds"] and time.monotonic() - budget["started"] >= budget["max_seconds"]:
+        return "seconds"
+    return None
+
+
+def summarize_task_budget(task_id: str, progress: dict):
+    # Caller must hold progress_condition
+    budget = task_budgets.get(task_id)
+    if not budget or "started" not in budget:
+        return None
+    return {
+        "limits": {key: budget[key] for key in ("max_tokens", "max_seconds")},
+        "used": {
+            "steps": progress["steps"],
+            "tokens": progress["input_tokens"] + progress["output_tokens"],
+            "seconds": round(time.monotonic() - budget["started"], 1)
+            if "finished" not in budget
+            else budget["finished"],
+        },
+        "exceeded": budget["exceeded"],
+    }
+
+
+# Record every agent LLM answer and replay it when the same (normalized) prompt
+# recurs, e.g. when a failed application is retried or a benchmark is rerun
+LLM_REPLAY = os.getenv("LLM_REPLAY", "false").lower() in ("1", "true", "yes", "on")
+llm_replay_cache = LLMReplayCache(
+    os.getenv("LLM_REPLAY_DIR") or os.path.join(os.path.dirname(__file__), "llm_replay"),
+    int(os.getenv("LLM_REPLAY_MAX_ENTRIES", "5000")),
+)
+
+
+def record_llm_replay(task_id: str, hit: bool):
+    LLM_REPLAY_LOOKUPS.inc(result="hit" if hit else "miss")
+    with progress_condition:
+        counts = _get_task_progress(task_id).setdefault("llm_replay", {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+
+def report_model_tier(task_id: str, tier: int, model: str, reason: str):
+    with progress_condition:
+        _get_task_progress(task_id)["model"] = model
+    print(f"🧠 Task {task_id} on model tier {tier} ({model}): {reason}")
+    publish_progress_event(task_id, {"type": "model", "tier": tier, "model": model, "reason": reason})
+
+
+def _summarize_actions(model_output) -> list:
+    """
+    Action names and (truncated) parameters from an agent step's model output.
+    """
+    actions = []
+    for action in getattr(model_output, "action", None) or []:
+        try:
+            dumped = action.model_dump(exclude_unset=True)
+        except Exception:
+            continue
+        for name, params in dumped.items():
+            if params is None:
+                continue
+            if isinstance(params, dict):
+                params = {
+                    key: (value[:200] if isinstance(value, str) else value)
+                    for key, value in params.items()
+                }
+            actions.append({"name": name, "params": params})
+    return actions
+
+
+# Chat models the agent runs on. AGENT_LLM_FACTORY="module:callable" swaps in
+# another factory taking the model name, e.g. the offline benchmarks' stub model
+AGENT_LLM_FACTORY = os.getenv("AGENT_LLM_FACTORY", "")
+
+# Model tiers, cheapest first. The agent starts on the first tier, moves up one
+# after an LLM or output parse error or AGENT_TIER_ESCALATE_AFTER_FAILURES
+# failed steps in a row, and back down after AGENT_TIER_COOLDOWN_STEPS clean steps
+AGENT_MODEL_TIERS = [
+    model.strip() for model in os.getenv("AGENT_MODEL_TIERS", "gpt-5-mini").split(",") if model.strip()
+]
+AGENT_TIER_COOLDOWN_STEPS = int(os.getenv("AGENT_TIER_COOLDOWN_STEPS", "3"))
+AGENT_TIER_ESCALATE_AFTER_FAILURES = int(os.getenv("AGENT_TIER_ESCALATE_AFTER_FAILURES", "2"))
+
+
+def create_agent_llm(model: str):
+    """
+    A fresh chat model for one task's agent.
+    """
+    if not AGENT_LLM_FACTORY:
+        return ChatOpenAI(model=model)
+    module_name, _, factory_name = AGENT_LLM_FACTORY.partition(":")
+    return getattr(importlib.import_module(module_name), factory_name)(model)
+
+
+class TieredChatModel:
+    """
+    Answers with the cheapest model tier that is working: an LLM or parse
+    error, or escalate_after_failures failed steps in a row, moves it up a tier,
+    cooldown_steps clean steps in a row back down. A single failed action (a
+    missing element, a slow page) is not the model's fault and doesn't count
+    on its own. on_change(tier, model, reason) is called on every switch.
+    """
+
+    def __init__(
+        self, models: list, cooldown_steps: int, escalate_after_failures: int = 2, on_change=None
+    ):
+        self.models = models
+        self.cooldown_steps = cooldown_steps
+        self.escalate_after_failures = escalate_after_failures
+        self.on_change = on_change
+        self.tier = 0
+        self.clean_steps = 0
+        self.failed_steps = 0
+        self._verified_api_keys = getattr(models[0], "_verified_api_keys", False)
+
+    @property
+    def current(self):
+        return self.models[self.tier]
+
+    @property
+    def model(self):
+        return self.current.model
+
+    @property
+    def provider(self):
+        return self.current.provider
+
+    @property
+    def name(self):
+        return self.current.name
+
+    @property
+    def model_name(self):
+        return self.model
+
+    def _switch(self, tier: int, reason: str):
+        self.tier = tier
+        self.clean_steps = 0
+        self.failed_steps = 0
+        if self.on_change:
+            self.on_change(tier, self.model, reason)
+
+    def escalate(self, reason: str) -> bool:
+        if self.tier + 1 >= len(self.models):
+            return False
+        self._switch(self.tier + 1, reason)
+        return True
+
+    def record_step(self, ok: bool, llm_failed: bool = False):
+        """
+        Feed one step's outcome: ok when no action failed, llm_failed when the
+        model's output couldn't be used at all.
+        """
+        if llm_failed:
+            self.escalate("model output unusable")
+            return
+        if not ok:
+            self.clean_steps = 0
+            self.failed_steps += 1
+            if self.escalate_after_failures and self.failed_steps >= self.escalate_after_failures:
+                self.escalate(f"{self.failed_steps} failed steps")
+            return
+        self.failed_steps = 0
+        self.clean_steps += 1
+        if self.tier > 0 and self.clean_steps >= self.cooldown_steps:
+            self._switch(self.tier - 1, f"{self.clean_steps} clean steps")
+
+    async def ainvoke(self, messages, output_format=None, **kwargs):
+        while True:
+            try:
+                return await self.current.ainvoke(messages, output_format, **kwargs)
+            except Exception as e:
+                if not self.escalate(f"LLM error: {type(e).__name__}"):
+                    raise
+
+    def __getattr__(self, name):
+        return getattr(self.current, name)
+
+
+class InstrumentedChatModel:
+    """
+    Wraps a browser_use chat model and reports the latency and token usage of
+    every call. Everything else is delegated to the wrapped model.
+    """
+
+    def __init__(self, llm, on_call):
+        self.llm = llm
+        self.on_call = on_call
+        self.model = llm.model
+        self._verified_api_keys = getattr(llm, "_verified_api_keys", False)
+
+    @property
+    def provider(self):
+        return self.llm.provider
+
+    @property
+    def name(self):
+        return self.llm.name
+
+    @property
+    def model_name(self):
+        return self.model
+
+    async def ainvoke(self, messages, output_format=None, **kwargs):
+        start = time.perf_counter()
+        result = await self.llm.ainvoke(messages, output_format, **kwargs)
+        self.on_call((time.perf_counter() - start) * 1000, result.usage, self.llm.model)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def make_step_hooks(task_id: str, llm: TieredChatModel = None):
+    """
+    Build on_step_start / on_step_end hooks for Agent.run that publish one
+    progress event per step (action, URL, duration, LLM latency and tokens),
+    feed step outcomes to the model tiers and stop the agent once the task is
+    over budget.
+    """
+
+    async def on_step_start(agent):
+        set_task_state(task_id, "running", "Agent is working on the application")
+        with progress_condition:
+            _get_task_progress(task_id)["current_step"] = {
+                "started": time.perf_counter(),
+                "llm_calls": 0,
+                "llm_latency_ms": 0.0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "span": start_span(
+                    f"step {agent.state.n_steps}", "step", task_id, step=agent.state.n_steps
+                ),
+            }
+        publish_progress_event(
+            task_id, {"type": "step_start", "step": agent.state.n_steps}
+        )
+
+    async def on_step_end(agent):
+        with progress_condition:
+            progress = _get_task_progress(task_id)
+            step = progress["current_step"] or {}
+            progress["current_step"] = None
+            progress["steps"] += 1
+
+        history = agent.history.history[-1] if agent.history.history else None
+        errors = [
+            r.error for r in (history.result if history else []) if r.error
+        ]
+        end_span(
+            step.get("span"),
+            actions=_summarize_actions(history.model_output) if history else [],
+            url=history.state.url if history and history.state else None,
+            errors=errors,
+        )
+        publish_progress_event(
+            task_id,
+            {
+                "type": "step",
+                "step": history.metadata.step_number
+                if history and history.metadata
+                else agent.state.n_steps - 1,
+                "actions": _summarize_actions(history.model_output) if history else [],
+                "url": history.state.url if history and history.state else None,
+                "duration_ms": round(
+                    (time.perf_counter() - step["started"]) * 1000, 1
+                )
+                if "started" in step
+                else None,
+                "llm_calls": step.get("llm_calls", 0),
+                "llm_latency_ms": round(step.get("llm_latency_ms", 0.0), 1),
+                "input_tokens": step.get("input_tokens", 0),
+                "output_tokens": step.get("output_tokens", 0),
+                "errors": errors,
+            },
+        )
+
+        if llm is not None:
+            # No model output means the LLM call or its parsing failed
+            llm.record_step(
+                not errors,
+                llm_failed=bool(errors) and history is not None and history.model_output is None,
+            )
+        exceeded = check_task_budget(task_id)
+        if exceeded:
+            stop_for_budget(task_id, agent, exceeded)
+
+    return on_step_start, on_step_end
+
+
+def stop_for_budget(task_id: str, agent, exceeded: str):
+    """
+    Record which budget ran out and ask the agent to stop after its current step.
+    """
+    if agent.state.stopped:
+        return
+    task_budgets[task_id]["exceeded"] = exceeded
+    print(f"💸 Task {task_id} is over its {exceeded} budget, stopping the agent")
+    publish_progress_event(task_id, {"type": "budget_exceeded", "budget": exceeded})
+    agent.stop()
+
+
+# How long a step may keep running once the time budget is up before the run is cancelled
+TASK_BUDGET_GRACE_SECONDS = float(os.getenv("TASK_BUDGET_GRACE_SECONDS", "15"))
+
+
+async def run_agent_within_budget(task_id: str, agent, **run_kwargs):
+    """
+    agent.run with the task's time budget enforced inside steps too: at the
+    deadline the agent is asked to stop, and if the step it is in (a hung
+    navigation or LLM call) doesn't end within TASK_BUDGET_GRACE_SECONDS the
+    run is cancelled. Returns the agent's history either way.
+    """
+    budget = task_budgets[task_id]
+    run = asyncio.ensure_future(agent.run(**run_kwargs))
+    try:
+        if budget["max_seconds"]:
+            remaining = budget["max_seconds"] - (time.monotonic() - budget["started"])
+            await asyncio.wait({run}, timeout=max(remaining, 0))
+            if not run.done():
+                stop_for_budget(task_id, agent, "seconds")
+                await asyncio.wait({run}, timeout=TASK_BUDGET_GRACE_SECONDS)
+            if not run.done():
+                print(f"💸 Task {task_id} step still running {TASK_BUDGET_GRACE_SECONDS}s past its time budget, cancelling")
+                run.cancel()
+        await asyncio.wait({run})
+    except asyncio.CancelledError:
+        run.cancel()
+        raise
+    return agent.history if run.cancelled() else run.result()
+
+
+# Screenshot defaults for /api/screenshot (overridable per request)
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "png")
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "80"))
+SCREENSHOT_SCALE = float(os.getenv("SCREENSHOT_SCALE", "1.0"))
+
+
+# Every DevTools socket (target tracking, screenshots, screencasts) goes through
+# this client: one socket per target, all served by a single event loop thread
+cdp_client = CDPClient()
+
+
+class TargetTracker:
+    """
+    Follows a task's browser targets through CDP Target events on the browser
+    connection and keeps track of the page the agent is working in: the most
+    recently opened or navigated real page.
+    """
+
+    def __init__(self, port: int, browser_ws_url: str):
+        self.port = port
+        self.targets = {}
+        self.active_target_id = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.session = cdp_client.get_session(browser_ws_url)
+        self._unsubscribe = self.session.subscribe("*", self._on_event)
+        # Emits targetCreated for every existing target, then keeps us updated
+        cdp_client.run(
+            self.session.send("Target.setDiscoverTargets", {"discover": True}), timeout=15
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed
+
+    def _on_event(self, method: str, params: dict):
+        # Runs on the CDP loop
+        with self._lock:
+            if method in ("Target.targetCreated", "Target.targetInfoChanged"):
+                info = params.get("targetInfo", {})
+                if info.get("type") != "page":
+                    return
+                target_id = info["targetId"]
+                previous = self.targets.get(target_id)
+                activity = (
+                    time.monotonic()
+                    if previous is None or previous["url"] != info.get("url")
+                    else previous["activity"]
+                )
+                self.targets[target_id] = {
+                    "targetId": target_id,
+                    "url": info.get("url", ""),
+                    "title": info.get("title", ""),
+                    "openerId": info.get("openerId"),
+                    "activity": activity,
+                }
+            elif method == "Target.targetDestroyed":
+                target_id = params.get("targetId")
+                if self.targets.pop(target_id, None) is None:
+                    return
+                # Drop any socket we still hold to the closed tab
+                cdp_client.loop.create_task(
+                    cdp_client.close_sessions(self.page_ws_url(target_id))
+                )
+            else:
+                return
+            changed = self._select_active()
+        if changed:
+            target = self.active_target()
+            for listener in list(self._listeners):
+                try:
+                    listener(target)
+                except Exception as e:
+                    logging.warning(f"Target listener failed: {e}")
+
+    def _select_active(self) -> bool:
+        # Caller must hold self._lock
+        def rank(target):
+            url = target["url"]
+            real_page = bool(url) and not url.startswith(("about:", "chrome://"))
+            return (real_page, target["activity"])
+
+        best = max(self.targets.values(), key=rank, default=None)
+        best_id = best["targetId"] if best else None
+        changed = best_id != self.active_target_id
+        self.active_target_id = best_id
+        return changed
+
+    def active_target(self):
+        with self._lock:
+            target = self.targets.get(self.active_target_id)
+            return dict(target) if target else None
+
+    def page_ws_url(self, target_id: str) -> str:
+        return f"ws://localhost:{self.port}/devtools/page/{target_id}"
+
+    def add_listener(self, listener):
+        """
+        Call listener(active_target) on the CDP loop whenever the active page changes.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def close(self):
+        self._unsubscribe()
+
+
+task_target_trackers = {}
+target_trackers_lock = threading.Lock()
+
+
+def start_target_tracker(task_id: str, port: int, browser_ws_url: str) -> TargetTracker:
+    tracker = TargetTracker(port, browser_ws_url)
+    with target_trackers_lock:
+        previous = task_target_trackers.get(task_id)
+        task_target_trackers[task_id] = tracker
+    if previous:
+        previous.close()
+    return tracker
+
+
+# Third-party resources the agent never needs, failed before they are sent.
+# Domains match with their subdomains; entries with "*" or "/" are CDP URL patterns
+BLOCK_RESOURCES = os.getenv("BLOCK_RESOURCES", "false").lower() in ("1", "true", "yes", "on")
+BLOCK_RESOURCE_TYPES = [
+    t.strip() for t in os.getenv("BLOCK_RESOURCE_TYPES", "").split(",") if t.strip()
+]
+BLOCK_DOMAINS = [
+    d.strip()
+    for d in (
+        os.getenv("BLOCK_DOMAINS")
+        # Analytics and ad hosts only: no widget, form or video hosts, which
+        # application pages embed, and no vendor's own site
+        or "google-analytics.com,googletagmanager.com,doubleclick.net,googleadservices.com,"
+        "googlesyndication.com,connect.facebook.net,static.hotjar.com,script.hotjar.com,"
+        "www.clarity.ms,edge.fullstory.com,rs.fullstory.com,cdn.segment.com,api.segment.io,"
+        "cdn.mxpnl.com,api-js.mixpanel.com,cdn.amplitude.com,api2.amplitude.com,"
+        "cdn.heapanalytics.com,js-agent.newrelic.com,bam.nr-data.net,bat.bing.com,"
+        "snap.licdn.com,px.ads.linkedin.com,analytics.tiktok.com"
+    ).split(",")
+    if d.strip()
+]
+
+
+def block_patterns(resource_types: list, domains: list) -> list:
+    """
+    Fetch.enable patterns for the blocklist (all at the Request stage).
+    """
+    patterns = [{"urlPattern": "*", "resourceType": t, "requestStage": "Request"} for t in resource_types]
+    for domain in domains:
+        if "*" in domain or "/" in domain:
+            url_patterns = [domain]
+        else:
+            url_patterns = [f"*://{domain}/*", f"*://*.{domain}/*"]
+        patterns += [{"urlPattern": p, "requestStage": "Request"} for p in url_patterns]
+    return patterns
+
+
+def record_blocked_request(task_id: str, resource_type: str, host: str):
+    BLOCKED_REQUESTS.inc(resource_type=resource_type)
+    with progress_condition:
+        blocked = _get_task_progress(task_id).setdefault(
+            "blocked", {"requests": 0, "by_type": {}, "by_host": {}}
+        )
+        blocked["requests"] += 1
+        blocked["by_type"][resource_type] = blocked["by_type"].get(resource_type, 0) + 1
+        blocked["by_host"][host] = blocked["by_host"].get(host, 0) + 1
+
+
+class RequestBlocker:
+    """
+    Fails blocklisted requests in every page of a task's browser and in their
+    out-of-process iframes (e.g. embedded Greenhouse forms). Runs on its own
+    browser socket with auto-attach: new targets start paused, get Fetch
+    interception and only then run, so a tab opened by window.open is covered
+    from its first request. Top-level documents always load.
+    """
+
+    AUTO_ATTACH = {
+        "autoAttach": True,
+        "waitForDebuggerOnStart": True,
+        "flatten": True,
+        "filter": [{"type": "page"}, {"type": "iframe"}],
+    }
+
+    def __init__(self, task_id: str, browser_ws_url: str, patterns: list):
+        self.task_id = task_id
+        self.patterns = patterns
+        self.session = None
+        # Attached targets by session id: {"target_id", "type"}
+        self._targets = {}
+        cdp_client.run(self._start(browser_ws_url), timeout=15)
+
+    async def _start(self, browser_ws_url: str):
+        self.session = await cdp_client.connect(browser_ws_url)
+        self.session.subscribe("Target.attachedToTarget", self._on_attached, flattened=True)
+        self.session.subscribe("Target.detachedFromTarget", self._on_detached, flattened=True)
+        self.session.subscribe(
+            "Fetch.requestPaused",
+            lambda method, params, session_id: cdp_client.loop.create_task(
+                self._on_paused(session_id, params)
+            ),
+            flattened=True,
+        )
+        try:
+            # Attaches to the open tabs now and to every new one as it starts
+            await self.session.send("Target.setAutoAttach", self.AUTO_ATTACH)
+        except Exception:
+            await self.session.close()
+            raise
+
+    def _on_attached(self, method: str, params: dict, parent_session_id: str):
+        # Runs on the CDP loop
+        info = params.get("targetInfo", {})
+        session_id = params["sessionId"]
+        self._targets[session_id] = {"target_id": info.get("targetId"), "type": info.get("type")}
+        cdp_client.loop.create_task(
+            self._intercept(session_id, info, params.get("waitingForDebugger", False))
+        )
+
+    def _on_detached(self, method: str, params: dict, parent_session_id: str):
+        # The tab or iframe went away
+        self._targets.pop(params.get("sessionId"), None)
+
+    async def _intercept(self, session_id: str, info: dict, waiting: bool):
+        try:
+            await self.session.send(
+                "Fetch.enable", {"patterns": self.patterns}, session_id=session_id
+            )
+            # Out-of-process iframes of this target, paused the same way
+            await self.session.send("Target.setAutoAttach", self.AUTO_ATTACH, session_id=session_id)
+        except Exception as e:
+            target_id = info.get("targetId") or "?"
+            print(f"⚠️  Request blocking unavailable for {info.get('type')} {target_id[-4:]}: {e}")
+        finally:
+            if waiting:
+                try:
+                    await self.session.send("Runtime.runIfWaitingForDebugger", session_id=session_id)
+                except Exception:
+                    pass
+
+    async def _on_paused(self, session_id: str, params: dict):
+        target = self._targets.get(session_id) or {}
+        resource_type = params.get("resourceType", "Other")
+        try:
+            # A blocklisted domain can still be the job page itself
+            if (
+                resource_type == "Document"
+                and target.get("type") == "page"
+                and params.get("frameId") == target.get("target_id")
+            ):
+                await self.session.send(
+                    "Fetch.continueRequest", {"requestId": params["requestId"]}, session_id=session_id
+                )
+                return
+            await self.session.send(
+                "Fetch.failRequest",
+                {"requestId": params["requestId"], "errorReason": "BlockedByClient"},
+                session_id=session_id,
+            )
+        except Exception:
+            # The tab went away, nothing left to block
+            return
+        url = params.get("request", {}).get("url", "")
+        record_blocked_request(self.task_id, resource_type, urlparse(url).hostname or "")
+
+    def close(self):
+        """
+        Stop blocking. Closing the socket detaches every target, which ends
+        their interception and lets requests still paused through.
+        """
+        self._targets.clear()
+        if self.session is None:
+            return
+        try:
+            cdp_client.run(self.session.close(), timeout=5)
+        except Exception as e:
+            print(f"⚠️  Could not disable request blocking for task {self.task_id}: {e}")
+
+
+task_request_blockers = {}
+
+
+def start_request_blocker(task_id: str, browser_ws_url: str):
+    if not BLOCK_RESOURCES:
+        return None
+    resource_types = list(BLOCK_RESOURCE_TYPES)
+    if (lean_tasks.get(task_id) or {}).get("block_resources") and "Image" not in resource_types:
+        resource_types.append("Image")
+    patterns = block_patterns(resource_types, BLOCK_DOMAINS)
+    if not patterns:
+        return None
+    blocker = RequestBlocker(task_id, browser_ws_url, patterns)
+    previous = task_request_blockers.pop(task_id, None)
+    if previous:
+        previous.close()
+    task_request_blockers[task_id] = blocker
+    return blocker
+
+
+def close_request_blocker(task_id: str):
+    blocker = task_request_blockers.pop(task_id, None)
+    if blocker:
+        blocker.close()
+
+
+def get_target_tracker(task_id: str) -> TargetTracker:
+    """
+    Return the task's target tracker, starting one if Chrome launched without it
+    (or for tasks we don't know about, on the standard debugging port).
+    """
+    with target_trackers_lock:
+        tracker = task_target_trackers.get(task_id)
+    if tracker and not tracker.closed:
+        return tracker
+
+    cdp_port = task_chrome_instances.get(task_id, {}).get("port", 9222)
+    version_response = requests.get(f"http://localhost:{cdp_port}/json/version", timeout=5)
+    version_response.raise_for_status()
+    browser_ws_url = version_response.json().get("webSocketDebuggerUrl")
+    if not browser_ws_url:
+        raise LookupError("Browser WebSocket URL not available")
+    return start_target_tracker(task_id, cdp_port, browser_ws_url)
+
+
+def close_target_tracker(task_id: str):
+    with target_trackers_lock:
+        tracker = task_target_trackers.pop(task_id, None)
+    if tracker:
+        tracker.close()
+    return tracker
+
+
+def release_task_cdp(task_id: str):
+    """
+    Drop a finished task's CDP listeners (request blocking, target tracking)
+    and its browser-level socket. Chrome keeps running until the task is
+    stopped; page sockets stay for screenshots of the final page, and the
+    tracker is restarted on demand.
+    """
+    close_request_blocker(task_id)
+    tracker = close_target_tracker(task_id)
+    if tracker:
+        try:
+            cdp_client.run(cdp_client.close_sessions(tracker.session.ws_url), timeout=5)
+        except Exception as e:
+            print(f"⚠️  Error closing browser CDP session for task {task_id}: {e}")
+
+
+def get_task_page_session(task_id: str) -> CDPSession:
+    """
+    Return the shared CDP session for the task's active page. The socket is
+    reused by screenshots and the screencast until the tab goes away.
+    """
+    tracker = get_target_tracker(task_id)
+    target = tracker.active_target()
+    if not target:
+        raise LookupError(
+            "No browser tabs found. The browser session may not have started yet."
+        )
+    return cdp_client.get_session(tracker.page_ws_url(target["targetId"]))
+
+
+def close_task_cdp_sessions(port: int):
+    """
+    Close every CDP socket into the browser on this debugging port.
+    """
+    try:
+        cdp_client.run(cdp_client.close_sessions(f"ws://localhost:{port}/"), timeout=5)
+    except Exception as e:
+        print(f"⚠️  Error closing CDP sessions on port {port}: {e}")
+
+
+# Newest screencast frame per task, reused by /api/screenshot while it is fresh
+SCREENSHOT_MAX_FRAME_AGE_MS = int(os.getenv("SCREENSHOT_MAX_FRAME_AGE_MS", "1000"))
+task_latest_frames = {}
+latest_frames_lock = threading.Lock()
+
+
+def update_latest_frame(task_id: str, image_data: bytes, image_format: str):
+    """
+    Remember the newest screencast frame of a task along with its size.
+    """
+    with Image.open(io.BytesIO(image_data)) as image:
+        width, height = image.size  # header only, no full decode
+    with latest_frames_lock:
+        task_latest_frames[task_id] = {
+            "data": image_data,
+            "format": image_format,
+            "width": width,
+            "height": height,
+            "timestamp": time.time(),
+        }
+
+
+def get_latest_frame(task_id: str, max_age_ms: int = None):
+    """
+    Return the task's latest screencast frame if it is younger than max_age_ms.
+    """
+    if max_age_ms is None:
+        max_age_ms = SCREENSHOT_MAX_FRAME_AGE_MS
+    with latest_frames_lock:
+        frame = task_latest_frames.get(task_id)
+    if frame and (time.time() - frame["timestamp"]) * 1000 <= max_age_ms:
+        return frame
+    return None
+
+
+def drop_latest_frame(task_id: str):
+    with latest_frames_lock:
+        task_latest_frames.pop(task_id, None)
+
+
+def encode_frame(frame: dict, image_format: str, quality: int, scale: float) -> bytes:
+    """
+    Re-encode a buffered frame to the requested format/scale. Returns the raw
+    bytes untouched when nothing needs to change.
+    """
+    if frame["format"] == image_format and scale >= 1:
+        return frame["data"]
+    with Image.open(io.BytesIO(frame["data"])) as image:
+        if scale < 1:
+            image = image.resize(
+                (max(1, int(image.width * scale)), max(1, int(image.height * scale))),
+                Image.BILINEAR,
+            )
+        if image_format == "jpeg":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        save_kwargs = {} if image_format == "png" else {"quality": quality}
+        image.save(buffer, image_format.upper(), **save_kwargs)
+        return buffer.getvalue()
+
+
+def downscale_frame(image_data: bytes, max_width: int) -> bytes:
+    """
+    Shrink a PNG frame to max_width, keeping its aspect ratio. Returns the
+    original bytes if it already fits.
+    """
+    with Image.open(io.BytesIO(image_data)) as image:
+        if image.width <= max_width:
+            return image_data
+        height = max(1, round(image.height * max_width / image.width))
+        buffer = io.BytesIO()
+        image.resize((max_width, height), Image.BILINEAR).save(buffer, "PNG")
+        return buffer.getvalue()
+
+
+async def capture_screenshot(
+    session: CDPSession, image_format: str, quality: int, scale: float
+) -> bytes:
+    """
+    Capture the visible viewport over the page's shared CDP session.
+    """
+    params = {"format": image_format}
+    if image_format != "png":
+        params["quality"] = quality
+    if scale < 1:
+        metrics = await session.send("Page.getLayoutMetrics", timeout=5)
+        viewport = metrics.get("cssLayoutViewport") or metrics.get("layoutViewport", {})
+        params["clip"] = {
+            "x": viewport.get("pageX", 0),
+            "y": viewport.get("pageY", 0),
+            "width": viewport.get("clientWidth", 1920),
+            "height": viewport.get("clientHeight", 1080),
+            "scale": scale,
+        }
+    result = await session.send("Page.captureScreenshot", params, timeout=10)
+    if "data" not in result:
+        raise CDPError("No screenshot data in response")
+    return base64.b64decode(result["data"])
+
+
+def process_screencast_frame(
+    task_id: str,
+    params: dict,
+    frame_number: int,
+    record: bool = True,
+    record_max_width: int = None,
+) -> dict:
+    """
+    Keep a Page.screencastFrame as the task's latest frame, optionally persist
+    it for replay (downscaled to record_max_width) and build the frame event
+    sent to live viewers.
+    """
+    frame_data = params["data"]
+    try:
+        # Keep it as the task's latest frame for screenshots and, when the
+        # recording policy asks for this one, save it for replay (within budget)
+        image_data = base64.b64decode(frame_data)
+        update_latest_frame(task_id, image_data, "png")
+        if record:
+            if record_max_width:
+                image_data = downscale_frame(image_data, record_max_width)
+            record_task_frame(task_id, image_data)
+    except Exception:
+        pass  # Ignore save errors, continue streaming
+
+    return {
+        "type": "frame",
+        "data": frame_data,
+        "frame_number": frame_number,
+        "timestamp": time.time(),
+        "metadata": {
+            "width": params.get("metadata", {}).get("deviceWidth"),
+            "height": params.get("metadata", {}).get("deviceHeight"),
+        },
+    }
+
+
+SCREENCAST_START_PARAMS = {
+    "format": "png",
+    "quality": 80,
+    "maxWidth": 1920,
+    "maxHeight": 1080,
+    "everyNthFrame": 1,  # Send every frame
+}
+
+
+# Frames a live viewer may have queued before the oldest one is dropped
+LIVE_STREAM_BUFFER_FRAMES = int(os.getenv("LIVE_STREAM_BUFFER_FRAMES", "3"))
+
+# Server-wide frame policies; /apply-job can override them per task. Live
+# viewing and replay recording are sampled independently from one screencast.
+FRAME_POLICY_DEFAULTS = {
+    "live": {
+        "fps": float(os.getenv("LIVE_STREAM_FPS", "10")),
+        "max_width": int(os.getenv("LIVE_STREAM_MAX_WIDTH", "1280")),
+    },
+    "recording": {
+        "fps": float(os.getenv("RECORDING_FPS", "2")),
+        "max_width": int(os.getenv("RECORDING_MAX_WIDTH", "960")),
+    },
+}
+task_frame_policies = {}
+
+
+def parse_frame_policy(policy) -> dict:
+    """
+    Validate a {"live": {...}, "recording": {...}} override with fps/max_width
+    settings. Recording fps 0 turns recording off. Raises ValueError.
+    """
+    if not isinstance(policy, dict):
+        raise ValueError("frame_policy must be an object")
+    parsed = {}
+    for stream, settings in policy.items():
+        if stream not in FRAME_POLICY_DEFAULTS:
+            raise ValueError(f"Unknown frame_policy stream: {stream}")
+        if not isinstance(settings, dict):
+            raise ValueError(f"frame_policy.{stream} must be an object")
+        parsed[stream] = {}
+        for key, value in settings.items():
+            if key not in ("fps", "max_width"):
+                raise ValueError(f"Unknown frame_policy setting: {stream}.{key}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"frame_policy.{stream}.{key} must be a number")
+            if key == "max_width" and value < 64:
+                raise ValueError(f"frame_policy.{stream}.max_width must be at least 64")
+            if key == "fps" and (value < 0 or (stream == "live" and value == 0)):
+                raise ValueError(f"frame_policy.{stream}.fps is out of range")
+            parsed[stream][key] = int(value) if key == "max_width" else float(value)
+    return parsed
+
+
+def get_frame_policy(task_id: str) -> dict:
+    """
+    The task's effective frame policy: server defaults overlaid with its override.
+    Recording can't be wider than the live screencast it is sampled from.
+    """
+    policy = {stream: dict(settings) for stream, settings in FRAME_POLICY_DEFAULTS.items()}
+    for stream, settings in task_frame_policies.get(task_id, {}).items():
+        policy[stream].update(settings)
+    policy["recording"]["max_width"] = min(
+        policy["recording"]["max_width"], policy["live"]["max_width"]
+    )
+    return policy
+
+
+def _measured_fps(timestamps: deque, window: float = 10) -> float:
+    now = time.time()
+    recent = [t for t in timestamps if now - t <= window]
+    if len(recent) < 2 or recent[-1] <= recent[0]:
+        return 0.0
+    return round((len(recent) - 1) / (recent[-1] - recent[0]), 2)
+
+
+class FrameBuffer:
+    """
+    Bounded per-viewer event buffer. Once it holds maxsize frames, the oldest
+    frame is dropped (status and error events are always kept): a viewer that
+    falls behind should see the newest picture, not a backlog.
+    Filled on the CDP loop, drained from the viewer's thread or loop.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, maxsize: int = None, on_ready=None):
+        self.id = next(self._ids)
+        self.maxsize = maxsize or LIVE_STREAM_BUFFER_FRAMES
+        self.on_ready = on_ready
+        self.on_consumed = None
+        self.events = deque()
+        self.condition = threading.Condition()
+        self.created_at = time.time()
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def _frame_depth(self) -> int:
+        return sum(1 for event in self.events if event.get("type") == "frame")
+
+    def put(self, event: dict):
+        with self.condition:
+            if event.get("type") == "frame" and self._frame_depth() >= self.maxsize:
+                for index, queued in enumerate(self.events):
+                    if queued.get("type") == "frame":
+                        del self.events[index]
+                        self.dropped += 1
+                        LIVE_STREAM_FRAMES_DROPPED.inc()
+                        break
+            self.events.append(event)
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self.events))
+            self.condition.notify()
+        if self.on_ready:
+            self.on_ready()
+
+    def get_nowait(self):
+        with self.condition:
+            if not self.events:
+                return None
+            event = self.events.popleft()
+            self.delivered += 1
+        if event.get("type") == "frame":
+            LIVE_STREAM_FRAMES_SENT.inc()
+            if self.on_consumed:
+                self.on_consumed(event["frame_number"])
+        return event
+
+    def get(self, timeout: float):
+        """
+        Block up to timeout for the next event; None on timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.events, timeout):
+                return None
+        return self.get_nowait()
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "id": self.id,
+                "depth": len(self.events),
+                "max_depth": self.max_depth,
+                "capacity": self.maxsize,
+                "enqueued": self.enqueued,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "connected_seconds": round(time.time() - self.created_at, 1),
+            }
+
+
+class TaskScreencast:
+    """
+    The task's single Page.startScreencast, shared by every live viewer. Lives
+    on the CDP loop, follows the tracker's active tab and puts each event into
+    every subscriber's FrameBuffer.
+
+    A frame is acked to Chrome only once some viewer has taken it (or a newer
+    one) out of its buffer, and never sooner than the live fps allows, so Chrome
+    sends frames at the pace of the fastest viewer, capped by the policy, and
+    stops when nobody is reading. Recording samples those frames at its own fps.
+    """
+
+    def __init__(self, task_id: str, tracker: TargetTracker):
+        self.task_id = task_id
+        self.tracker = tracker
+        self.subscribers = []
+        self.target = None
+        self.session = None
+        self.frame_count = 0
+        self.last_frame = None
+        self.pending_ack = None
+        self.frames_received = 0
+        self.frames_acked = 0
+        self.frames_dropped = 0
+        self.policy = get_frame_policy(task_id)
+        self.next_ack_at = 0.0
+        self.last_recorded_at = 0.0
+        self.live_times = deque(maxlen=200)
+        self.recorded_times = deque(maxlen=200)
+        self._unsubscribe = None
+        self._lock = asyncio.Lock()
+        tracker.add_listener(self._on_target_change)
+
+    def _broadcast(self, event: dict):
+        for buffer in list(self.subscribers):
+            try:
+                buffer.put(event)
+            except Exception as e:
+                logging.warning(f"Screencast subscriber failed: {e}")
+
+    def _status(self, message: str) -> dict:
+        return {
+            "type": "status",
+            "message": message,
+            "tab_url": self.target.get("url", ""),
+            "tab_title": self.target.get("title", ""),
+        }
+
+    async def subscribe(self, buffer: FrameBuffer):
+        loop = asyncio.get_running_loop()
+        buffer.on_consumed = lambda number: loop.call_soon_threadsafe(
+            self._on_consumed, number
+        )
+        async with self._lock:
+            self.subscribers.append(buffer)
+            if self.session is not None:
+                buffer.put(self._status("Live stream started"))
+                # Chrome only sends frames on change: show the newcomer the current one
+                if self.last_frame:
+                    buffer.put(self.last_frame)
+                return
+            target = self.tracker.active_target()
+            if not target:
+                buffer.put({"type": "error", "message": "No browser tabs found"})
+                return
+            await self._start(target)
+
+    async def unsubscribe(self, buffer: FrameBuffer):
+        buffer.on_consumed = None
+        async with self._lock:
+            if buffer in self.subscribers:
+                self.subscribers.remove(buffer)
+                self.frames_dropped += buffer.dropped
+            if not self.subscribers:
+                await self._stop()
+
+    async def _start(self, target: dict):
+        self.target = target
+        self.policy = get_frame_policy(self.task_id)
+        max_width = self.policy["live"]["max_width"]
+        try:
+            session = await cdp_client.session(self.tracker.page_ws_url(target["targetId"]))
+            self.session = session
+            self._unsubscribe = session.subscribe(
+                "Page.screencastFrame",
+                lambda method, params: self._on_frame(session, params),
+            )
+            await session.send("Page.enable")
+            await session.send(
+                "Page.startScreencast",
+                # Landscape viewport: let the width be the binding limit
+                {**SCREENCAST_START_PARAMS, "maxWidth": max_width, "maxHeight": max_width},
+            )
+        except CDPError as e:
+            self._broadcast({"type": "error", "message": f"Screencast start failed: {e}"})
+            return
+        except (ConnectionError, TimeoutError) as e:
+            self._broadcast({"type": "error", "message": str(e)})
+            return
+        self._broadcast(self._status("Live stream started"))
+
+    async def _stop(self):
+        session, self.session = self.session, None
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        self.last_frame = None
+        self.pending_ack = None
+        if session and not session.closed:
+            try:
+                await session.send("Page.stopScreencast", timeout=2)
+            except Exception:
+                pass
+
+    def _on_frame(self, session: CDPSession, params: dict):
+        if params.get("data"):
+            self.frame_count += 1
+            asyncio.get_running_loop().create_task(
+                self._handle_frame(session, params, self.frame_count)
+            )
+
+    async def _handle_frame(self, session: CDPSession, params: dict, number: int):
+        recording = self.policy["recording"]
+        now = time.time()
+        record = recording["fps"] > 0 and now - self.last_recorded_at >= 1 / recording["fps"]
+        if record:
+            self.last_recorded_at = now
+            self.recorded_times.append(now)
+        # Decoding and writing the frame happens off the CDP loop
+        event = await asyncio.get_running_loop().run_in_executor(
+            None,
+            process_screencast_frame,
+            self.task_id,
+            params,
+            number,
+            record,
+            recording["max_width"],
+        )
+        if session is not self.session:
+            return
+        self.frames_received += 1
+        self.live_times.append(time.time())
+        self.last_frame = event
+        if params.get("sessionId"):
+            # Acked when a viewer takes this frame (see _on_consumed)
+            self.pending_ack = (session, params["sessionId"], number)
+        self._broadcast(event)
+
+    def _on_consumed(self, number: int):
+        # A viewer took frame `number` out of its buffer: Chrome may send the next one
+        if not self.pending_ack or number < self.pending_ack[2]:
+            return
+        session, cdp_session_id, _ = self.pending_ack
+        self.pending_ack = None
+        if session is not self.session:
+            return
+        self.frames_acked += 1
+        # Hold the ack back so Chrome never produces more than the live fps
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, self.next_ack_at - loop.time())
+        self.next_ack_at = loop.time() + delay + 1 / self.policy["live"]["fps"]
+        loop.call_later(delay, lambda: loop.create_task(self._ack(session, cdp_session_id)))
+
+    async def _ack(self, session: CDPSession, cdp_session_id: int):
+        if session is not self.session:
+            return
+        try:
+            await session.send(
+                "Page.screencastFrameAck", {"sessionId": cdp_session_id}, timeout=5
+            )
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        subscribers = [buffer.stats() for buffer in list(self.subscribers)]
+        return {
+            "task_id": self.task_id,
+            "streaming": self.session is not None,
+            "tab_url": (self.target or {}).get("url"),
+            "frames_received": self.frames_received,
+            "frames_acked": self.frames_acked,
+            "awaiting_consumer": self.pending_ack is not None,
+            "frames_dropped": self.frames_dropped
+            + sum(buffer["dropped"] for buffer in subscribers),
+            "policy": self.policy,
+            "effective": {
+                "live_fps": _measured_fps(self.live_times),
+                "recording_fps": _measured_fps(self.recorded_times),
+                "live_max_width": self.policy["live"]["max_width"],
+                "recording_max_width": self.policy["recording"]["max_width"],
+            },
+            "viewers": subscribers,
+        }
+
+    def _on_target_change(self, target):
+        # Called by the tracker on the CDP loop
+        asyncio.get_running_loop().create_task(self._switch(target))
+
+    async def _switch(self, target):
+        async with self._lock:
+            if not self.subscribers or not target or self.session is None:
+                return
+            if target["targetId"] == self.target["targetId"]:
+                return
+            # Follow the agent to its new tab
+            await self._stop()
+            self.target = target
+            self._broadcast(self._status("Switched to new tab"))
+            await self._start(target)
+
+    async def close(self):
+        self.tracker.remove_listener(self._on_target_change)
+        async with self._lock:
+            self.subscribers.clear()
+            await self._stop()
+
+
+task_screencasts = {}
+screencasts_lock = threading.Lock()
+
+
+def get_task_screencast(task_id: str) -> TaskScreencast:
+    tracker = get_target_tracker(task_id)
+    with screencasts_lock:
+        screencast = task_screencasts.get(task_id)
+        if screencast is None or screencast.tracker is not tracker:
+            if screencast:
+                screencast.tracker.remove_listener(screencast._on_target_change)
+            screencast = TaskScreencast(task_id, tracker)
+            task_screencasts[task_id] = screencast
+        return screencast
+
+
+# Shared by the Flask and aiohttp versions of /api/live-stream
+LIVE_STREAM_KEEPALIVE_SECONDS = 30
+
+
+def open_live_screencast(session_id: str) -> tuple:
+    """
+    The task's shared screencast for a new live viewer, as (screencast, None),
+    or (None, message) when there is nothing to stream yet. Blocking.
+    """
+    instance = task_chrome_instances.get(session_id)
+    if not instance:
+        return None, "Browser not started yet. Please wait..."
+    if instance.get("status") != "running":
+        return None, "Browser is still starting up..."
+    if is_lean_task(session_id):
+        return None, "Live streaming is disabled for lean tasks"
+    try:
+        return get_task_screencast(session_id), None
+    except Exception:
+        return None, f"Cannot connect to browser on port {instance.get('port')}"
+
+
+def live_stream_round(frame_data) -> tuple:
+    """
+    One round of the live stream after waiting up to
+    LIVE_STREAM_KEEPALIVE_SECONDS for the next frame. Returns (payload,
+    whether the stream ends).
+    """
+    if frame_data is None:
+        return keepalive_event(), False
+    return frame_data, frame_data.get("type") == "error"
+
+
+def close_task_screencast(task_id: str):
+    with screencasts_lock:
+        screencast = task_screencasts.pop(task_id, None)
+    if screencast:
+        try:
+            cdp_client.run(screencast.close(), timeout=5)
+        except Exception as e:
+            print(f"⚠️  Error stopping screencast for task {task_id}: {e}")
+
+
+app = Flask(__name__, template_folder="templates")
+logging.basicConfig(level=logging.INFO)
+
+# Enable CORS for all routes to allow Next.js frontend to connect
+try:
+    from flask_cors import CORS
+
+    CORS(app, resources={r"/*": {"origins": "*"}})
+except ImportError:
+    print("⚠️  flask-cors not installed. Install with: pip install flask-cors")
+
+    # Add manual CORS headers as fallback
+    @app.after_request
+    def after_request(response):
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        response.headers.add(
+            "Access-Control-Allow-Headers", "Content-Type,Authorization"
+        )
+        response.headers.add(
+            "Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS"
+        )
+        return response
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Cache-Control",
+}
+PROGRESS_SSE_HEADERS = {**SSE_HEADERS, "Access-Control-Allow-Headers": "Cache-Control, Last-Event-ID"}
+
+
+def sse_message(payload: dict, event_id=None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+# Global dictionary to store active Chrome sessions
+active_sessions = {}
+
+# Global dictionary to track task Chrome instances and their ports
+task_chrome_instances = {}
+
+
+@app.route("/screencast/<session_id>")
+def screencast_viewer(session_id):
+    """
+    Serve the minimal screenshot-based viewer HTML page for a specific session.
+    """
+    return render_template("minimal-screenshots.html", session_id=session_id)
+
+
+@app.route("/live-stream/<session_id>")
+def live_stream_viewer(session_id):
+    """
+    Serve the minimal live streaming viewer HTML page for a specific session.
+    """
+    return render_template("minimal-live.html", session_id=session_id)
+
+
+@app.route("/debug-screencast/<session_id>")
+def debug_screencast_viewer(session_id):
+    """
+    Serve the full debug screenshot-based viewer HTML page for a specific session.
+    """
+    return render_template("screencast.html", session_id=session_id)
+
+
+@app.route("/debug-live/<session_id>")
+def debug_live_stream_viewer(session_id):
+    """
+    Serve the full debug live streaming viewer HTML page for a specific session.
+    """
+    return render_template("live-screencast.html", session_id=session_id)
+
+
+@app.route("/replay/<session_id>")
+def replay_viewer(session_id):
+    """
+    Serve the replay viewer HTML page for a specific session.
+    """
+    response = app.make_response(render_template("replay.html", session_id=session_id))
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request, accept_ranges=True)
+
+
+@app.route("/test-screenshot")
+def test_screenshot():
+    """
+    Test endpoint to verify screenshot functionality works.
+    """
+    try:
+        # Check if Chrome is running
+        tabs_response = requests.get("http://localhost:9222/json/list", timeout=5)
+        if not tabs_response.ok:
+            return f"❌ Chrome DevTools not accessible on port 9222<br>Status: {tabs_response.status_code}"
+
+        tabs = tabs_response.json()
+        if not tabs:
+            return "❌ No browser tabs found"
+
+        tab_info = f"✅ Chrome DevTools accessible<br>Found {len(tabs)} tabs:<br>"
+        for i, tab in enumerate(tabs):
+            url = tab.get("url", "No URL")
+            title = tab.get("title", "No title")
+            tab_info += f"  Tab {i + 1}: {title} - {url}<br>"
+
+        return tab_info
+
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+
+@app.route("/test-live-stream")
+def test_live_stream():
+    """
+    Test endpoint to verify live streaming setup.
+    """
+    return f"""
+    <html>
+    <body style="font-family: monospace; background: #1a1a1a; color: #fff; padding: 20px;">
+        <h2>🎥 Browser Automation Viewers</h2>
+        
+        <h3>📺 Live Viewers (Minimal UI):</h3>
+        <ul>
+            <li><a href="/live-stream/test-session" target="_blank" style="color: #4CAF50;">🔴 Live Stream (Real-time)</a></li>
+            <li><a href="/screencast/test-session" target="_blank" style="color: #2196F3;">📸 Screenshots (Fallback)</a></li>
+            <li><a href="/replay/test-session" target="_blank" style="color: #ff9800;">📹 Replay (Saved Screenshots)</a></li>
+        </ul>
+        
+        <h3>🛠️ Debug Viewers (Full UI):</h3>
+        <ul>
+            <li><a href="/debug-live/test-session" target="_blank" style="color: #4CAF50;">Live Stream Debug</a></li>
+            <li><a href="/debug-screencast/test-session" target="_blank" style="color: #2196F3;">Screenshots Debug</a></li>
+        </ul>
+        
+        <h3>🔌 APIs:</h3>
+        <ul>
+            <li><a href="/api/live-stream/test-session" target="_blank" style="color: #ff9800;">Raw Live Stream API</a></li>
+            <li><a href="/api/task-instances" target="_blank" style="color: #9c27b0;">All Task Instances</a></li>
+            <li><a href="/api/task-ready/test-session" target="_blank" style="color: #e91e63;">Task Readiness Check</a></li>
+            <li><a href="/api/task-events/test-session" target="_blank" style="color: #e91e63;">Task Lifecycle Events</a></li>
+            <li><a href="/api/live-stream/test-session/stats" target="_blank" style="color: #ff9800;">Live Stream Flow Control</a></li>
+            <li><a href="/api/task-screenshots/test-session" target="_blank" style="color: #795548;">Task Screenshots List</a></li>
+            <li><a href="/api/artifacts" target="_blank" style="color: #607d8b;">Artifact Disk Usage</a></li>
+            <li><a href="/metrics" target="_blank" style="color: #607d8b;">Prometheus Metrics</a></li>
+        </ul>
+        
+        <h3>✨ Features:</h3>
+        <ul style="color: #ccc; line-height: 1.6;">
+            <li>🔄 <strong>Smart Loading:</strong> Detects when browser is ready</li>
+            <li>📱 <strong>Minimal UI:</strong> Full-screen browser content only</li>
             <li>🎯 <strong>Auto-Fallback:</strong> Live stream → Screenshots if needed</li>
             <li>💾 <strong>Auto-Save:</strong> All frames saved for replay</li>
             <li>🎮 <strong>Replay Controls:</strong> Play, pause, seek, speed control</li>
@@ -1014,556 +3801,418 @@ def get_task_instance(task_id):
 def check_task_ready(task_id):
     """
     Check if a Chrome browser is ready for the given task.
+    Answered from the lifecycle state machine without contacting Chrome. Pass
+    ?version=<n>&wait=<seconds> to long-poll until the state moves past version n.
     """
-    # Check if task exists in our instances
-    if task_id not in task_chrome_instances:
-        return jsonify(
-            {
-                "ready": False,
-                "status": "not_started",
-                "message": "Browser is starting up...",
-            }
-        )
+    version = request.args.get("version", type=int)
+    wait = task_ready_wait(version, request.args.get("wait", 0, type=float))
+    if wait:
+        wait_for_task_state(task_id, version, wait)
+    return jsonify(describe_task_readiness(task_id))
 
-    instance = task_chrome_instances[task_id]
-    port = instance.get("port")
-    status = instance.get("status", "unknown")
 
-    if status != "running":
-        return jsonify(
-            {"ready": False, "status": status, "message": "Browser is starting up..."}
-        )
+@app.route("/api/task-events/<task_id>")
+def stream_task_events(task_id):
+    """
+    Server-sent events for a task's lifecycle transitions. Sends the current
+    state immediately, then every transition until the task is done. 404 for
+    a task that was never queued (or has been forgotten).
+    """
+    from flask import Response
 
-    # Check if Chrome DevTools is actually accessible
-    try:
-        tabs_response = requests.get(f"http://localhost:{port}/json/list", timeout=2)
-        if tabs_response.ok:
-            tabs = tabs_response.json()
-            if tabs:
-                return jsonify(
-                    {
-                        "ready": True,
-                        "status": "ready",
-                        "message": "Browser is ready",
-                        "tabs_count": len(tabs),
-                    }
-                )
-            else:
-                return jsonify(
-                    {
-                        "ready": False,
-                        "status": "no_tabs",
-                        "message": "Browser starting, no tabs yet...",
-                    }
-                )
-        else:
-            return jsonify(
-                {
-                    "ready": False,
-                    "status": "not_accessible",
-                    "message": "Browser starting up...",
-                }
-            )
-    except Exception:
-        return jsonify(
-            {
-                "ready": False,
-                "status": "connecting",
-                "message": "Browser starting up...",
-            }
-        )
+    if not is_task_known(task_id):
+        return jsonify({"error": "Task not found"}), 404
+
+    def generate_events():
+        version, done = 0, False
+        while not done:
+            transitions = wait_for_task_state(task_id, version, TASK_EVENTS_WAIT_SECONDS)
+            events, version, done = lifecycle_stream_round(task_id, version, transitions)
+            for event in events:
+                yield sse_message(event)
+
+    return Response(
+        generate_events(),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 @app.route("/api/task-screenshots/<task_id>")
 def get_task_screenshots(task_id):
     """
     Get list of saved screenshots for a task.
+    Supports incremental polling with ?since=<frame number> and ?limit=<n>;
+    responses carry an ETag so unchanged listings are answered with 304.
     """
-    screenshots_dir = os.path.join(os.getcwd(), task_id)
-
-    if not os.path.exists(screenshots_dir):
-        return jsonify(
-            {
-                "screenshots": [],
-                "total": 0,
-                "message": "No screenshots found for this task",
-            }
-        )
-
     try:
-        # Get all screenshot files
-        screenshot_files = []
-        for filename in os.listdir(screenshots_dir):
-            if filename.startswith("screenshot_") and filename.endswith(".png"):
-                file_path = os.path.join(screenshots_dir, filename)
-                file_stat = os.stat(file_path)
-
-                # Extract number from filename
-                try:
-                    number = int(
-                        filename.replace("screenshot_", "").replace(".png", "")
-                    )
-                except ValueError:
-                    number = 0
-
-                screenshot_files.append(
-                    {
-                        "filename": filename,
-                        "number": number,
-                        "size": file_stat.st_size,
-                        "created": file_stat.st_mtime,
-                        "url": f"/api/task-screenshots/{task_id}/{filename}",
-                    }
-                )
-
-        # Sort by number
-        screenshot_files.sort(key=lambda x: x["number"])
-
-        return jsonify(
-            {
-                "screenshots": screenshot_files,
-                "total": len(screenshot_files),
-                "task_id": task_id,
-            }
-        )
+        since = request.args.get("since", type=int)
+        limit = request.args.get("limit", type=int)
+
+        manifest = get_task_manifest(task_id)
+        with manifests_lock:
+            # One validator per view: the same manifest state gives a different
+            # body for every since/limit
+            etag = f"{manifest['generation']}-{len(manifest['numbers'])}-{since}-{limit}"
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            start = (
+                bisect.bisect_right(manifest["numbers"], since)
+                if since is not None
+                else 0
+            )
+            end = start + limit if limit is not None and limit >= 0 else None
+            screenshot_files = manifest["frames"][start:end]
+            total = len(manifest["numbers"])
+            last_frame = manifest["numbers"][-1] if total else None
+            has_more = end is not None and end < total
+
+        if total == 0:
+            response = jsonify(
+                {
+                    "screenshots": [],
+                    "total": 0,
+                    "message": "No screenshots found for this task",
+                }
+            )
+        else:
+            touch_task_artifacts(task_id)
+            response = jsonify(
+                {
+                    "screenshots": screenshot_files,
+                    "total": total,
+                    "task_id": task_id,
+                    "last_frame": last_frame,
+                    "has_more": has_more,
+                    "next_since": screenshot_files[-1]["number"]
+                    if screenshot_files
+                    else since,
+                }
+            )
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e), "screenshots": [], "total": 0}), 500
 
 
+def _frame_generation(task_id: str):
+    """
+    The ?g= generation of a frame or thumbnail request: None if absent, False
+    if it names frames that were evicted (their numbers may be reused).
+    """
+    generation = request.args.get("g")
+    if generation is None:
+        return None
+    return generation if generation == get_task_manifest(task_id)["generation"] else False
+
+
+def _set_frame_caching(response, generation):
+    # Only generation-qualified URLs are immutable; bare ones revalidate (ETag)
+    if generation:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = FRAME_CACHE_MAX_AGE_SECONDS
+        response.cache_control.immutable = True
+        response.cache_control.public = True
+    else:
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    return response
+
+
 @app.route("/api/task-screenshots/<task_id>/<filename>")
 def get_task_screenshot_file(task_id, filename):
     """
     Serve a specific screenshot file for a task.
     """
-    screenshots_dir = os.path.join(os.getcwd(), task_id)
+    screenshots_dir = get_task_frames_dir(task_id)
     file_path = os.path.join(screenshots_dir, filename)
+    generation = _frame_generation(task_id)
 
-    if not os.path.exists(file_path) or not filename.endswith(".png"):
+    if not os.path.exists(file_path) or not filename.endswith(".png") or generation is False:
         return jsonify({"error": "Screenshot not found"}), 404
 
     try:
-        return send_file(file_path, mimetype="image/png", as_attachment=False)
+        touch_task_artifacts(task_id)
+        # Strong validator plus conditional (304) and Range (206) handling via
+        # send_file; long-lived only under the manifest generation
+        file_stat = os.stat(file_path)
+        response = send_file(
+            file_path,
+            mimetype="image/png",
+            as_attachment=False,
+            conditional=True,
+            etag=f"{filename}-{file_stat.st_size}-{file_stat.st_mtime_ns}",
+        )
+        return _set_frame_caching(response, generation)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/live-stream/<session_id>")
-def start_live_stream(session_id):
+@app.route("/api/task-screenshots/<task_id>/thumbs/<int:number>")
+def get_task_screenshot_thumbnail(task_id, number):
     """
-    Start a live WebSocket stream of browser frames using Chrome DevTools screencast.
+    Serve the low-resolution thumbnail of a frame, generating it if it isn't ready yet.
     """
-    from flask import Response
-    import json
-    import threading
-    import queue
-    import websocket
-
-    def generate_frames():
-        try:
-            # Check if task exists and get port
-            if session_id not in task_chrome_instances:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Browser not started yet. Please wait...'})}\n\n"
-                return
-
-            instance = task_chrome_instances[session_id]
-            cdp_port = instance.get("port")
-            status = instance.get("status")
+    try:
+        generation = _frame_generation(task_id)
+        thumb_path = generate_thumbnail(task_id, number) if generation is not False else None
+        if not thumb_path:
+            return jsonify({"error": "Screenshot not found"}), 404
+        touch_task_artifacts(task_id)
+        response = send_file(
+            thumb_path,
+            mimetype="image/jpeg",
+            as_attachment=False,
+            conditional=True,
+        )
+        return _set_frame_caching(response, generation)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            if status != "running":
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Browser is still starting up...'})}\n\n"
-                return
 
-            # Get list of tabs
-            tabs_response = requests.get(
-                f"http://localhost:{cdp_port}/json/list", timeout=5
-            )
-            if not tabs_response.ok:
-                yield f"data: {json.dumps({'type': 'error', 'message': f'Cannot connect to browser on port {cdp_port}'})}\n\n"
-                return
+@app.route("/api/task-screenshots/<task_id>/sprites")
+def get_task_sprite_index(task_id):
+    """
+    Describe the sprite sheet layout so clients can map a frame number to a cell.
+    """
+    manifest = get_task_manifest(task_id)
+    with manifests_lock:
+        last_frame = manifest["numbers"][-1] if manifest["numbers"] else 0
+        generation = manifest["generation"]
+    segments = -(-last_frame // SPRITE_SEGMENT_FRAMES)
+    return jsonify(
+        {
+            "task_id": task_id,
+            "segment_frames": SPRITE_SEGMENT_FRAMES,
+            "columns": SPRITE_COLUMNS,
+            "thumb_width": THUMBNAIL_WIDTH,
+            "thumb_height": THUMBNAIL_HEIGHT,
+            "last_frame": last_frame,
+            "sprites": [
+                f"/api/task-screenshots/{task_id}/sprites/{segment}?g={generation}"
+                for segment in range(segments)
+            ],
+        }
+    )
 
-            tabs = tabs_response.json()
-            if not tabs:
-                yield f"data: {json.dumps({'error': 'No browser tabs found'})}\n\n"
-                return
 
-            # Find the best tab (job application pages preferred)
-            target_tab = None
-            for tab in tabs:
-                url = tab.get("url", "")
-                if any(
-                    keyword in url.lower()
-                    for keyword in ["job", "application", "career", "apply", "ashby"]
-                ):
-                    target_tab = tab
-                    break
-
-            if not target_tab:
-                # Fallback to first non-blank tab
-                for tab in tabs:
-                    url = tab.get("url", "")
-                    if url and not url.startswith("chrome://") and url != "about:blank":
-                        target_tab = tab
-                        break
+@app.route("/api/task-screenshots/<task_id>/sprites/<int:segment>")
+def get_task_sprite(task_id, segment):
+    """
+    Serve the sprite sheet for a segment of frames. Segments with every frame
+    present are immutable under their generation URL; others are rebuilt while
+    frames keep arriving.
+    """
+    try:
+        generation = _frame_generation(task_id)
+        manifest = get_task_manifest(task_id)
+        with manifests_lock:
+            next_number = manifest["next_number"]
+            frame_count = len(manifest["numbers"])
+            segment_count = segment_frame_count(manifest, segment)
+            current_generation = manifest["generation"]
+        numbers = segment_frame_numbers(segment)
+        if not frame_count or numbers[0] >= next_number or generation is False:
+            return jsonify({"error": "Sprite not found"}), 404
+
+        touch_task_artifacts(task_id)
+        complete = segment_count == len(numbers)
+        etag = (
+            f"sprite-{current_generation}-{segment}-complete"
+            if complete
+            else f"sprite-{current_generation}-{segment}-{segment_count}"
+        )
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
 
-            if not target_tab:
-                target_tab = tabs[0]
+        response = app.response_class(
+            build_sprite_sheet(task_id, segment), mimetype="image/jpeg"
+        )
+        response.set_etag(etag)
+        return _set_frame_caching(response, generation if complete else None)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            ws_url = target_tab.get("webSocketDebuggerUrl")
-            if not ws_url:
-                yield f"data: {json.dumps({'error': 'No WebSocket URL available for browser tab'})}\n\n"
-                return
 
-            # Frame counter for saving
-            frame_count = 0
-            frame_queue = queue.Queue()
+@app.route("/metrics")
+def get_metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    lines = []
+    for metric in metrics_registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n", 200, {"Content-Type": "text/plain; version=0.0.4"}
 
-            def on_message(ws, message):
-                nonlocal frame_count
-                try:
-                    data = json.loads(message)
 
-                    # Handle response to Page.startScreencast
-                    if data.get("id") == 2 and "error" in data:
-                        frame_queue.put(
-                            {
-                                "type": "error",
-                                "message": f"Screencast start failed: {data['error']['message']}",
-                            }
-                        )
+@app.route("/api/artifacts")
+def get_artifact_usage():
+    """
+    Report disk usage of task artifacts against the configured budgets.
+    """
+    try:
+        return jsonify(collect_artifact_usage())
+    except Exception as e:
+        logging.error(f"Error collecting artifact usage: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
-                    # Handle screencast frames
-                    elif data.get("method") == "Page.screencastFrame":
-                        params = data.get("params", {})
-                        frame_data = params.get("data")
-                        session_id_cdp = params.get("sessionId")
-
-                        if frame_data:
-                            frame_count += 1
-
-                            # Save frame to disk for replay
-                            screenshots_dir = os.path.join(os.getcwd(), session_id)
-                            os.makedirs(screenshots_dir, exist_ok=True)
-                            frame_path = os.path.join(
-                                screenshots_dir, f"screenshot_{frame_count}.png"
-                            )
-                            try:
-                                image_data = base64.b64decode(frame_data)
-                                with open(frame_path, "wb") as f:
-                                    f.write(image_data)
-                            except Exception:
-                                pass  # Ignore save errors, continue streaming
-
-                            # Send frame to client
-                            frame_info = {
-                                "type": "frame",
-                                "data": frame_data,
-                                "frame_number": frame_count,
-                                "timestamp": time.time(),
-                                "metadata": {
-                                    "width": params.get("metadata", {}).get(
-                                        "screenWidth"
-                                    ),
-                                    "height": params.get("metadata", {}).get(
-                                        "screenHeight"
-                                    ),
-                                },
-                            }
-                            frame_queue.put(frame_info)
 
-                            # Acknowledge the frame
-                            if session_id_cdp:
-                                ack_payload = {
-                                    "id": frame_count + 1000,
-                                    "method": "Page.screencastFrameAck",
-                                    "params": {"sessionId": session_id_cdp},
-                                }
-                                ws.send(json.dumps(ack_payload))
+@app.route("/api/artifacts/sweep", methods=["POST"])
+def trigger_artifact_sweep():
+    """
+    Run an artifact eviction pass immediately.
+    """
+    try:
+        return jsonify(sweep_artifacts())
+    except Exception as e:
+        logging.error(f"Error sweeping artifacts: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
-                except Exception as e:
-                    frame_queue.put({"type": "error", "message": str(e)})
-
-            def on_error(ws, error):
-                frame_queue.put({"type": "error", "message": str(error)})
-
-            def on_open(ws):
-                # Enable Page domain first
-                enable_page_payload = {"id": 1, "method": "Page.enable"}
-                ws.send(json.dumps(enable_page_payload))
-
-                # Start screencast
-                start_screencast_payload = {
-                    "id": 2,
-                    "method": "Page.startScreencast",
-                    "params": {
-                        "format": "png",
-                        "quality": 80,
-                        "maxWidth": 1920,
-                        "maxHeight": 1080,
-                        "everyNthFrame": 1,  # Send every frame
-                    },
-                }
-                ws.send(json.dumps(start_screencast_payload))
 
-                # Send initial status
-                frame_queue.put(
-                    {
-                        "type": "status",
-                        "message": "Live stream started",
-                        "tab_url": target_tab.get("url", ""),
-                        "tab_title": target_tab.get("title", ""),
-                    }
-                )
+@app.route("/api/live-stream/<session_id>")
+def start_live_stream(session_id):
+    """
+    Start a live WebSocket stream of browser frames using Chrome DevTools screencast.
+    Every viewer subscribes to the task's shared screencast, which follows the
+    agent's active tab.
+    """
+    from flask import Response
 
-            # Start WebSocket in a separate thread
-            ws = websocket.WebSocketApp(
-                ws_url, on_message=on_message, on_error=on_error, on_open=on_open
-            )
+    def generate_frames():
+        screencast = None
+        frame_buffer = FrameBuffer()
+        try:
+            screencast, error = open_live_screencast(session_id)
+            if error:
+                yield sse_message({"type": "error", "message": error})
+                return
 
-            ws_thread = threading.Thread(target=ws.run_forever)
-            ws_thread.daemon = True
-            ws_thread.start()
+            cdp_client.run(screencast.subscribe(frame_buffer), timeout=15)
 
             # Stream frames to client
-            while True:
-                try:
-                    # Get frame from queue (blocking with timeout)
-                    frame_data = frame_queue.get(timeout=30)  # 30 second timeout
-                    yield f"data: {json.dumps(frame_data)}\n\n"
-
-                    if frame_data.get("type") == "error":
-                        break
-
-                except queue.Empty:
-                    # Send keepalive
-                    yield f"data: {json.dumps({'type': 'keepalive', 'timestamp': time.time()})}\n\n"
-                except Exception as e:
-                    print(f"❌ Error in frame streaming: {e}")
-                    break
-
-            # Cleanup
-            try:
-                # Stop screencast
-                stop_payload = {"id": 999, "method": "Page.stopScreencast"}
-                ws.send(json.dumps(stop_payload))
-                ws.close()
-            except:
-                pass
+            ended = False
+            while not ended:
+                payload, ended = live_stream_round(
+                    frame_buffer.get(timeout=LIVE_STREAM_KEEPALIVE_SECONDS)
+                )
+                yield sse_message(payload)
 
         except Exception as e:
             print(f"❌ Live stream error: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield sse_message({"type": "error", "message": str(e)})
+
+        finally:
+            # Cleanup
+            if screencast:
+                try:
+                    cdp_client.run(screencast.unsubscribe(frame_buffer), timeout=5)
+                except Exception:
+                    pass
 
     return Response(
         generate_frames(),
         mimetype="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Cache-Control",
-        },
+        headers=SSE_HEADERS,
     )
 
 
-@app.route("/api/screenshot/<session_id>")
-def get_screenshot(session_id):
+@app.route("/api/live-stream/<session_id>/stats")
+def get_live_stream_stats(session_id):
     """
-    Take a single screenshot of the Chrome browser (fallback method).
+    Flow-control metrics for a task's screencast: frames received/acked from
+    Chrome, the frame policy with measured live/recording rates and, per
+    connected viewer, buffer depth and dropped frames.
     """
-    try:
-        # Get the port for this specific task
-        cdp_port = None
-        if session_id in task_chrome_instances:
-            cdp_port = task_chrome_instances[session_id]["port"]
-        else:
-            # Fallback to standard port
-            cdp_port = 9222
-
-        # Get list of tabs/pages
-        tabs_response = requests.get(
-            f"http://localhost:{cdp_port}/json/list", timeout=5
-        )
-        if not tabs_response.ok:
-            return jsonify(
-                {
-                    "error": f"Failed to connect to Chrome DevTools on port {cdp_port}. Make sure Chrome is running with --remote-debugging-port=9222"
-                }
-            ), 500
-
-        tabs = tabs_response.json()
-        if not tabs:
-            return jsonify(
-                {
-                    "error": "No browser tabs found. The browser session may not have started yet."
-                }
-            ), 404
-
-        # Find the most relevant tab (prefer job application pages)
-        target_tab = None
-        for tab in tabs:
-            url = tab.get("url", "")
-            title = tab.get("title", "")
-            # Prefer job application pages
-            if url and (
-                "job" in url.lower()
-                or "application" in url.lower()
-                or "ashby" in url.lower()
-            ):
-                target_tab = tab
-                break
-
-        # If no job pages found, skip chrome:// and about: pages
-        if not target_tab:
-            for tab in tabs:
-                url = tab.get("url", "")
-                if (
-                    url
-                    and not url.startswith("about:")
-                    and not url.startswith("chrome://")
-                ):
-                    target_tab = tab
-                    break
-
-        # If still no suitable tab, use the first available tab
-        if not target_tab and tabs:
-            target_tab = tabs[0]
-
-        if not target_tab:
-            return jsonify({"error": "No suitable browser tab found"}), 404
-
-        # Use Chrome DevTools REST API to take screenshot
-        tab_id = target_tab["id"]
-        screenshot_url = f"http://localhost:{cdp_port}/json/runtime/evaluate"
-
-        # JavaScript to take screenshot via DevTools
-        js_code = """
-        new Promise((resolve) => {
-            chrome.debugger.sendCommand({tabId: arguments[0]}, "Page.captureScreenshot", {
-                format: "png",
-                quality: 80,
-                fromSurface: true
-            }, (result) => {
-                resolve(result ? result.data : null);
-            });
-        })
-        """
-
-        # Alternative: Direct CDP call
-        screenshot_response = requests.post(
-            screenshot_url,
-            json={
-                "expression": f"""
-                (async () => {{
-                    const response = await fetch('http://localhost:{cdp_port}/json/runtime/evaluate', {{
-                        method: 'POST',
-                        headers: {{'Content-Type': 'application/json'}},
-                        body: JSON.stringify({{
-                            expression: "document.documentElement.scrollHeight",
-                            contextId: 1
-                        }})
-                    }});
-                    return 'ready';
-                }})()
-                """
-            },
-            timeout=10,
-        )
-
-        # Simple approach: Use WebSocket for screenshot
-        try:
-            import websocket
-            import threading
-
-            ws_url = target_tab.get("webSocketDebuggerUrl")
-            if not ws_url:
-                return jsonify(
-                    {"error": "WebSocket URL not available for the selected tab"}
-                ), 500
-
-            screenshot_data = None
-            screenshot_error = None
-            screenshot_done = threading.Event()
+    with screencasts_lock:
+        screencast = task_screencasts.get(session_id)
+    if not screencast:
+        return jsonify(
+            {"error": "No live stream for this task", "policy": get_frame_policy(session_id)}
+        ), 404
+    return jsonify(screencast.stats())
 
-            def on_message(ws, message):
-                nonlocal screenshot_data, screenshot_error
-                try:
-                    data = json.loads(message)
-                    if data.get("id") == 123 and "result" in data:
-                        if "data" in data["result"]:
-                            screenshot_data = data["result"]["data"]
-                            screenshot_done.set()
-                        else:
-                            screenshot_error = "No screenshot data in response"
-                            screenshot_done.set()
-                    elif data.get("id") == 123 and "error" in data:
-                        screenshot_error = data["error"]["message"]
-                        screenshot_done.set()
-                except Exception as e:
-                    screenshot_error = str(e)
-                    screenshot_done.set()
-
-            def on_error(ws, error):
-                nonlocal screenshot_error
-                screenshot_error = str(error)
-                screenshot_done.set()
-
-            def on_open(ws):
-                # Send screenshot command with unique ID
-                screenshot_cmd = {
-                    "id": 123,
-                    "method": "Page.captureScreenshot",
-                    "params": {"format": "png", "quality": 80},
-                }
-                ws.send(json.dumps(screenshot_cmd))
 
-            # Create WebSocket connection
-            ws = websocket.WebSocketApp(
-                ws_url, on_message=on_message, on_error=on_error, on_open=on_open
+@app.route("/api/screenshot/<session_id>")
+def get_screenshot(session_id):
+    """
+    Take a single screenshot of the Chrome browser (fallback method).
+    Answered from the latest screencast frame when one is fresher than max_age_ms,
+    otherwise captured over the page's shared CDP session. Optional query
+    params: format (png/jpeg/webp), quality (0-100, jpeg/webp only), scale (0-1]
+    and max_age_ms.
+    """
+    try:
+        image_format = request.args.get("format", SCREENSHOT_FORMAT).lower()
+        if image_format not in ("png", "jpeg", "webp"):
+            return jsonify({"error": f"Unsupported screenshot format: {image_format}"}), 400
+        quality = request.args.get("quality", SCREENSHOT_QUALITY, type=int)
+        scale = request.args.get("scale", SCREENSHOT_SCALE, type=float)
+        if not 0 < scale <= 1:
+            return jsonify({"error": "scale must be between 0 and 1"}), 400
+
+        # A running screencast already holds a fresh frame: no need to ask Chrome
+        max_age_ms = request.args.get(
+            "max_age_ms", SCREENSHOT_MAX_FRAME_AGE_MS, type=int
+        )
+        latest_frame = get_latest_frame(session_id, max_age_ms)
+        if latest_frame:
+            response = send_file(
+                io.BytesIO(encode_frame(latest_frame, image_format, quality, scale)),
+                mimetype=f"image/{image_format}",
+                as_attachment=False,
             )
+            response.cache_control.no_store = True
+            response.headers["X-Frame-Source"] = "screencast"
+            response.headers["X-Frame-Age-Ms"] = str(
+                int((time.time() - latest_frame["timestamp"]) * 1000)
+            )
+            response.headers["X-Frame-Size"] = (
+                f"{latest_frame['width']}x{latest_frame['height']}"
+            )
+            return response
+
+        image_data = None
+        for attempt in range(2):
+            try:
+                session = get_task_page_session(session_id)
+            except LookupError as e:
+                return jsonify({"error": str(e)}), 404
+            except (requests.RequestException, OSError) as e:
+                return jsonify({"error": f"Failed to connect to Chrome: {str(e)}"}), 500
 
-            # Run WebSocket in a thread
-            ws_thread = threading.Thread(target=ws.run_forever)
-            ws_thread.daemon = True
-            ws_thread.start()
-
-            # Wait for screenshot (with timeout)
-            if screenshot_done.wait(timeout=10):
-                ws.close()
-                if screenshot_error:
-                    logging.error(f"Screenshot WebSocket error: {screenshot_error}")
-                    return jsonify(
-                        {"error": f"Screenshot failed: {screenshot_error}"}
-                    ), 500
-                if not screenshot_data:
-                    return jsonify({"error": "No screenshot data received"}), 500
-
-                # Decode base64 image data
-                image_data = base64.b64decode(screenshot_data)
-
-                # Create image response
-                return send_file(
-                    io.BytesIO(image_data), mimetype="image/png", as_attachment=False
+            try:
+                image_data = cdp_client.run(
+                    capture_screenshot(session, image_format, quality, scale), timeout=20
                 )
-            else:
-                ws.close()
+                break
+            except TimeoutError:
                 return jsonify(
                     {"error": "Screenshot timeout - browser may not be responding"}
                 ), 500
+            except CDPError as e:
+                logging.error(f"Screenshot CDP error: {str(e)}")
+                return jsonify({"error": f"Screenshot failed: {str(e)}"}), 500
+            except ConnectionError as e:
+                # The tab went away; reconnect to a fresh target once
+                if attempt:
+                    return jsonify({"error": f"Screenshot failed: {str(e)}"}), 500
+
+        response = send_file(
+            io.BytesIO(image_data),
+            mimetype=f"image/{image_format}",
+            as_attachment=False,
+        )
+        response.cache_control.no_store = True
+        response.headers["X-Frame-Source"] = "capture"
+        return response
 
-        except ImportError:
-            return jsonify(
-                {
-                    "error": "WebSocket library not available. Install websocket-client: pip install websocket-client"
-                }
-            ), 500
-        except Exception as e:
-            logging.error(f"Screenshot WebSocket exception: {str(e)}")
-            return jsonify({"error": f"Screenshot error: {str(e)}"}), 500
-
-    except requests.RequestException as e:
-        logging.error(f"Screenshot endpoint - Request error: {str(e)}")
-        return jsonify({"error": f"Failed to connect to Chrome: {str(e)}"}), 500
     except Exception as e:
         logging.error(f"Screenshot endpoint - Unexpected error: {str(e)}")
         import traceback
@@ -1590,6 +4239,16 @@ def apply_job():
         max_steps = data.get("max_steps", 100)
         resume_url = data.get("resume_url", "")
         profile = data.get("profile", "")
+        try:
+            frame_policy = parse_frame_policy(data.get("frame_policy") or {})
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            budget = parse_task_budget(data.get("budget") or {})
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        lean = bool(data.get("lean", False))
+        block_resources = bool(data.get("block_resources", False))
 
         # Using local browser automation - no external services required
 
@@ -1603,6 +4262,13 @@ def apply_job():
             "status": "starting",
             "created_at": threading.current_thread().ident,
         }
+        if frame_policy:
+            task_frame_policies[task_id] = frame_policy
+        if lean:
+            lean_tasks[task_id] = {"block_resources": block_resources}
+        if budget:
+            task_budgets[task_id] = budget
+        set_task_state(task_id, "queued", "Task queued")
 
         # Start the agent task in the background using thread executor
         def run_async_task():
@@ -1621,12 +4287,16 @@ def apply_job():
                 )
             except Exception as e:
                 logging.error(f"Background task {task_id} failed: {str(e)}")
-                task_results[task_id] = {
-                    "status": "failed",
-                    "message": "Job application failed",
-                    "result": None,
-                    "error": str(e),
-                }
+                set_task_result(
+                    task_id,
+                    {
+                        "status": "failed",
+                        "message": "Job application failed",
+                        "result": None,
+                        "error": str(e),
+                    },
+                )
+                set_task_state(task_id, "done", "Job application failed", outcome="failed")
                 # Update session status
                 if task_id in active_sessions:
                     active_sessions[task_id]["status"] = "failed"
@@ -1647,6 +4317,13 @@ def apply_job():
                 "live_url": live_stream_url,  # Primary: Real-time live stream
                 "fallback_url": screencast_url,  # Fallback: Screenshot-based
                 "replay_url": replay_url,  # Replay: View saved screenshots
+                "frame_policy": get_frame_policy(task_id),
+                "mode": "lean" if lean else "standard",
+                "budget": {
+                    "max_steps": max_steps,
+                    "max_tokens": budget.get("max_tokens", TASK_MAX_TOKENS),
+                    "max_seconds": budget.get("max_seconds", TASK_MAX_SECONDS),
+                },
                 "status": "started",
                 "message": "Job application process started in background. Use the live_url for real-time streaming, fallback_url for screenshots, or replay_url to view saved screenshots.",
             }
@@ -1659,6 +4336,99 @@ def apply_job():
 
 # Global dictionary to store task results
 task_results = {}
+BULK_STATUS_MAX_IDS = 1000
+
+# Change cursor for bulk status queries: any status, lifecycle or step change
+# of a task stamps it with the next value of a global sequence
+task_change_seqs = {}
+task_change_lock = threading.Lock()
+task_change_cursor = 0
+
+
+def mark_task_changed(task_id: str):
+    global task_change_cursor
+    with task_change_lock:
+        task_change_cursor += 1
+        task_change_seqs[task_id] = (task_change_cursor, time.time())
+
+
+def set_task_result(task_id: str, result: dict):
+    """
+    Replace a task's status entry and record the change for bulk polling.
+    """
+    task_results[task_id] = result
+    mark_task_changed(task_id)
+
+
+def build_task_status_row(task_id: str) -> dict:
+    """
+    Compact status row for dashboards (no agent result payload).
+    """
+    result = task_results.get(task_id, {})
+    with lifecycle_condition:
+        lifecycle = task_lifecycles.get(task_id)
+        state = lifecycle["state"] if lifecycle else None
+        outcome = lifecycle["history"][-1].get("outcome") if lifecycle else None
+    with progress_condition:
+        progress = task_progress.get(task_id)
+        steps = progress["steps"] if progress else 0
+    seq, updated_at = task_change_seqs.get(task_id, (0, None))
+    return {
+        "task_id": task_id,
+        "status": result.get("status") or state,
+        "state": state,
+        "outcome": outcome,
+        "steps": steps,
+        "message": result.get("message"),
+        "error": result.get("error"),
+        "has_result": result.get("result") is not None,
+        "updated_at": updated_at,
+        "seq": seq,
+    }
+
+
+# Finished tasks' in-memory state is dropped this long after their last change
+TASK_RETENTION_SECONDS = float(os.getenv("TASK_RETENTION_HOURS", "24")) * 3600
+
+
+def prune_finished_tasks() -> list:
+    """
+    Forget finished tasks whose last change is older than
+    TASK_RETENTION_SECONDS: status, lifecycle, progress, trace, budget and
+    policies. Bulk status then reports them as missing; their frames on disk
+    are left to the artifact sweeper. Returns the pruned task ids.
+    """
+    cutoff = time.time() - TASK_RETENTION_SECONDS
+    with task_change_lock:
+        stale = [
+            task_id
+            for task_id, (_, changed_at) in task_change_seqs.items()
+            if changed_at < cutoff
+        ]
+    pruned = []
+    for task_id in stale:
+        with lifecycle_condition:
+            state = (task_lifecycles.get(task_id) or {}).get("state")
+        if state not in (None, "done") or is_task_in_flight(task_id):
+            continue
+        with task_change_lock:
+            task_change_seqs.pop(task_id, None)
+        with lifecycle_condition:
+            task_lifecycles.pop(task_id, None)
+        with progress_condition:
+            task_progress.pop(task_id, None)
+        with traces_lock:
+            task_traces.pop(task_id, None)
+        task_results.pop(task_id, None)
+        task_budgets.pop(task_id, None)
+        task_frame_policies.pop(task_id, None)
+        lean_tasks.pop(task_id, None)
+        active_sessions.pop(task_id, None)
+        drop_latest_frame(task_id)
+        pruned.append(task_id)
+    if pruned:
+        print(f"🧹 Forgot {len(pruned)} finished tasks")
+    return pruned
 
 
 async def run_agent_background(
@@ -1674,14 +4444,19 @@ async def run_agent_background(
     """
     Run the agent in the background and store results.
     """
+    current_task_id.set(task_id)
+    span = start_span("task", "task", link=link)
     try:
         # Update task status
-        task_results[task_id] = {
-            "status": "running",
-            "message": "Agent is processing the job application...",
-            "result": None,
-            "error": None,
-        }
+        set_task_result(
+            task_id,
+            {
+                "status": "running",
+                "message": "Agent is processing the job application...",
+                "result": None,
+                "error": None,
+            },
+        )
 
         # Run the agent
         result = await run_agent(
@@ -1696,23 +4471,44 @@ async def run_agent_background(
         )
 
         # Update task status with result
-        task_results[task_id] = {
-            "status": "completed",
-            "message": "Job application completed successfully",
-            "result": result,
-            "error": None,
-        }
+        set_task_result(
+            task_id,
+            {
+                "status": "completed",
+                "message": "Job application completed successfully",
+                "result": result,
+                "error": None,
+            },
+        )
+        set_task_state(
+            task_id,
+            "done",
+            "Job application finished",
+            outcome="budget_exceeded"
+            if (result.get("budget") or {}).get("exceeded")
+            else "failed"
+            if result.get("error")
+            else "completed",
+        )
 
     except Exception as e:
         # Update task status with error
-        task_results[task_id] = {
-            "status": "failed",
-            "message": "Job application failed",
-            "result": None,
-            "error": str(e),
-        }
+        set_task_result(
+            task_id,
+            {
+                "status": "failed",
+                "message": "Job application failed",
+                "result": None,
+                "error": str(e),
+            },
+        )
+        set_task_state(task_id, "done", "Job application failed", outcome="failed")
         logging.error(f"Background task {task_id} failed: {str(e)}")
 
+    finally:
+        await asyncio.to_thread(release_task_cdp, task_id)
+        end_span(span, outcome=task_results.get(task_id, {}).get("status"))
+
 
 async def run_agent(
     task_id,
@@ -1727,14 +4523,17 @@ async def run_agent(
     print(
         f"Running agent with task_id: {task_id}, link: {link}, additional_information: {additional_information}, headless: {headless}, max_steps: {max_steps}"
     )
+    current_task_id.set(task_id)
 
     try:
         # Start Chrome with task-specific tracking
-        process, port = await start_chrome_with_debug_port(task_id=task_id)
+        with trace_span("chrome.start", "chrome"):
+            process, port = await start_chrome_with_debug_port(task_id=task_id)
         actual_cdp_url = f"http://localhost:{port}"
 
         # Step 2: Connect Playwright to the same Chrome instance
-        await connect_playwright_to_cdp(actual_cdp_url)
+        with trace_span("playwright.connect", "phase"):
+            await connect_playwright_to_cdp(actual_cdp_url)
 
         # Step 3: Create Browser-Use session connected to same Chrome
         # Note: BrowserSession will use the same Chrome instance via CDP
@@ -1744,19 +4543,24 @@ async def run_agent(
         local_resume_path = None
         if resume_url and resume_url.strip():
             try:
-                local_resume_path = download_resume(resume_url)
+                with timed(RESUME_DOWNLOAD_SECONDS), trace_span("resume.download"):
+                    local_resume_path = download_resume(resume_url)
+                register_task_artifact(task_id, resume_path=local_resume_path)
                 print(f"✅ Resume downloaded successfully to: {local_resume_path}")
             except Exception as e:
                 error_msg = f"❌ Failed to download resume from {resume_url}: {str(e)}"
                 print(error_msg)
                 logging.error(error_msg)
                 # Update task status with error
-                task_results[task_id] = {
-                    "status": "failed",
-                    "message": "Resume download failed",
-                    "result": None,
-                    "error": str(e),
-                }
+                set_task_result(
+                    task_id,
+                    {
+                        "status": "failed",
+                        "message": "Resume download failed",
+                        "result": None,
+                        "error": str(e),
+                    },
+                )
                 # Clean up Chrome instance
                 if task_id in task_chrome_instances:
                     instance = task_chrome_instances[task_id]
@@ -1778,16 +4582,48 @@ async def run_agent(
             error_msg = "❌ Resume URL is required but not provided"
             print(error_msg)
             logging.error(error_msg)
-            task_results[task_id] = {
-                "status": "failed",
-                "message": "Resume URL not provided",
-                "result": None,
-                "error": "Resume URL is required",
-            }
+            set_task_result(
+                task_id,
+                {
+                    "status": "failed",
+                    "message": "Resume URL not provided",
+                    "result": None,
+                    "error": "Resume URL is required",
+                },
+            )
             raise ValueError("Resume URL is required")
 
+        # Open the job page, fill the standard profile fields if it already
+        # shows the application form, then replay the cached plan for this
+        # form structure, if there is one
+        set_task_state(task_id, "navigating", f"Opening {link}", url=link)
+        fields = profile_fields(profile)
+        page_open = await open_job_page(link)
+        form_open = page_open and await find_application_form(link)
+        prefilled = await run_prefill(task_id, fields) if form_open else []
+        form_plan = await run_form_plan(task_id, link, fields, local_resume_path, page_open)
+
+        # The profile goes into every step's prompt, so send its compact form
+        profile_prompt = compact_profile(profile)
+        PROFILE_PROMPT_CHARS.inc(profile_prompt["raw_chars"], form="raw")
+        PROFILE_PROMPT_CHARS.inc(profile_prompt["compact_chars"], form="compact")
+        if not profile_prompt["cached"]:
+            print(
+                f"🗜️  Profile {profile_prompt['hash']}: {profile_prompt['raw_chars']} -> {profile_prompt['compact_chars']} chars"
+            )
+        profile_text = profile_prompt["text"]
+
         # Create the agent task with resume path if available
-        task_text = f"Please go to {link} and complete the application process using this information. Here are the infos about the user: \n{profile} \nAdditional information: {additional_information}"
+        done_steps = [
+            f"filled {item['label']!r} with the user's {item['field']}" for item in prefilled
+        ] + [describe_step(step, fields) for step in form_plan["done"]]
+        # Only a page left on a partly filled form is handed over as is; a
+        # posting page the agent opens itself from the link
+        if done_steps:
+            done = "; ".join(done_steps)
+            task_text = f"The application form at {link} is already open in the current tab. These steps were already done, don't redo or change them: {done}. Only handle the remaining fields and questions, then submit, using this information. Here are the infos about the user: \n{profile_text} \nAdditional information: {additional_information}"
+        else:
+            task_text = f"Please go to {link} and complete the application process using this information. Here are the infos about the user: \n{profile_text} \nAdditional information: {additional_information}"
         if local_resume_path:
             task_text += f" If you need to upload a resume file, use the file at: {local_resume_path}. Only upload the resume file when it is a required field. Use the 'playwright_file_upload' action to upload the resume file."
         else:
@@ -1796,20 +4632,67 @@ async def run_agent(
 
         task_text += " If an answer is not available, please infer it if it is a required field otherwise skip it."
 
+        llm = TieredChatModel(
+            [create_agent_llm(model) for model in AGENT_MODEL_TIERS],
+            AGENT_TIER_COOLDOWN_STEPS,
+            AGENT_TIER_ESCALATE_AFTER_FAILURES,
+            on_change=lambda tier, model, reason: report_model_tier(task_id, tier, model, reason),
+        )
+        report_model_tier(task_id, 0, llm.model, "start")
+        agent_llm = InstrumentedChatModel(
+            llm,
+            lambda latency_ms, usage, model: record_llm_call(task_id, latency_ms, usage, model),
+        )
+        if LLM_REPLAY:
+            # Outermost, so replayed answers are not counted as model calls
+            agent_llm = ReplayChatModel(
+                agent_llm,
+                llm_replay_cache,
+                task_id,
+                substitutions={"{{resume_path}}": local_resume_path},
+                on_lookup=lambda hit: record_llm_replay(task_id, hit),
+            )
         agent = Agent(
             task=task_text,
-            llm=ChatOpenAI(model="gpt-5-mini"),
+            llm=agent_llm,
             browser_session=browser_session,
             tools=tools,
+            # A partly filled form must not be reloaded
+            directly_open_url=not done_steps,
         )
 
-        result = await agent.run()
+        budget = start_task_budget(task_id)
+        on_step_start, on_step_end = make_step_hooks(task_id, llm)
+        with trace_span("agent.run", "agent"):
+            result = await run_agent_within_budget(
+                task_id,
+                agent,
+                max_steps=max_steps,
+                on_step_start=on_step_start,
+                on_step_end=on_step_end,
+            )
+        finish_task_budget(task_id)
+        save_form_plan(task_id, link, form_plan, result, fields)
+        with progress_condition:
+            progress = _get_task_progress(task_id)
+            budget_summary = summarize_task_budget(task_id, progress)
+            blocked = dict(progress.get("blocked") or {}) or None
 
         # Clean up downloaded resume file
         if local_resume_path:
             cleanup_resume(local_resume_path)
 
-        return {"result": str(result)}
+        if is_lean_task(task_id):
+            summary = await capture_summary_screenshot(task_id)
+            outcome = {"result": str(result), "summary_screenshot": summary}
+        else:
+            outcome = {"result": str(result)}
+        outcome.update(
+            prefilled=prefilled, form_plan=form_plan, budget=budget_summary, blocked=blocked
+        )
+        if budget["exceeded"]:
+            outcome["error"] = f"Stopped early: {budget['exceeded']} budget exhausted"
+        return outcome
 
     except Exception as e:
         logging.error(f"Error in run_agent: {str(e)}")
@@ -1819,6 +4702,164 @@ async def run_agent(
         return {"error": str(e)}
 
 
+# Cached form plans: the action sequence of a successful run per form
+# structure, replayed with Playwright (up to the submit) on the next
+# application to the same form. Off by default
+FORM_PLAN_CACHE = os.getenv("FORM_PLAN_CACHE", "false").lower() in ("1", "true", "yes", "on")
+form_plan_cache = FormPlanCache(
+    os.getenv("FORM_PLAN_CACHE_PATH") or os.path.join(os.path.dirname(__file__), "form_plans.json"),
+    int(os.getenv("FORM_PLAN_MAX_ENTRIES", "500")),
+    float(os.getenv("FORM_PLAN_MAX_DIVERGENCE_RATE", "0.5")),
+)
+
+
+# Pre-fill pass: standard profile fields (name, email, phone, links, location)
+# filled in one script call per frame before the agent starts
+PREFILL_FIELDS = os.getenv("PREFILL_FIELDS", "true").lower() not in ("0", "false", "no", "off")
+
+
+async def open_job_page(link: str) -> bool:
+    """
+    Load the job page in the Playwright tab ahead of the agent, so pre-fill and
+    form plans can work on it. False if it could not be opened.
+    """
+    if not playwright_page or not (PREFILL_FIELDS or FORM_PLAN_CACHE):
+        return False
+    try:
+        with trace_span("page.open", url=link):
+            await playwright_page.goto(link, wait_until="domcontentloaded", timeout=30000)
+            try:
+                await playwright_page.wait_for_load_state("networkidle", timeout=5000)
+            except Exception:
+                pass
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not open {link} before the agent: {e}")
+        return False
+
+
+async def find_application_form(link: str) -> bool:
+    """
+    Whether the opened job page already shows the application form, so the
+    pre-fill pass does not type into a posting's search or newsletter inputs.
+    """
+    try:
+        with trace_span("page.form_check") as span:
+            found = await has_application_form(playwright_page)
+            end_span(span, found=found)
+    except Exception as e:
+        print(f"⚠️  Could not look for a form on {link}: {e}")
+        return False
+    if not found:
+        print(f"📄 No application form on {link} yet, leaving it to the agent")
+    return found
+
+
+async def run_prefill(task_id: str, fields: dict) -> list:
+    """
+    Fill the standard fields the open page has from the profile. Returns the
+    inputs filled ({field, label, selector}).
+    """
+    if not PREFILL_FIELDS:
+        return []
+    with trace_span("prefill") as span:
+        try:
+            prefilled = await prefill_page(playwright_page, fields)
+        except Exception as e:
+            print(f"⚠️  Pre-fill failed: {e}")
+            prefilled = []
+        end_span(span, fields=[item["field"] for item in prefilled])
+    for item in prefilled:
+        PREFILLED_FIELDS.inc(field=item["field"])
+    if prefilled:
+        print(f"✏️  Pre-filled {len(prefilled)} fields: {', '.join(item['field'] for item in prefilled)}")
+    with progress_condition:
+        _get_task_progress(task_id)["prefilled"] = prefilled
+    publish_progress_event(task_id, {"type": "prefill", "fields": prefilled})
+    return prefilled
+
+
+def report_form_plan(task_id: str, form_plan: dict):
+    """
+    Show the task's form plan outcome in its progress and /task-status.
+    """
+    summary = {key: value for key, value in form_plan.items() if key != "done"}
+    summary["replayed"] = len(form_plan["done"])
+    with progress_condition:
+        _get_task_progress(task_id)["form_plan"] = summary
+    publish_progress_event(task_id, {"type": "form_plan", **summary})
+
+
+async def run_form_plan(
+    task_id: str, link: str, fields: dict, resume_path: str, page_open: bool
+) -> dict:
+    """
+    Fingerprint the open job page's form and replay the cached plan for it.
+    Returns the fingerprint, the outcome (disabled, miss, needs_agent or
+    diverged) and the steps done, which the agent must not repeat. The agent
+    always submits the form itself.
+    """
+    form_plan = {"fingerprint": None, "outcome": "disabled", "done": []}
+    if not FORM_PLAN_CACHE or not page_open:
+        return form_plan
+    try:
+        with trace_span("form_plan.fingerprint"):
+            form_plan["fingerprint"] = await fingerprint_page(playwright_page)
+    except Exception as e:
+        print(f"⚠️  Could not fingerprint {link}: {e}")
+        return form_plan
+
+    plan = form_plan_cache.get(form_plan["fingerprint"])
+    if plan is None:
+        form_plan["outcome"] = "miss"
+    else:
+        print(f"📋 Replaying cached form plan {plan['fingerprint']} ({len(plan['steps'])} steps)")
+        set_task_state(task_id, "running", "Replaying cached form plan", fingerprint=plan["fingerprint"])
+        with trace_span("form_plan.replay", steps=len(plan["steps"])) as span:
+            replay = await replay_form_plan(playwright_page, plan["steps"], fields, resume_path)
+            end_span(span, outcome=replay["outcome"], replayed=replay["replayed"])
+        if form_plan_cache.record(plan["fingerprint"], replay["outcome"]):
+            print(f"🗑️  Dropped form plan {plan['fingerprint']}: it keeps diverging")
+        form_plan["outcome"] = replay["outcome"]
+        form_plan["done"] = plan["steps"][: replay["replayed"]]
+        if replay.get("error"):
+            form_plan["error"] = replay["error"]
+        print(f"📋 Form plan replay {replay['outcome']} after {replay['replayed']} steps")
+    FORM_PLAN_LOOKUPS.inc(outcome=form_plan["outcome"])
+    report_form_plan(task_id, form_plan)
+    return form_plan
+
+
+def save_form_plan(task_id: str, link: str, form_plan: dict, history, fields: dict):
+    """
+    Cache the steps of a successful run (replayed part plus the agent's own
+    actions) under the form's fingerprint.
+    """
+    if not form_plan["fingerprint"] or not history.is_done() or not history.is_successful():
+        return
+    steps = form_plan["done"] + extract_plan_steps(history, fields, link)
+    if any(step["op"] != "ask" for step in steps):
+        form_plan_cache.put(form_plan["fingerprint"], link, steps, task_id)
+        print(f"📋 Cached form plan {form_plan['fingerprint']} ({len(steps)} steps)")
+
+
+async def capture_summary_screenshot(task_id: str):
+    """
+    The one frame a lean task keeps: the final page, saved like a replay frame.
+    Returns its URL, or None if it could not be taken.
+    """
+    try:
+        session = await asyncio.to_thread(get_task_page_session, task_id)
+        image_data = await cdp_client.call(
+            capture_screenshot(session, "png", SCREENSHOT_QUALITY, 1.0)
+        )
+        entry = await asyncio.to_thread(record_task_frame, task_id, image_data)
+        return entry["url"] if entry else None
+    except Exception as e:
+        print(f"⚠️  Summary screenshot failed for task {task_id}: {e}")
+        return None
+
+
 @app.route("/task-status/<task_id>", methods=["GET"])
 def get_task_status(task_id):
     """
@@ -1828,13 +4869,170 @@ def get_task_status(task_id):
         if task_id not in task_results:
             return jsonify({"error": "Task not found"}), 404
 
-        return jsonify(task_results[task_id])
+        return jsonify(
+            {**task_results[task_id], "progress": summarize_task_progress(task_id)}
+        )
 
     except Exception as e:
         logging.error(f"Error getting task status: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/task-status", methods=["GET", "POST"])
+def get_bulk_task_status():
+    """
+    Status rows for many tasks in one request. Task ids come from ?ids=a,b,c or a
+    JSON body {"ids": [...], "since": <cursor>}. With since, only tasks changed
+    after that cursor are returned; without ids, all known tasks are considered.
+    The response's cursor is passed back as since on the next refresh.
+    """
+    try:
+        body = (request.get_json(silent=True) or {}) if request.method == "POST" else {}
+        if not isinstance(body, dict):
+            return jsonify({"error": "Body must be a JSON object"}), 400
+        ids = body.get("ids")
+        if ids is None and request.args.get("ids"):
+            ids = [i for i in request.args["ids"].split(",") if i]
+        try:
+            since = int(body["since"] if "since" in body else request.args.get("since", 0) or 0)
+        except (TypeError, ValueError):
+            return jsonify({"error": "since must be a cursor number"}), 400
+
+        if ids is not None and not (
+            isinstance(ids, list) and all(isinstance(task_id, str) for task_id in ids)
+        ):
+            return jsonify({"error": "ids must be a list of task ids"}), 400
+        if ids is not None and len(ids) > BULK_STATUS_MAX_IDS:
+            return jsonify(
+                {"error": f"Too many task ids (max {BULK_STATUS_MAX_IDS})"}
+            ), 400
+
+        # Read the cursor first so changes racing with this request show up next time
+        with task_change_lock:
+            cursor = task_change_cursor
+            changes = dict(task_change_seqs)
+
+        candidates = ids if ids is not None else list(changes)
+        rows = []
+        missing = []
+        for task_id in candidates:
+            if task_id not in changes:
+                missing.append(task_id)
+                continue
+            if changes[task_id][0] <= since:
+                continue
+            rows.append(build_task_status_row(task_id))
+
+        return jsonify(
+            {"tasks": rows, "missing": missing, "cursor": max(cursor, since)}
+        )
+
+    except Exception as e:
+        logging.error(f"Error getting bulk task status: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/task-status/<task_id>/steps", methods=["GET"])
+def get_task_steps(task_id):
+    """
+    Buffered step events for a task, optionally only those after ?since=<seq>.
+    """
+    since = request.args.get("since", 0, type=int)
+    return jsonify(
+        {
+            "task_id": task_id,
+            "events": get_progress_events(task_id, since),
+            "progress": summarize_task_progress(task_id),
+        }
+    )
+
+
+@app.route("/task-status/<task_id>/events", methods=["GET"])
+def stream_task_steps(task_id):
+    """
+    Server-sent events with per-step agent progress. Replays the ring buffer
+    (from Last-Event-ID if the client reconnects) and closes when the task is done.
+    """
+    from flask import Response
+
+    last_seq = progress_stream_cursor(
+        request.headers.get("Last-Event-ID"), request.args.get("since")
+    )
+
+    def generate_events():
+        seq, done = last_seq, False
+        while not done:
+            events = wait_for_progress(task_id, seq, TASK_EVENTS_WAIT_SECONDS)
+            messages, seq, done = progress_stream_round(task_id, seq, events)
+            for event_id, payload in messages:
+                yield sse_message(payload, event_id)
+
+    return Response(
+        generate_events(),
+        mimetype="text/event-stream",
+        headers=PROGRESS_SSE_HEADERS,
+    )
+
+
+@app.route("/task-status/<task_id>/trace", methods=["GET"])
+def get_task_trace(task_id):
+    """
+    Download the task's timeline (Chrome startup, Playwright connect, resume
+    download, agent steps, LLM calls, upload waits) as a Chrome trace file for
+    chrome://tracing or ui.perfetto.dev.
+    """
+    trace = build_chrome_trace(task_id)
+    if trace is None:
+        return jsonify({"error": "No trace recorded for this task"}), 404
+    response = jsonify(trace)
+    response.headers["Content-Disposition"] = f'attachment; filename="trace-{task_id}.json"'
+    return response
+
+
+@app.route("/api/form-plans", methods=["GET"])
+def get_form_plans():
+    """
+    Cached form plans (without their steps), most recently used first.
+    """
+    return jsonify({"enabled": FORM_PLAN_CACHE, "plans": form_plan_cache.summary()})
+
+
+@app.route("/api/form-plans/<fingerprint>", methods=["DELETE"])
+def delete_form_plan(fingerprint):
+    """
+    Drop a cached plan, e.g. one that keeps diverging after a form change.
+    """
+    if not form_plan_cache.delete(fingerprint):
+        return jsonify({"error": "Form plan not found"}), 404
+    return jsonify({"deleted": fingerprint})
+
+
+@app.route("/api/llm-replay", methods=["GET"])
+def get_llm_replay():
+    """
+    Size of the LLM recording cache.
+    """
+    return jsonify({"enabled": LLM_REPLAY, **llm_replay_cache.summary()})
+
+
+@app.route("/api/llm-replay", methods=["DELETE"])
+def clear_llm_replay():
+    """
+    Drop all LLM recordings, e.g. after a prompt or model change.
+    """
+    return jsonify({"deleted": llm_replay_cache.clear()})
+
+
+@app.route("/api/trace-phases", methods=["GET"])
+def get_trace_phases():
+    """
+    Where task time goes, aggregated over all traced tasks (or ?ids=a,b).
+    """
+    ids = request.args.get("ids")
+    task_ids = {i.strip() for i in ids.split(",") if i.strip()} if ids else None
+    return jsonify(summarize_trace_phases(task_ids))
+
+
 @app.route("/stop-task/<task_id>", methods=["POST"])
 def stop_task(task_id):
     """
@@ -1849,6 +5047,8 @@ def stop_task(task_id):
         if task_id in task_results:
             task_results[task_id]["status"] = "stopped"
             task_results[task_id]["message"] = "Task stopped by user"
+            mark_task_changed(task_id)
+        set_task_state(task_id, "done", "Task stopped by user", outcome="stopped")
 
         # Stop Chrome instance if running
         if task_id in task_chrome_instances:
@@ -1872,6 +5072,11 @@ def stop_task(task_id):
 
             # Clean up the instance
             del task_chrome_instances[task_id]
+            close_task_screencast(task_id)
+            close_target_tracker(task_id)
+            close_request_blocker(task_id)
+            close_task_cdp_sessions(instance["port"])
+            drop_latest_frame(task_id)
             print(f"✅ Cleaned up Chrome instance for task {task_id}")
 
         return jsonify(
@@ -1887,5 +5092,279 @@ def stop_task(task_id):
         return jsonify({"error": str(e)}), 500
 
 
+# Async serving mode (SERVER_MODE=async). Streaming and long-poll routes are
+# served natively on aiohttp so an open stream costs a coroutine rather than
+# a thread; every other route is handed to the Flask app through a WSGI
+# bridge running on a bounded thread pool.
+SERVER_MODE = os.getenv("SERVER_MODE", "flask")
+ASYNC_WSGI_THREADS = int(os.getenv("ASYNC_WSGI_THREADS", "16"))
+# Body chunks a Flask worker may run ahead of a slow client
+WSGI_STREAM_CHUNKS = 8
+wsgi_executor = None
+
+
+def _query_number(request, name: str, cast, default=None):
+    try:
+        return cast(request.query[name])
+    except (KeyError, ValueError):
+        return default
+
+
+async def open_event_stream(request, headers: dict = None) -> web.StreamResponse:
+    response = web.StreamResponse(
+        headers={**(headers or SSE_HEADERS), "Content-Type": "text/event-stream"}
+    )
+    await response.prepare(request)
+    return response
+
+
+async def send_event(response: web.StreamResponse, payload: dict, event_id=None):
+    await response.write(sse_message(payload, event_id).encode())
+
+
+def _run_wsgi(environ: dict, loop, queue: asyncio.Queue, disconnected: threading.Event):
+    """
+    Run one request through the Flask app on a worker thread, handing the
+    status line and then each body chunk to the event loop as it is produced.
+    The bounded queue keeps a file download or a generator from running ahead
+    of the client; once the client is gone the iterable is closed.
+    """
+    started = {}
+
+    def send(item) -> bool:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=1)
+                return True
+            except FutureTimeoutError:
+                if disconnected.is_set():
+                    future.cancel()
+                    return False
+
+    def write(chunk) -> bool:
+        if "sent" not in started:
+            started["sent"] = True
+            if not send(("start", started["status"], started["headers"])):
+                return False
+        return not chunk or send(("chunk", chunk))
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = status
+        started["headers"] = headers
+        return write
+
+    try:
+        result = app(environ, start_response)
+    except Exception as e:
+        send(("error", e))
+        return
+    try:
+        for chunk in result:
+            if not write(chunk):
+                return
+        if write(b""):
+            send(("end",))
+    except Exception as e:
+        logging.exception(f"Error streaming {environ.get('PATH_INFO')}")
+        send(("error", e))
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+async def handle_wsgi(request: web.Request) -> web.StreamResponse:
+    """
+    Bridge an aiohttp request to the Flask app, streaming the response body.
+    """
+    payload = await request.read()
+    environ = {
+        "REQUEST_METHOD": request.method,
+        "SCRIPT_NAME": "",
+        "PATH_INFO": request.path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": request.query_string,
+        "SERVER_NAME": request.url.host or "localhost",
+        "SERVER_PORT": str(request.url.port or 80),
+        "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+        "REMOTE_ADDR": request.remote or "",
+        "CONTENT_LENGTH": str(len(payload)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": request.scheme,
+        "wsgi.input": io.BytesIO(payload),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in request.headers.items():
+        key = name.upper().replace("-", "_")
+        if key == "CONTENT_LENGTH":
+            continue
+        if key != "CONTENT_TYPE":
+            key = f"HTTP_{key}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=WSGI_STREAM_CHUNKS)
+    disconnected = threading.Event()
+    loop.run_in_executor(wsgi_executor, _run_wsgi, environ, loop, queue, disconnected)
+    try:
+        kind, *item = await queue.get()
+        if kind == "error":
+            raise item[0]
+        status, headers = item
+        code, _, reason = status.partition(" ")
+        response = web.StreamResponse(status=int(code), reason=reason or None)
+        response.headers.clear()
+        for name, value in headers:
+            response.headers.add(name, value)
+        await response.prepare(request)
+        while True:
+            kind, *item = await queue.get()
+            if kind == "end":
+                break
+            if kind == "error":
+                # Headers are already out; aiohttp drops the connection
+                raise item[0]
+            await response.write(item[0])
+        await response.write_eof()
+        return response
+    finally:
+        disconnected.set()
+
+
+async def async_check_task_ready(request: web.Request) -> web.Response:
+    """
+    Async twin of /api/task-ready/<task_id>; long-polls without holding a thread.
+    """
+    task_id = request.match_info["task_id"]
+    version = _query_number(request, "version", int)
+    wait = task_ready_wait(version, _query_number(request, "wait", float, 0))
+    if wait:
+        await wait_for_task_state_async(task_id, version, wait)
+    return web.json_response(
+        describe_task_readiness(task_id), headers={"Access-Control-Allow-Origin": "*"}
+    )
+
+
+async def async_stream_task_events(request: web.Request) -> web.StreamResponse:
+    """
+    Async twin of /api/task-events/<task_id>.
+    """
+    task_id = request.match_info["task_id"]
+    if not is_task_known(task_id):
+        return web.json_response(
+            {"error": "Task not found"}, status=404, headers={"Access-Control-Allow-Origin": "*"}
+        )
+    response = await open_event_stream(request)
+    version, done = 0, False
+    try:
+        while not done:
+            transitions = await wait_for_task_state_async(task_id, version, TASK_EVENTS_WAIT_SECONDS)
+            events, version, done = lifecycle_stream_round(task_id, version, transitions)
+            for event in events:
+                await send_event(response, event)
+    except ConnectionResetError:
+        pass  # Viewer went away
+    return response
+
+
+async def async_stream_task_steps(request: web.Request) -> web.StreamResponse:
+    """
+    Async twin of /task-status/<task_id>/events.
+    """
+    task_id = request.match_info["task_id"]
+    seq = progress_stream_cursor(request.headers.get("Last-Event-ID"), request.query.get("since"))
+    response = await open_event_stream(request, PROGRESS_SSE_HEADERS)
+    done = False
+    try:
+        while not done:
+            events = await wait_for_progress_async(task_id, seq, TASK_EVENTS_WAIT_SECONDS)
+            messages, seq, done = progress_stream_round(task_id, seq, events)
+            for event_id, payload in messages:
+                await send_event(response, payload, event_id)
+    except ConnectionResetError:
+        pass  # Viewer went away
+    return response
+
+
+async def async_live_stream(request: web.Request) -> web.StreamResponse:
+    """
+    Async twin of /api/live-stream/<session_id>; subscribes to the same shared
+    screencast without holding a thread.
+    """
+    session_id = request.match_info["session_id"]
+    response = await open_event_stream(request)
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    frame_buffer = FrameBuffer(on_ready=lambda: loop.call_soon_threadsafe(ready.set))
+    screencast = None
+
+    try:
+        screencast, error = await loop.run_in_executor(None, open_live_screencast, session_id)
+        if error:
+            await send_event(response, {"type": "error", "message": error})
+            return response
+
+        await cdp_client.call(screencast.subscribe(frame_buffer))
+        ended = False
+        while not ended:
+            ready.clear()
+            frame_data = frame_buffer.get_nowait()
+            if frame_data is None:
+                try:
+                    await asyncio.wait_for(ready.wait(), LIVE_STREAM_KEEPALIVE_SECONDS)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            payload, ended = live_stream_round(frame_data)
+            await send_event(response, payload)
+
+    except ConnectionResetError:
+        pass  # Viewer went away
+    except Exception as e:
+        print(f"❌ Live stream error: {e}")
+        try:
+            await send_event(response, {"type": "error", "message": str(e)})
+        except ConnectionResetError:
+            pass
+    finally:
+        if screencast:
+            await cdp_client.call(screencast.unsubscribe(frame_buffer))
+    return response
+
+
+def create_async_app() -> web.Application:
+    """
+    aiohttp application for SERVER_MODE=async. Same URLs as the Flask app.
+    """
+    global wsgi_executor
+    wsgi_executor = ThreadPoolExecutor(
+        max_workers=ASYNC_WSGI_THREADS, thread_name_prefix="wsgi"
+    )
+    async_app = web.Application()
+    native_routes = {
+        "/api/live-stream/{session_id}": async_live_stream,
+        "/api/task-events/{task_id}": async_stream_task_events,
+        "/api/task-ready/{task_id}": async_check_task_ready,
+        "/task-status/{task_id}/events": async_stream_task_steps,
+    }
+    for path, handler in native_routes.items():
+        async_app.router.add_get(path, handler)
+        # CORS preflight is answered by Flask-CORS like every other route
+        async_app.router.add_route("OPTIONS", path, handle_wsgi)
+    # Everything else goes to Flask
+    async_app.router.add_route("*", "/{tail:.*}", handle_wsgi)
+    return async_app
+
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=3001)
+    # Under the debug reloader this module runs in the watcher process and in
+    # the serving child; only the child (WERKZEUG_RUN_MAIN) sweeps
+    if SERVER_MODE == "async" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_artifact_sweeper()
+    if SERVER_MODE == "async":
+        print(f"🚀 Serving in async mode ({ASYNC_WSGI_THREADS} threads for Flask routes)")
+        web.run_app(create_async_app(), host="0.0.0.0", port=3001)
+    else:
+        app.run(debug=True, host="0.0.0.0", port=3001)
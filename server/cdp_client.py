@@ -0,0 +1,258 @@
+"""
+Async Chrome DevTools Protocol client shared by the whole server.
+
+A CDPSession is one websocket to one DevTools target. Commands get
+auto-incremented ids and resolve futures; events are dispatched to
+subscribers. Targets attached in flat mode (Target.setAutoAttach with
+flatten) share the socket and are addressed by their session id. CDPClient keeps at most one session per target URL and runs all
+of them on a single background event loop, so Flask handlers, the aiohttp
+server and the agent's own loop can share sockets without a thread per
+connection.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+
+import aiohttp
+
+
+class CDPError(RuntimeError):
+    """
+    Error returned by Chrome for a DevTools command.
+    """
+
+
+class CDPSession:
+    """
+    One DevTools websocket. Must be used from the loop it was connected on.
+
+    At most max_pending commands are in flight at once; further callers wait
+    for a slot (within their timeout) instead of piling up on the socket.
+    """
+
+    def __init__(self, ws_url: str, max_pending: int = 32, default_timeout: float = 10):
+        self.ws_url = ws_url
+        self.default_timeout = default_timeout
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._subscribers = {}
+        self._flat_subscribers = {}
+        self._slots = asyncio.Semaphore(max_pending)
+        self._http = None
+        self._ws = None
+        self._reader = None
+        self.closed = False
+
+    async def connect(self, timeout: float = 10):
+        self._http = aiohttp.ClientSession()
+        try:
+            self._ws = await asyncio.wait_for(
+                self._http.ws_connect(self.ws_url, max_msg_size=0), timeout
+            )
+        except Exception as e:
+            await self._http.close()
+            self.closed = True
+            raise ConnectionError(f"Cannot connect to {self.ws_url}: {e}") from e
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        try:
+            async for message in self._ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                if "id" in data:
+                    future = self._pending.pop(data["id"], None)
+                    if future is None or future.done():
+                        continue
+                    if "error" in data:
+                        error = data["error"]
+                        future.set_exception(CDPError(error.get("message", str(error))))
+                    else:
+                        future.set_result(data.get("result", {}))
+                else:
+                    self._dispatch(
+                        data.get("method", ""), data.get("params", {}), data.get("sessionId")
+                    )
+        except Exception as e:
+            logging.warning(f"CDP reader for {self.ws_url} stopped: {e}")
+        finally:
+            await self._shutdown()
+
+    def _dispatch(self, method: str, params: dict, session_id: str = None):
+        if session_id is None:
+            callbacks = list(self._subscribers.get(method, ())) + list(
+                self._subscribers.get("*", ())
+            )
+            for callback in callbacks:
+                try:
+                    callback(method, params)
+                except Exception as e:
+                    logging.warning(f"CDP subscriber for {method} failed: {e}")
+        for callback in list(self._flat_subscribers.get(method, ())) + list(
+            self._flat_subscribers.get("*", ())
+        ):
+            try:
+                callback(method, params, session_id)
+            except Exception as e:
+                logging.warning(f"CDP subscriber for {method} failed: {e}")
+
+    def subscribe(self, method: str, callback, flattened: bool = False):
+        """
+        Call callback(method, params) on this session's loop for every `method`
+        event ("*" for all events) of the target itself. With flattened,
+        callback(method, params, session_id) also gets the events of attached
+        targets (session_id None for the target itself). Returns a function
+        that unsubscribes.
+        """
+        subscribers = self._flat_subscribers if flattened else self._subscribers
+        subscribers.setdefault(method, []).append(callback)
+
+        def unsubscribe():
+            callbacks = subscribers.get(method, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+        return unsubscribe
+
+    async def send(
+        self, method: str, params: dict = None, timeout: float = None, session_id: str = None
+    ):
+        """
+        Send a command (to an attached target when session_id is given) and
+        await its result. Raises TimeoutError, CDPError, or ConnectionError
+        when the socket is (or goes) away.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"CDP command {method} timed out waiting for a slot")
+        try:
+            if self.closed:
+                raise ConnectionError("CDP connection is closed")
+            message_id = next(self._ids)
+            future = loop.create_future()
+            self._pending[message_id] = future
+            message = {"id": message_id, "method": method, "params": params or {}}
+            if session_id:
+                message["sessionId"] = session_id
+            try:
+                await self._ws.send_str(json.dumps(message))
+            except Exception as e:
+                self._pending.pop(message_id, None)
+                raise ConnectionError(f"CDP connection is closed: {e}") from e
+            try:
+                return await asyncio.wait_for(future, max(0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                self._pending.pop(message_id, None)
+                raise TimeoutError(f"CDP command {method} timed out")
+        finally:
+            self._slots.release()
+
+    async def _shutdown(self):
+        if self.closed and self._ws is None:
+            return
+        self.closed = True
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(ConnectionError("CDP connection closed before response"))
+        ws, http = self._ws, self._http
+        self._ws = self._http = None
+        if ws is not None:
+            await ws.close()
+        if http is not None:
+            await http.close()
+        self._dispatch("Session.closed", {"ws_url": self.ws_url})
+
+    async def close(self):
+        await self._shutdown()
+        if self._reader and self._reader is not asyncio.current_task():
+            self._reader.cancel()
+
+
+class CDPClient:
+    """
+    Owns the shared CDP event loop (started on first use) and one session per
+    target websocket URL.
+    """
+
+    def __init__(self, **session_options):
+        self.session_options = session_options
+        self._sessions = {}
+        self._connecting = {}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, daemon=True, name="cdp-client"
+                ).start()
+            return self._loop
+
+    def run(self, coro, timeout: float = None):
+        """
+        Run a coroutine on the CDP loop from any other thread and wait for it.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def call(self, coro):
+        """
+        Await a coroutine on the CDP loop from another event loop.
+        """
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    async def session(self, ws_url: str) -> CDPSession:
+        """
+        Return the open session for ws_url, connecting if needed. CDP loop only.
+        """
+        session = self._sessions.get(ws_url)
+        if session and not session.closed:
+            return session
+        connecting = self._connecting.get(ws_url)
+        if connecting is None:
+            connecting = self.loop.create_task(
+                CDPSession(ws_url, **self.session_options).connect()
+            )
+            self._connecting[ws_url] = connecting
+            connecting.add_done_callback(lambda _: self._connecting.pop(ws_url, None))
+        session = await asyncio.shield(connecting)
+        self._sessions[ws_url] = session
+        return session
+
+    async def connect(self, ws_url: str) -> CDPSession:
+        """
+        Open a session of the caller's own, not shared with other callers, for
+        state that must go away with it (auto-attach, interception). The
+        caller closes it. CDP loop only.
+        """
+        return await CDPSession(ws_url, **self.session_options).connect()
+
+    def get_session(self, ws_url: str, timeout: float = 10) -> CDPSession:
+        return self.run(self.session(ws_url), timeout)
+
+    async def close_sessions(self, prefix: str = ""):
+        """
+        Close every session whose URL starts with prefix. CDP loop only.
+        """
+        for ws_url in [url for url in self._sessions if url.startswith(prefix)]:
+            await self._sessions.pop(ws_url).close()
@@ -0,0 +1,621 @@
+"""
+Application form helpers: structural fingerprints, cached action plans,
+profile field values, the compact profile used in prompts and the
+deterministic pre-fill of standard fields.
+
+Most applications go to a handful of ATS platforms whose forms are identical
+across companies. A form plan is the action sequence of a successful run on
+one form structure, with profile values replaced by {{field}} placeholders and
+elements addressed by stable selectors, so the next application to a form with
+the same fingerprint can be replayed with Playwright instead of reasoned
+through step by step by the agent.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+# Form controls of one frame as "tag|type|name-or-id|required" strings
+FORM_CONTROLS_SCRIPT = """() => Array.from(
+    document.querySelectorAll('input, textarea, select, button'),
+    el => [
+        el.tagName.toLowerCase(),
+        (el.getAttribute('type') || '').toLowerCase(),
+        el.getAttribute('name') || el.id || '',
+        el.required ? 1 : 0,
+    ].join('|')
+).filter(control => !control.startsWith('input|hidden|'))"""
+
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I)
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+# Profile columns that are bookkeeping, not answers to form questions
+IGNORED_PROFILE_FIELDS = {"id", "userId", "resumeUrl", "resumeUploaded", "createdAt", "updatedAt"}
+
+# Shorter prompt keys for profile columns; others keep their own name
+PROFILE_SHORT_KEYS = {
+    "firstName": "first",
+    "lastName": "last",
+    "linkedinUrl": "linkedin",
+    "githubUrl": "github",
+    "websiteUrl": "website",
+    "willingToRelocate": "relocate",
+}
+# Visa flags, folded into one "needs visa sponsorship" line
+VISA_FIELDS = {
+    "requiresEuVisa": "EU",
+    "requiresUsVisa": "US",
+    "requiresUkVisa": "UK",
+    "requiresChVisa": "CH",
+    "requiresCaVisa": "CA",
+}
+COMPACT_PROFILE_CACHE_SIZE = 256
+
+# Agent actions that don't change the form; left out of plans
+PASSIVE_ACTIONS = {
+    "done",
+    "wait",
+    "scroll",
+    "find_text",
+    "search_page",
+    "find_elements",
+    "extract",
+    "screenshot",
+    "dropdown_options",
+    "read_file",
+    "write_file",
+    "replace_file",
+    "switch",
+}
+
+STEP_TIMEOUT_MS = 5000
+
+# Standard profile fields the pre-fill pass recognizes, most specific first:
+# (field, profile keys in order of preference, autocomplete tokens, pattern
+# matched against the input's name, id, placeholder, aria-label and label)
+PREFILL_RULES = [
+    ("firstName", ["firstName"], ["given-name"], r"first[\s_-]*name|given[\s_-]*name|\bfname\b"),
+    ("lastName", ["lastName"], ["family-name"], r"last[\s_-]*name|family[\s_-]*name|surname|\blname\b"),
+    (
+        "fullName",
+        ["fullName", "name"],
+        ["name"],
+        r"^(full[\s_-]*|your[\s_-]*|legal[\s_-]*)?name\s*\*?$|_systemfield_name",
+    ),
+    ("email", ["email"], ["email"], r"e-?mail"),
+    ("phone", ["phone"], ["tel", "tel-national"], r"phone|mobile|\btel\b"),
+    ("linkedinUrl", ["linkedinUrl", "linkedin"], [], r"linked\s*in"),
+    ("githubUrl", ["githubUrl", "github"], [], r"github"),
+    ("websiteUrl", ["websiteUrl", "website"], ["url"], r"website|portfolio|personal[\s_-]*(site|url)"),
+    ("location", ["location"], ["address-level2"], r"^(current[\s_-]*)?(location|city)\b"),
+]
+
+# Profile fields a plan may store as "{{field}}": identity fields only, which
+# mean the same on every form. Short answers ("5", "yes") and free values such
+# as a city can coincide with a profile value and are left to the agent.
+# location is left out for the same reason
+TEMPLATE_FIELDS = [
+    key for field, keys, _, _ in PREFILL_RULES if field != "location" for key in keys
+]
+TEMPLATE_MIN_CHARS = 3
+
+# A plan that diverges on more than this share of its replays (once it has
+# had FORM_PLAN_MIN_REPLAYS) is dropped; the next successful run records anew
+FORM_PLAN_MIN_REPLAYS = 3
+
+# Fills empty, enabled text inputs matching a rule in one pass over a frame,
+# through the native value setter so framework-managed inputs see the change
+PREFILL_SCRIPT = r"""({rules, values}) => {
+    const setValue = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+    const textTypes = ['', 'text', 'email', 'tel', 'url', 'search'];
+    const labelOf = el => {
+        const texts = [];
+        if (el.id) {
+            const label = document.querySelector(`label[for="${CSS.escape(el.id)}"]`);
+            if (label) texts.push(label.innerText);
+        }
+        const wrapping = el.closest('label');
+        if (wrapping) texts.push(wrapping.innerText);
+        for (const id of (el.getAttribute('aria-labelledby') || '').split(/\s+/)) {
+            const labelled = id && document.getElementById(id);
+            if (labelled) texts.push(labelled.innerText);
+        }
+        return texts.map(t => t.trim()).filter(Boolean);
+    };
+    const compiled = rules.map(([field, autocomplete, pattern]) => [field, autocomplete, new RegExp(pattern, 'i')]);
+    const filled = [];
+    for (const el of document.querySelectorAll('input')) {
+        const type = (el.getAttribute('type') || '').toLowerCase();
+        if (!textTypes.includes(type) || el.disabled || el.readOnly || el.value) continue;
+        if (!el.offsetParent && getComputedStyle(el).position !== 'fixed') continue;
+        const autocomplete = (el.getAttribute('autocomplete') || '').toLowerCase().split(/\s+/).pop();
+        const labels = labelOf(el);
+        const sources = [el.name, el.id, el.placeholder, el.getAttribute('aria-label'), ...labels].filter(Boolean);
+        const rule = compiled.find(([field, tokens, pattern]) =>
+            values[field] && (tokens.includes(autocomplete) || sources.some(s => pattern.test(s.trim()))));
+        if (!rule) continue;
+        el.focus();
+        setValue.call(el, values[rule[0]]);
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+        el.blur();
+        filled.push({
+            field: rule[0],
+            label: labels[0] || el.getAttribute('aria-label') || el.placeholder || el.name || el.id,
+            selector: el.id ? `[id="${el.id}"]` : el.name ? `input[name="${el.name}"]` : null,
+        });
+    }
+    return filled;
+}"""
+
+
+# True when a frame holds an application form rather than a job posting: a
+# file input (resume upload), or one form with an email input and at least
+# three other fields
+APPLICATION_FORM_SCRIPT = """() => {
+    if (document.querySelector('input[type=file]')) return true;
+    const fillable = 'input:not([type=hidden]):not([type=submit]):not([type=button]), textarea, select';
+    return Array.from(document.forms).some(form =>
+        form.querySelector('input[type=email], input[name*=email i], input[autocomplete=email]')
+        && form.querySelectorAll(fillable).length >= 4
+    );
+}"""
+
+
+def _normalize_control(control: str) -> str:
+    # Per-company question ids and counters must not split otherwise equal forms
+    tag, input_type, rest = control.split("|", 2)
+    key, required = rest.rsplit("|", 1)
+    key = re.sub(r"\d+", "#", UUID_PATTERN.sub("*", key))
+    return "|".join((tag, input_type, key, required))
+
+
+async def fingerprint_page(page) -> str:
+    """
+    Hash of the form controls (tag, type, normalized name/id, required) in
+    every frame of the page, keyed by each frame's host.
+    """
+    parts = []
+    for frame in page.frames:
+        try:
+            controls = await frame.evaluate(FORM_CONTROLS_SCRIPT)
+        except Exception:
+            continue
+        if controls:
+            host = urlparse(frame.url).hostname or urlparse(page.url).hostname or ""
+            parts.append(host + "\n" + "\n".join(_normalize_control(c) for c in controls))
+    return hashlib.sha1("\n\n".join(parts).encode()).hexdigest()[:16]
+
+
+async def has_application_form(page) -> bool:
+    """
+    Whether any frame of the page shows an application form, as opposed to a
+    job posting whose only inputs are a search box or a newsletter signup.
+    """
+    for frame in page.frames:
+        try:
+            if await frame.evaluate(APPLICATION_FORM_SCRIPT):
+                return True
+        except Exception as e:
+            logging.debug(f"Form check skipped frame {frame.url}: {e}")
+    return False
+
+
+def _field_key(label: str) -> str:
+    words = re.findall(r"[A-Za-z0-9]+", label)
+    if not words:
+        return ""
+    return words[0].lower() + "".join(w.capitalize() for w in words[1:])
+
+
+def profile_fields(profile) -> dict:
+    """
+    Flat {field: value} view of a profile: the scalar values of a profile
+    object (or its JSON), or "Key: value" lines of free text. Adds fullName
+    when first and last name are known.
+    """
+    if isinstance(profile, str):
+        try:
+            parsed = json.loads(profile)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            profile = parsed
+        else:
+            lines = {}
+            for line in profile.splitlines():
+                key, sep, value = line.partition(":")
+                if sep and _field_key(key) and value.strip():
+                    lines[_field_key(key)] = value.strip()
+            profile = lines
+    if not isinstance(profile, dict):
+        return {}
+
+    fields = {}
+    for key, value in profile.items():
+        if key in IGNORED_PROFILE_FIELDS or isinstance(value, bool):
+            continue
+        if isinstance(value, (str, int, float)) and str(value).strip():
+            fields[key] = str(value).strip()
+    if fields.get("firstName") and fields.get("lastName"):
+        fields.setdefault("fullName", f"{fields['firstName']} {fields['lastName']}")
+    return fields
+
+
+def prefill_values(fields: dict) -> dict:
+    """
+    The value of each standard field the profile has, by PREFILL_RULES field.
+    """
+    values = {}
+    for field, keys, _, _ in PREFILL_RULES:
+        value = next((fields[key] for key in keys if fields.get(key)), None)
+        if value:
+            values[field] = value
+    return values
+
+
+async def prefill_page(page, fields: dict) -> list:
+    """
+    Fill the standard profile fields the page's frames have, one script call
+    per frame. Returns what was filled ({field, label, selector} per input).
+    """
+    values = prefill_values(fields)
+    if not values:
+        return []
+    rules = [[field, autocomplete, pattern] for field, _, autocomplete, pattern in PREFILL_RULES]
+    filled = []
+    for frame in page.frames:
+        try:
+            filled += await frame.evaluate(PREFILL_SCRIPT, {"rules": rules, "values": values})
+        except Exception as e:
+            logging.debug(f"Pre-fill skipped frame {frame.url}: {e}")
+    return filled
+
+
+def _compact_value(value) -> str:
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        parts = ((key, _compact_value(item)) for key, item in value.items())
+        return ", ".join(f"{key}={text}" for key, text in parts if text)
+    if isinstance(value, list):
+        items = [text for text in (_compact_value(item) for item in value) if text]
+        if any(isinstance(item, dict) for item in value):
+            return "".join(f"\n  - {item}" for item in items)
+        return "; ".join(items)
+    return ""
+
+
+def compact_profile_text(profile) -> str:
+    """
+    Canonical prompt form of a profile: one "key: value" line per non-empty
+    field with short keys, nested entries inlined, bookkeeping columns dropped.
+    Free-text profiles only lose blank lines and repeated whitespace.
+    """
+    if isinstance(profile, str):
+        try:
+            parsed = json.loads(profile)
+        except ValueError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            return "\n".join(" ".join(line.split()) for line in profile.splitlines() if line.strip())
+        profile = parsed
+    if not isinstance(profile, dict):
+        return _compact_value(profile)
+
+    lines, visas = [], []
+    for key, value in profile.items():
+        if key in IGNORED_PROFILE_FIELDS:
+            continue
+        if key in VISA_FIELDS:
+            if value is True:
+                visas.append(VISA_FIELDS[key])
+            continue
+        text = _compact_value(value)
+        if text:
+            separator = "" if text.startswith("\n") else " "
+            lines.append(f"{PROFILE_SHORT_KEYS.get(key, key)}:{separator}{text}")
+    if any(key in profile for key in VISA_FIELDS):
+        lines.append(f"needs visa sponsorship: {', '.join(visas) or 'none'}")
+    return "\n".join(lines)
+
+
+_compact_profiles = OrderedDict()
+_compact_profiles_lock = threading.Lock()
+
+
+def compact_profile(profile) -> dict:
+    """
+    The compact prompt form of a profile, computed once per profile hash.
+    Returns {hash, text, raw_chars, compact_chars, cached}; raw_chars is the
+    size of the profile as it used to be inlined.
+    """
+    raw = profile if isinstance(profile, str) else json.dumps(profile, sort_keys=True, default=str)
+    key = hashlib.sha1(raw.encode()).hexdigest()[:16]
+    with _compact_profiles_lock:
+        entry = _compact_profiles.get(key)
+        if entry is not None:
+            _compact_profiles.move_to_end(key)
+            return dict(entry, cached=True)
+
+    text = compact_profile_text(profile)
+    entry = {"hash": key, "text": text, "raw_chars": len(str(profile)), "compact_chars": len(text)}
+    with _compact_profiles_lock:
+        _compact_profiles[key] = entry
+        while len(_compact_profiles) > COMPACT_PROFILE_CACHE_SIZE:
+            _compact_profiles.popitem(last=False)
+    return dict(entry, cached=False)
+
+
+def template_value(value: str, fields: dict):
+    """
+    "{{field}}" when value is exactly the profile's value of one of the
+    TEMPLATE_FIELDS, else None.
+    """
+    wanted = (value or "").strip().casefold()
+    if len(wanted) < TEMPLATE_MIN_CHARS:
+        return None
+    for key in TEMPLATE_FIELDS:
+        if fields.get(key, "").casefold() == wanted:
+            return "{{" + key + "}}"
+    return None
+
+
+def render_value(template: str, fields: dict) -> str:
+    """
+    Fill a step's placeholders from the profile. KeyError if a field is missing.
+    """
+    return PLACEHOLDER_PATTERN.sub(lambda m: fields[m.group(1)], template)
+
+
+def element_selector(element):
+    """
+    Stable selector for an element the agent interacted with: id, then name,
+    then its XPath.
+    """
+    if element is None:
+        return None
+    attributes = element.attributes or {}
+    tag = (element.node_name or "").lower()
+    if attributes.get("id") and not UUID_PATTERN.search(attributes["id"]):
+        return '[id="{}"]'.format(attributes["id"].replace('"', '\\"'))
+    if attributes.get("name"):
+        return '{}[name="{}"]'.format(tag, attributes["name"].replace('"', '\\"'))
+    if element.x_path:
+        return "xpath=" + (element.x_path if element.x_path.startswith("/") else "/" + element.x_path)
+    return None
+
+
+def _same_url(a: str, b: str) -> bool:
+    return (a or "").rstrip("/") == (b or "").rstrip("/")
+
+
+def plan_step(name: str, params: dict, element, fields: dict, start_url: str):
+    """
+    The plan step for one successful agent action, None for actions that don't
+    touch the form, or an "ask" step where only the agent can decide (free
+    text that isn't a profile value, navigation elsewhere, coordinate clicks).
+    """
+    if name in PASSIVE_ACTIONS:
+        return None
+    if name == "navigate":
+        return None if _same_url(params.get("url"), start_url) else {"op": "ask", "reason": "navigate"}
+    if name == "playwright_file_upload":
+        return {"op": "upload", "selector": params.get("selector")}
+
+    selector = element_selector(element)
+    if selector is None:
+        return {"op": "ask", "reason": name}
+    if name == "upload_file":
+        return {"op": "upload", "selector": selector}
+    if name == "click":
+        return {"op": "click", "selector": selector}
+    if name in ("input", "select_dropdown"):
+        template = template_value(params.get("text"), fields)
+        if template is None:
+            return {"op": "ask", "selector": selector, "reason": "answer"}
+        return {"op": "fill" if name == "input" else "select", "selector": selector, "value": template}
+    return {"op": "ask", "reason": name}
+
+
+def extract_plan_steps(history, fields: dict, start_url: str) -> list:
+    """
+    Plan steps from a finished agent run (AgentHistoryList), skipping actions
+    that failed.
+    """
+    steps = []
+    for item in history.history:
+        if not item.model_output:
+            continue
+        actions = item.model_output.action
+        elements = (item.state.interacted_element if item.state else None) or [None] * len(actions)
+        for action, element, result in zip(actions, elements, item.result):
+            if result.error:
+                continue
+            dumped = action.model_dump(exclude_none=True, mode="json")
+            if not dumped:
+                continue
+            name, params = next(iter(dumped.items()))
+            step = plan_step(name, params or {}, element, fields, start_url)
+            if step:
+                steps.append(step)
+    return steps
+
+
+def describe_step(step: dict, fields: dict) -> str:
+    if step["op"] == "upload":
+        return f"uploaded the resume to {step['selector']}"
+    if step["op"] == "click":
+        return f"clicked {step['selector']}"
+    return f"set {step['selector']} to {render_value(step['value'], fields)!r}"
+
+
+async def _locate(page, selector: str, timeout_ms: int):
+    """
+    First element matching selector in any frame, waiting up to timeout_ms.
+    """
+    deadline = time.monotonic() + timeout_ms / 1000
+    while True:
+        for frame in page.frames:
+            try:
+                locator = frame.locator(selector)
+                if await locator.count():
+                    return locator.first
+            except Exception:
+                continue
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(0.25)
+
+
+async def replay_form_plan(page, steps: list, fields: dict, resume_path: str) -> dict:
+    """
+    Run plan steps with Playwright until the page no longer matches
+    ("diverged") or the agent has to take over ("needs_agent"): at a step only
+    the agent can do, and always before the final click. A fingerprint match
+    can still be another company's form, so submitting, and judging whether
+    the application went through, stays with the agent.
+    """
+    clicks = [number for number, step in enumerate(steps) if step["op"] == "click"]
+    submit_at = clicks[-1] if clicks else len(steps)
+    for number, step in enumerate(steps):
+        if step["op"] == "ask":
+            return {"outcome": "needs_agent", "replayed": number, "stopped_at": step}
+        if number == submit_at:
+            return {"outcome": "needs_agent", "replayed": number, "stopped_at": step, "reason": "submit"}
+        try:
+            element = await _locate(page, step["selector"], STEP_TIMEOUT_MS)
+            if element is None:
+                raise LookupError(f"{step['selector']} not found")
+            if step["op"] == "fill":
+                await element.fill(render_value(step["value"], fields), timeout=STEP_TIMEOUT_MS)
+            elif step["op"] == "select":
+                await element.select_option(label=render_value(step["value"], fields), timeout=STEP_TIMEOUT_MS)
+            elif step["op"] == "upload":
+                if not resume_path:
+                    raise LookupError("no resume to upload")
+                await element.set_input_files(resume_path, timeout=STEP_TIMEOUT_MS)
+            elif step["op"] == "click":
+                await element.click(timeout=STEP_TIMEOUT_MS)
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=STEP_TIMEOUT_MS)
+                except Exception:
+                    pass
+        except Exception as e:
+            return {"outcome": "diverged", "replayed": number, "stopped_at": step, "error": str(e)}
+    return {"outcome": "needs_agent", "replayed": len(steps), "stopped_at": None, "reason": "submit"}
+
+
+class FormPlanCache:
+    """
+    Form plans by fingerprint, least recently used evicted beyond max_entries,
+    persisted as one JSON file so they survive restarts. Plans diverging on
+    more than max_divergence_rate of their replays are dropped.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500, max_divergence_rate: float = 0.5):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_divergence_rate = max_divergence_rate
+        self._plans = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        # Caller must hold _lock
+        if self._plans is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._plans = json.load(f)
+            except FileNotFoundError:
+                self._plans = {}
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable form plan cache {self.path}: {e}")
+                self._plans = {}
+        return self._plans
+
+    def _save(self):
+        # Caller must hold _lock
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._plans, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.warning(f"Could not save form plan cache {self.path}: {e}")
+
+    def get(self, fingerprint: str):
+        with self._lock:
+            plan = self._load().get(fingerprint)
+            if plan is None:
+                return None
+            plan["last_used"] = time.time()
+            return json.loads(json.dumps(plan))
+
+    def put(self, fingerprint: str, url: str, steps: list, task_id: str = None):
+        with self._lock:
+            plans = self._load()
+            previous = plans.get(fingerprint, {})
+            now = time.time()
+            plans[fingerprint] = {
+                "fingerprint": fingerprint,
+                "host": urlparse(url).hostname,
+                "url": url,
+                "steps": steps,
+                "source_task_id": task_id,
+                "created_at": previous.get("created_at", now),
+                "updated_at": now,
+                "last_used": now,
+                "replays": previous.get("replays", 0),
+                "divergences": previous.get("divergences", 0),
+            }
+            while len(plans) > self.max_entries:
+                del plans[min(plans, key=lambda key: plans[key]["last_used"])]
+            self._save()
+
+    def record(self, fingerprint: str, outcome: str) -> bool:
+        """
+        Count a replay outcome against the plan. True if that dropped the plan
+        for diverging too often.
+        """
+        with self._lock:
+            plans = self._load()
+            plan = plans.get(fingerprint)
+            if plan is None:
+                return False
+            plan["replays"] += 1
+            if outcome == "diverged":
+                plan["divergences"] += 1
+            dropped = (
+                plan["replays"] >= FORM_PLAN_MIN_REPLAYS
+                and plan["divergences"] / plan["replays"] > self.max_divergence_rate
+            )
+            if dropped:
+                del plans[fingerprint]
+            self._save()
+            return dropped
+
+    def delete(self, fingerprint: str) -> bool:
+        with self._lock:
+            removed = self._load().pop(fingerprint, None) is not None
+            if removed:
+                self._save()
+            return removed
+
+    def summary(self) -> list:
+        with self._lock:
+            return [
+                {key: value for key, value in plan.items() if key != "steps"}
+                | {"steps": len(plan["steps"])}
+                for plan in sorted(self._load().values(), key=lambda p: -p["last_used"])
+            ]
@@ -0,0 +1,243 @@
+"""
+Record and replay of the agent's LLM calls.
+
+Every answer the agent's chat model gives is stored under a hash of the
+normalized prompt (message texts with dates, step limits, tab ids and other
+per-run noise masked). When the same prompt comes back, in a retry of a failed
+application or a benchmark rerun, the stored answer is replayed instead of
+calling the model.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from browser_use.llm.views import ChatInvokeCompletion
+
+# Per-run noise in browser_use prompts that must not change the key
+PROMPT_NOISE = [
+    (re.compile(r"Today:\d{4}-\d{2}-\d{2}"), "Today:"),
+    (re.compile(r"maximum:\d+"), "maximum:"),
+    (re.compile(r"\b(Tab|Current tab:) [0-9A-Fa-f]{4}\b"), r"\1 ####"),
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), "<uuid>"),
+    (re.compile(re.escape(tempfile.gettempdir()) + r"/[^\s'\"<>]+"), "<tmp>"),
+]
+
+
+def _message_text(message) -> str:
+    try:
+        return message.text
+    except Exception:
+        return str(getattr(message, "content", "") or "")
+
+
+def _substitute(text: str, substitutions: dict) -> str:
+    # Longest value first so a path is not masked piecewise by a prefix of it
+    for placeholder, value in sorted(substitutions.items(), key=lambda item: -len(item[1])):
+        text = text.replace(value, placeholder)
+    return text
+
+
+def _restore(text: str, substitutions: dict) -> str:
+    for placeholder, value in substitutions.items():
+        text = text.replace(placeholder, value)
+    return text
+
+
+def normalize_prompt(messages: list, substitutions: dict = None) -> str:
+    """
+    Message texts (images dropped) with per-run values masked.
+    """
+    parts = []
+    for message in messages:
+        text = _substitute(_message_text(message), substitutions or {})
+        for pattern, replacement in PROMPT_NOISE:
+            text = pattern.sub(replacement, text)
+        parts.append(f"{getattr(message, 'role', '?')}: {text}")
+    return "\n\n".join(parts)
+
+
+def prompt_key(messages: list, output_format=None, substitutions: dict = None) -> str:
+    schema = getattr(output_format, "__name__", "text") if output_format else "text"
+    normalized = normalize_prompt(messages, substitutions)
+    return hashlib.sha256(f"{schema}\n{normalized}".encode()).hexdigest()[:32]
+
+
+class LLMReplayCache:
+    """
+    Recorded responses by prompt key, one JSON file each in `directory`, least
+    recently used evicted beyond max_entries.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 5000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self) -> OrderedDict:
+        # Caller must hold _lock. Index of key -> last use, oldest first
+        if self._index is None:
+            entries = []
+            try:
+                for name in os.listdir(self.directory):
+                    if name.endswith(".json"):
+                        path = os.path.join(self.directory, name)
+                        entries.append((os.path.getmtime(path), name[: -len(".json")]))
+            except FileNotFoundError:
+                pass
+            self._index = OrderedDict((key, used) for used, key in sorted(entries))
+        return self._index
+
+    def _evict(self):
+        # Caller must hold _lock
+        index = self._load()
+        while len(index) > self.max_entries:
+            key, _ = index.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get(self, key: str):
+        with self._lock:
+            index = self._load()
+            if key not in index:
+                return None
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except Exception as e:
+                logging.warning(f"Dropping unreadable LLM recording {key}: {e}")
+                index.pop(key, None)
+                return None
+            now = time.time()
+            index[key] = now
+            index.move_to_end(key)
+            try:
+                os.utime(self._path(key), (now, now))
+            except OSError:
+                pass
+            return entry
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            index = self._load()
+            tmp_path = f"{self._path(key)}.tmp"
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(tmp_path, self._path(key))
+            except Exception as e:
+                logging.warning(f"Could not record LLM response {key}: {e}")
+                return
+            index[key] = time.time()
+            index.move_to_end(key)
+            self._evict()
+
+    def clear(self) -> int:
+        with self._lock:
+            index = self._load()
+            removed = len(index)
+            for key in list(index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            index.clear()
+            return removed
+
+    def summary(self) -> dict:
+        with self._lock:
+            index = self._load()
+            return {
+                "entries": len(index),
+                "max_entries": self.max_entries,
+                "oldest": next(iter(index.values()), None),
+                "newest": next(reversed(index.values()), None) if index else None,
+            }
+
+
+class ReplayChatModel:
+    """
+    Wraps a browser_use chat model: answers a prompt seen before from the
+    cache, records every other answer. `substitutions` maps placeholders to
+    per-task values (e.g. the resume path) so recordings stay reusable, and
+    on_lookup(hit) is called for every call.
+    """
+
+    def __init__(self, llm, cache: LLMReplayCache, task_id: str, substitutions: dict = None, on_lookup=None):
+        self.llm = llm
+        self.cache = cache
+        self.task_id = task_id
+        self.substitutions = {k: v for k, v in (substitutions or {}).items() if v}
+        self.on_lookup = on_lookup
+        self._verified_api_keys = getattr(llm, "_verified_api_keys", False)
+
+    @property
+    def model(self):
+        return self.llm.model
+
+    @property
+    def provider(self):
+        return self.llm.provider
+
+    @property
+    def name(self):
+        return self.llm.name
+
+    @property
+    def model_name(self):
+        return self.model
+
+    def _replay(self, entry: dict, output_format):
+        text = _restore(entry["completion"], self.substitutions)
+        if entry["format"] == "text":
+            return None if output_format else ChatInvokeCompletion(completion=text, usage=None)
+        if not output_format or entry["format"] != output_format.__name__:
+            return None
+        try:
+            completion = output_format.model_validate_json(text)
+        except Exception:
+            # Recorded for a different action set, e.g. another tools registry
+            return None
+        return ChatInvokeCompletion(completion=completion, usage=None)
+
+    async def ainvoke(self, messages, output_format=None, **kwargs):
+        key = prompt_key(messages, output_format, self.substitutions)
+        entry = self.cache.get(key)
+        replayed = self._replay(entry, output_format) if entry else None
+        if self.on_lookup:
+            self.on_lookup(replayed is not None)
+        if replayed is not None:
+            return replayed
+
+        result = await self.llm.ainvoke(messages, output_format, **kwargs)
+        completion = result.completion
+        self.cache.put(
+            key,
+            {
+                "format": output_format.__name__ if output_format else "text",
+                "completion": _substitute(
+                    completion if isinstance(completion, str) else completion.model_dump_json(),
+                    self.substitutions,
+                ),
+                "model": getattr(self.llm, "model", None),
+                "task_id": self.task_id,
+                "recorded_at": time.time(),
+            },
+        )
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
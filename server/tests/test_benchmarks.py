@@ -0,0 +1,72 @@
+import asyncio
+import json
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.stub_llm import StubChatModel
+
+TASK = (
+    "Please go to http://127.0.0.1:8765/ashby/acme and complete the application process. "
+    "If you need to upload a resume file, use the file at: /tmp/resume.pdf. Only upload it when required."
+)
+FORM_STATE = """[1]<input type=text id=_systemfield_name name=_systemfield_name />
+[2]<input type=email id=_systemfield_email name=_systemfield_email />
+[3]<input type=file id=_systemfield_resume name=_systemfield_resume />
+[4]<textarea id=why name=why />
+[5]<button type=submit>Submit Application</button>"""
+
+
+@pytest.fixture
+def fixture_server():
+    server = FixtureServer(port=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_stub_plays_the_application_script():
+    model = StubChatModel(latency_ms=0)
+    assert model.next_actions(TASK, "Empty page") == [
+        {"navigate": {"url": "http://127.0.0.1:8765/ashby/acme"}}
+    ]
+    assert model.next_actions(TASK, FORM_STATE) == [{"input": {"index": 1, "text": "Ada Lovelace"}}]
+    assert model.next_actions(TASK, FORM_STATE) == [{"input": {"index": 2, "text": "ada@example.com"}}]
+    assert model.next_actions(TASK, FORM_STATE)[0]["input"]["index"] == 4
+    assert model.next_actions(TASK, FORM_STATE) == [
+        {
+            "playwright_file_upload": {
+                "file_path": "/tmp/resume.pdf",
+                "selector": "#_systemfield_resume",
+            }
+        }
+    ]
+    assert model.next_actions(TASK, FORM_STATE) == [{"click": {"index": 5}}]
+    assert model.next_actions(TASK, "Application submitted")[0]["done"]["success"] is True
+
+
+def test_stub_reports_usage_without_network():
+    model = StubChatModel(latency_ms=0)
+    result = asyncio.run(model.ainvoke([type("Message", (), {"text": "hello " * 100})()]))
+    assert result.completion == "ok"
+    assert result.usage.prompt_tokens == 150
+    assert model.calls == 1
+
+
+def test_fixture_server_serves_forms_and_counts_submissions(fixture_server):
+    base = fixture_server.base_url
+    page = urlopen(f"{base}/ashby/acme").read().decode()
+    assert 'id="_systemfield_resume"' in page
+    assert "acme" in page
+    assert urlopen(f"{base}/resume.pdf").read().startswith(b"%PDF")
+
+    body = b'--x\r\nContent-Disposition: form-data; name="resume"; filename="cv.pdf"\r\n\r\n%PDF\r\n--x--\r\n'
+    confirmation = urlopen(f"{base}/submit/ashby/acme", data=body).read().decode()
+    assert "Application submitted" in confirmation
+    assert json.loads(urlopen(f"{base}/stats").read()) == {"ashby": {"submitted": 1, "with_resume": 1}}
+
+    with pytest.raises(HTTPError) as error:
+        urlopen(f"{base}/lever/acme")
+    assert error.value.code == 404
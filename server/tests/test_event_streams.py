@@ -0,0 +1,70 @@
+import pytest
+
+import bu
+
+
+@pytest.fixture
+def task():
+    task_id = "test-stream"
+    yield task_id
+    with bu.lifecycle_condition:
+        bu.task_lifecycles.pop(task_id, None)
+    with bu.progress_condition:
+        bu.task_progress.pop(task_id, None)
+    bu.task_results.pop(task_id, None)
+
+
+def test_task_ready_wait():
+    assert bu.task_ready_wait(None, 30) == 0
+    assert bu.task_ready_wait(2, 0) == 0
+    assert bu.task_ready_wait(2, 5) == 5
+    assert bu.task_ready_wait(2, 600) == bu.TASK_READY_MAX_WAIT_SECONDS
+
+
+def test_progress_stream_cursor():
+    assert bu.progress_stream_cursor("7", "3") == 7
+    assert bu.progress_stream_cursor(None, "3") == 3
+    assert bu.progress_stream_cursor("junk", None) == 0
+
+
+def test_lifecycle_stream_round(task):
+    bu.set_task_state(task, "queued")
+    events, version, done = bu.lifecycle_stream_round(task, 0, bu.wait_for_task_state(task, 0, 0))
+    assert [event["state"] for event in events] == ["queued"]
+    assert (version, done) == (1, False)
+
+    events, version, done = bu.lifecycle_stream_round(task, 1, [])
+    assert [event["type"] for event in events] == ["keepalive"]
+    assert (version, done) == (1, False)
+
+    bu.set_task_state(task, "done", outcome="success")
+    events, version, done = bu.lifecycle_stream_round(task, 1, bu.wait_for_task_state(task, 1, 0))
+    assert events[-1]["status"] == "success"
+    assert (version, done) == (2, True)
+
+
+def test_lifecycle_stream_ends_for_unknown_task():
+    events, version, done = bu.lifecycle_stream_round("test-never-queued", 0, [])
+    assert [event["type"] for event in events] == ["keepalive"]
+    assert done is True
+    assert bu.app.test_client().get("/api/task-events/test-never-queued").status_code == 404
+
+
+def test_progress_stream_round(task):
+    bu.set_task_state(task, "running")
+    bu.publish_progress_event(task, {"type": "step"})
+    messages, seq, done = bu.progress_stream_round(task, 0, bu.get_progress_events(task))
+    assert [(event_id, payload["type"]) for event_id, payload in messages] == [(1, "step")]
+    assert (seq, done) == (1, False)
+
+    messages, seq, done = bu.progress_stream_round(task, 1, [])
+    assert [payload["type"] for _, payload in messages] == ["keepalive"]
+
+    # Events published while the task finished are flushed before "done"
+    bu.publish_progress_event(task, {"type": "step"})
+    bu.task_results[task] = {"status": "completed"}
+    bu.set_task_state(task, "done")
+    messages, seq, done = bu.progress_stream_round(task, 1, [])
+    assert [(event_id, payload["type"]) for event_id, payload in messages] == [(2, "step"), (None, "done")]
+    assert messages[-1][1]["status"] == "completed"
+    assert (seq, done) == (2, True)
@@ -0,0 +1,237 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import forms
+from forms import (
+    FormPlanCache,
+    _normalize_control,
+    fingerprint_page,
+    plan_step,
+    render_value,
+    replay_form_plan,
+    template_value,
+)
+
+FIELDS = {
+    "firstName": "Ada",
+    "lastName": "Lovelace",
+    "email": "ada@example.com",
+    "yearsOfExperience": "5",
+    "location": "London",
+    "willingToRelocate": "yes",
+}
+
+
+class FakeFrame:
+    def __init__(self, url, controls):
+        self.url = url
+        self.controls = controls
+
+    async def evaluate(self, script, arg=None):
+        if isinstance(self.controls, Exception):
+            raise self.controls
+        return self.controls
+
+
+class FakeElement:
+    def __init__(self, calls, selector):
+        self.calls = calls
+        self.selector = selector
+
+    async def fill(self, value, timeout=None):
+        self.calls.append(("fill", self.selector, value))
+
+    async def select_option(self, label=None, timeout=None):
+        self.calls.append(("select", self.selector, label))
+
+    async def set_input_files(self, path, timeout=None):
+        self.calls.append(("upload", self.selector, path))
+
+    async def click(self, timeout=None):
+        self.calls.append(("click", self.selector))
+
+
+class FakePage:
+    def __init__(self, selectors):
+        self.selectors = selectors
+        self.calls = []
+
+    async def wait_for_load_state(self, state, timeout=None):
+        pass
+
+
+@pytest.fixture
+def locate(monkeypatch):
+    async def fake_locate(page, selector, timeout_ms):
+        return FakeElement(page.calls, selector) if selector in page.selectors else None
+
+    monkeypatch.setattr(forms, "_locate", fake_locate)
+
+
+def element(node_name="input", x_path=None, **attributes):
+    return SimpleNamespace(node_name=node_name, attributes=attributes, x_path=x_path)
+
+
+def test_normalize_control_masks_ids_and_counters():
+    assert _normalize_control("input|text|question_123|1") == "input|text|question_#|1"
+    assert (
+        _normalize_control("textarea||q-0a1b2c3d-aaaa-bbbb-cccc-0123456789ab|0")
+        == "textarea||q-*|0"
+    )
+
+
+def test_fingerprint_ignores_per_company_ids_and_failing_frames():
+    first = SimpleNamespace(
+        url="https://jobs.example.com/a",
+        frames=[
+            FakeFrame("https://jobs.example.com/a", ["input|text|question_11|1"]),
+            FakeFrame("about:blank", RuntimeError("detached")),
+        ],
+    )
+    second = SimpleNamespace(
+        url="https://jobs.example.com/b",
+        frames=[FakeFrame("https://jobs.example.com/b", ["input|text|question_42|1"])],
+    )
+    other_host = SimpleNamespace(
+        url="https://other.example.com/b",
+        frames=[FakeFrame("https://other.example.com/b", ["input|text|question_42|1"])],
+    )
+    assert asyncio.run(fingerprint_page(first)) == asyncio.run(fingerprint_page(second))
+    assert asyncio.run(fingerprint_page(first)) != asyncio.run(fingerprint_page(other_host))
+
+
+def test_template_and_render_value():
+    assert template_value(" ADA@example.com ", FIELDS) == "{{email}}"
+    assert template_value("Something else", FIELDS) is None
+    assert template_value("", FIELDS) is None
+    # Only identity fields, so another user's unrelated value is never replayed
+    assert template_value("5", FIELDS) is None
+    assert template_value("Yes", FIELDS) is None
+    assert template_value("London", FIELDS) is None
+    assert render_value("{{firstName}} {{lastName}}", FIELDS) == "Ada Lovelace"
+    with pytest.raises(KeyError):
+        render_value("{{phone}}", FIELDS)
+
+
+def test_plan_step():
+    start = "https://jobs.example.com/apply"
+    assert plan_step("scroll", {}, None, FIELDS, start) is None
+    assert plan_step("navigate", {"url": start + "/"}, None, FIELDS, start) is None
+    assert plan_step("navigate", {"url": "https://elsewhere.com"}, None, FIELDS, start) == {
+        "op": "ask",
+        "reason": "navigate",
+    }
+    assert plan_step("input", {"text": "Ada"}, element(id="first"), FIELDS, start) == {
+        "op": "fill",
+        "selector": '[id="first"]',
+        "value": "{{firstName}}",
+    }
+    assert plan_step("input", {"text": "Because"}, element(name="why"), FIELDS, start) == {
+        "op": "ask",
+        "selector": 'input[name="why"]',
+        "reason": "answer",
+    }
+    assert plan_step("click", {}, element("button", x_path="html/body/button"), FIELDS, start) == {
+        "op": "click",
+        "selector": "xpath=/html/body/button",
+    }
+    assert plan_step("click", {}, None, FIELDS, start) == {"op": "ask", "reason": "click"}
+
+
+def test_replay_stops_before_the_submit_click(locate):
+    page = FakePage({"#first", "#resume", "#next", "#submit"})
+    steps = [
+        {"op": "fill", "selector": "#first", "value": "{{firstName}}"},
+        {"op": "click", "selector": "#next"},
+        {"op": "upload", "selector": "#resume"},
+        {"op": "click", "selector": "#submit"},
+    ]
+    result = asyncio.run(replay_form_plan(page, steps, FIELDS, "/tmp/resume.pdf"))
+    assert result["outcome"] == "needs_agent"
+    assert result["reason"] == "submit"
+    assert result["replayed"] == 3
+    assert page.calls == [
+        ("fill", "#first", "Ada"),
+        ("click", "#next"),
+        ("upload", "#resume", "/tmp/resume.pdf"),
+    ]
+
+
+def test_replay_hands_over_at_an_ask_step(locate):
+    page = FakePage({"#first"})
+    steps = [
+        {"op": "fill", "selector": "#first", "value": "{{firstName}}"},
+        {"op": "ask", "selector": "#why", "reason": "answer"},
+    ]
+    result = asyncio.run(replay_form_plan(page, steps, FIELDS, None))
+    assert result == {"outcome": "needs_agent", "replayed": 1, "stopped_at": steps[1]}
+
+
+@pytest.mark.parametrize(
+    "step",
+    [
+        {"op": "fill", "selector": "#missing", "value": "{{firstName}}"},
+        {"op": "fill", "selector": "#first", "value": "{{phone}}"},
+        {"op": "upload", "selector": "#first"},
+    ],
+)
+def test_replay_diverges(locate, step):
+    page = FakePage({"#first"})
+    result = asyncio.run(replay_form_plan(page, [step], FIELDS, None))
+    assert result["outcome"] == "diverged"
+    assert result["replayed"] == 0
+    assert page.calls == []
+
+
+def test_form_plan_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(forms.time, "time", lambda: next(clock))
+    cache = FormPlanCache(str(tmp_path / "plans.json"), max_entries=2)
+    cache.put("a", "https://a.example.com/job", [{"op": "click", "selector": "#a"}])
+    cache.put("b", "https://b.example.com/job", [])
+    assert cache.get("a")["host"] == "a.example.com"
+    cache.put("c", "https://c.example.com/job", [])
+    assert cache.get("b") is None
+    assert {plan["fingerprint"] for plan in cache.summary()} == {"a", "c"}
+
+
+def test_form_plan_cache_persists_and_counts_outcomes(tmp_path):
+    path = tmp_path / "plans.json"
+    cache = FormPlanCache(str(path))
+    cache.put("a", "https://a.example.com/job", [{"op": "click", "selector": "#a"}], task_id="t1")
+    cache.record("a", "needs_agent")
+    cache.record("a", "diverged")
+    cache.record("missing", "diverged")
+
+    reloaded = FormPlanCache(str(path)).get("a")
+    assert reloaded["source_task_id"] == "t1"
+    assert reloaded["steps"] == [{"op": "click", "selector": "#a"}]
+    assert (reloaded["replays"], reloaded["divergences"]) == (2, 1)
+
+    # get() hands out a copy
+    reloaded["steps"].append({"op": "ask"})
+    assert len(FormPlanCache(str(path)).get("a")["steps"]) == 1
+
+    assert cache.delete("a") is True
+    assert cache.delete("a") is False
+    assert json.loads(path.read_text()) == {}
+
+
+def test_form_plan_cache_drops_plans_that_keep_diverging(tmp_path):
+    cache = FormPlanCache(str(tmp_path / "plans.json"), max_divergence_rate=0.5)
+    cache.put("a", "https://a.example.com/job", [])
+    assert cache.record("a", "diverged") is False
+    assert cache.record("a", "needs_agent") is False
+    assert cache.record("a", "needs_agent") is False
+    assert cache.record("a", "diverged") is False
+    assert cache.record("a", "diverged") is True
+    assert cache.get("a") is None
+
+
+def test_form_plan_cache_ignores_unreadable_file(tmp_path):
+    path = tmp_path / "plans.json"
+    path.write_text("{not json")
+    assert FormPlanCache(str(path)).get("a") is None
@@ -0,0 +1,102 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+
+from llm_replay import LLMReplayCache, ReplayChatModel, normalize_prompt, prompt_key
+
+
+class Answer(BaseModel):
+    text: str
+
+
+class FakeLLM:
+    model = "fake-model"
+    provider = "fake"
+    name = "fake-model"
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    async def ainvoke(self, messages, output_format=None, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(completion=self.answer)
+
+
+def message(text, role="user"):
+    return SimpleNamespace(role=role, text=text)
+
+
+def test_normalize_prompt_masks_per_run_noise():
+    first = [message("Today:2026-01-01 step 1 of maximum:30, Tab 1a2b, run 0a1b2c3d-aaaa-bbbb-cccc-0123456789ab")]
+    second = [message("Today:2026-02-03 step 1 of maximum:50, Tab ffff, run 11111111-2222-3333-4444-555555555555")]
+    assert normalize_prompt(first) == normalize_prompt(second)
+    assert prompt_key(first) == prompt_key(second)
+    assert prompt_key(first) != prompt_key([message("something else")])
+    assert prompt_key(first) != prompt_key(first, Answer)
+
+
+def test_substitutions_make_keys_reusable_across_tasks():
+    first = [message("upload /data/task-1/resume.pdf")]
+    second = [message("upload /data/task-2/resume.pdf")]
+    assert prompt_key(first, substitutions={"{{resume_path}}": "/data/task-1/resume.pdf"}) == prompt_key(
+        second, substitutions={"{{resume_path}}": "/data/task-2/resume.pdf"}
+    )
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = LLMReplayCache(str(tmp_path), max_entries=2)
+    cache.put("a", {"format": "text", "completion": "A"})
+    cache.put("b", {"format": "text", "completion": "B"})
+    assert cache.get("a")["completion"] == "A"
+    cache.put("c", {"format": "text", "completion": "C"})
+    assert cache.get("b") is None
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert cache.summary()["entries"] == 2
+
+    # A new instance rebuilds the index from the files
+    assert LLMReplayCache(str(tmp_path)).get("c")["completion"] == "C"
+    assert cache.clear() == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_drops_unreadable_recording(tmp_path):
+    (tmp_path / "bad.json").write_text("{not json")
+    cache = LLMReplayCache(str(tmp_path))
+    assert cache.get("bad") is None
+    assert cache.summary()["entries"] == 0
+
+
+def test_replay_model_records_then_replays_with_substitutions(tmp_path):
+    cache = LLMReplayCache(str(tmp_path))
+    lookups = []
+
+    first_llm = FakeLLM(Answer(text="upload /data/task-1/resume.pdf"))
+    first = ReplayChatModel(
+        first_llm, cache, "task-1", {"{{resume_path}}": "/data/task-1/resume.pdf"}, lookups.append
+    )
+    prompt = [message("Resume at /data/task-1/resume.pdf")]
+    result = asyncio.run(first.ainvoke(prompt, Answer))
+    assert result.completion.text == "upload /data/task-1/resume.pdf"
+    assert first_llm.calls == 1
+
+    second_llm = FakeLLM(Answer(text="not used"))
+    second = ReplayChatModel(
+        second_llm, cache, "task-2", {"{{resume_path}}": "/data/task-2/resume.pdf"}, lookups.append
+    )
+    replayed = asyncio.run(second.ainvoke([message("Resume at /data/task-2/resume.pdf")], Answer))
+    assert replayed.completion.text == "upload /data/task-2/resume.pdf"
+    assert second_llm.calls == 0
+    assert lookups == [False, True]
+
+
+def test_replay_model_ignores_recording_of_another_format(tmp_path):
+    cache = LLMReplayCache(str(tmp_path))
+    prompt = [message("hello")]
+    cache.put(prompt_key(prompt, Answer), {"format": "Other", "completion": "{}"})
+    llm = FakeLLM(Answer(text="fresh"))
+    result = asyncio.run(ReplayChatModel(llm, cache, "task").ainvoke(prompt, Answer))
+    assert result.completion.text == "fresh"
+    assert llm.calls == 1
@@ -0,0 +1,52 @@
+import bu
+
+
+def test_metric_render():
+    counter = bu.Metric("test_requests_total", "Requests.", "counter")
+    histogram = bu.Metric("test_latency_seconds", "Latency.", "histogram", buckets=(0.1, 1))
+    try:
+        counter.inc(route="/a")
+        counter.inc(2, route='say "hi"')
+        histogram.observe(0.5)
+        assert counter.render() == [
+            "# HELP test_requests_total Requests.",
+            "# TYPE test_requests_total counter",
+            'test_requests_total{route="/a"} 1',
+            'test_requests_total{route="say \\"hi\\""} 2',
+        ]
+        assert histogram.render()[2:] == [
+            'test_latency_seconds_bucket{le="0.1"} 0',
+            'test_latency_seconds_bucket{le="1"} 1',
+            'test_latency_seconds_bucket{le="+Inf"} 1',
+            "test_latency_seconds_sum 0.5",
+            "test_latency_seconds_count 1",
+        ]
+    finally:
+        bu.metrics_registry.remove(counter)
+        bu.metrics_registry.remove(histogram)
+
+
+def test_finished_tasks_are_pruned_after_retention(monkeypatch):
+    monkeypatch.setattr(bu, "TASK_RETENTION_SECONDS", 60)
+    for task_id in ("test-old", "test-recent", "test-running"):
+        bu.set_task_result(task_id, {"status": "completed"})
+        bu.set_task_state(task_id, "done")
+        bu.publish_progress_event(task_id, {"type": "step"})
+    bu.set_task_result("test-running", {"status": "running"})
+    with bu.task_change_lock:
+        for task_id in ("test-old", "test-running"):
+            seq, _ = bu.task_change_seqs[task_id]
+            bu.task_change_seqs[task_id] = (seq, bu.time.time() - 120)
+    try:
+        assert bu.prune_finished_tasks() == ["test-old"]
+        assert "test-old" not in bu.task_results
+        assert "test-old" not in bu.task_lifecycles
+        assert "test-old" not in bu.task_progress
+        assert "test-recent" in bu.task_results
+        assert "test-running" in bu.task_results
+    finally:
+        for task_id in ("test-recent", "test-running"):
+            bu.task_results.pop(task_id, None)
+            bu.task_lifecycles.pop(task_id, None)
+            bu.task_progress.pop(task_id, None)
+            bu.task_change_seqs.pop(task_id, None)
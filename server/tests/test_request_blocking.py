@@ -0,0 +1,66 @@
+import asyncio
+
+import bu
+
+
+def test_block_patterns():
+    assert bu.block_patterns(["Media"], ["doubleclick.net", "*.example.com/ads/*"]) == [
+        {"urlPattern": "*", "resourceType": "Media", "requestStage": "Request"},
+        {"urlPattern": "*://doubleclick.net/*", "requestStage": "Request"},
+        {"urlPattern": "*://*.doubleclick.net/*", "requestStage": "Request"},
+        {"urlPattern": "*.example.com/ads/*", "requestStage": "Request"},
+    ]
+
+
+def test_blocked_requests_are_counted_per_type_and_host():
+    task_id = "test-blocked"
+    try:
+        bu.record_blocked_request(task_id, "Script", "www.googletagmanager.com")
+        bu.record_blocked_request(task_id, "Image", "www.googletagmanager.com")
+        with bu.progress_condition:
+            blocked = bu._get_task_progress(task_id)["blocked"]
+        assert blocked == {
+            "requests": 2,
+            "by_type": {"Script": 1, "Image": 1},
+            "by_host": {"www.googletagmanager.com": 2},
+        }
+    finally:
+        with bu.progress_condition:
+            bu.task_progress.pop(task_id, None)
+
+
+class FakeSession:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, method, params=None, timeout=None, session_id=None):
+        self.sent.append((session_id, method, params["requestId"]))
+
+
+def test_blocker_lets_only_the_top_level_document_through():
+    blocker = bu.RequestBlocker.__new__(bu.RequestBlocker)
+    blocker.task_id = "test-blocker"
+    blocker.session = FakeSession()
+    blocker._targets = {
+        "S1": {"target_id": "PAGE", "type": "page"},
+        "S2": {"target_id": "FRAME", "type": "iframe"},
+    }
+    paused = [
+        ("S1", {"requestId": "r1", "resourceType": "Document", "frameId": "PAGE"}),
+        ("S1", {"requestId": "r2", "resourceType": "Document", "frameId": "CHILD"}),
+        ("S1", {"requestId": "r3", "resourceType": "Script", "frameId": "PAGE"}),
+        ("S2", {"requestId": "r4", "resourceType": "Document", "frameId": "FRAME"}),
+    ]
+    try:
+        for session_id, params in paused:
+            params["request"] = {"url": "https://www.googletagmanager.com/gtm.js"}
+            asyncio.run(blocker._on_paused(session_id, params))
+        assert blocker.session.sent == [
+            ("S1", "Fetch.continueRequest", "r1"),
+            ("S1", "Fetch.failRequest", "r2"),
+            ("S1", "Fetch.failRequest", "r3"),
+            ("S2", "Fetch.failRequest", "r4"),
+        ]
+    finally:
+        with bu.progress_condition:
+            bu.task_progress.pop("test-blocker", None)
@@ -0,0 +1,37 @@
+import os
+
+import bu
+
+
+def test_segment_frame_count(monkeypatch):
+    monkeypatch.setattr(bu, "SPRITE_SEGMENT_FRAMES", 10)
+    manifest = {"numbers": [1, 2, 3, 5, 6, 7, 8, 9, 10, 11, 12]}
+    assert list(bu.segment_frame_numbers(1)) == list(range(11, 21))
+    # Frame 4 is missing: the first segment is not complete
+    assert bu.segment_frame_count(manifest, 0) == 9
+    assert bu.segment_frame_count(manifest, 1) == 2
+    assert bu.segment_frame_count(manifest, 2) == 0
+
+
+def test_record_task_frame_lists_frames_in_number_order(tmp_path, monkeypatch):
+    import threading
+
+    task_id = "test-frames"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bu, "reserve_task_frame_bytes", lambda task_id, nbytes: True)
+    monkeypatch.setattr(bu, "schedule_frame_preview", lambda task_id, number, image_data: None)
+
+    threads = [
+        threading.Thread(target=bu.record_task_frame, args=(task_id, b"frame %d" % i)) for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    manifest = bu.get_task_manifest(task_id)
+    try:
+        assert manifest["numbers"] == list(range(1, 21))
+        assert sorted(os.listdir(tmp_path / task_id)) == sorted(f"screenshot_{n}.png" for n in range(1, 21))
+    finally:
+        bu.drop_task_manifest(task_id)
@@ -0,0 +1,76 @@
+import pytest
+
+import bu
+
+
+@pytest.fixture
+def task(monkeypatch):
+    task_id = "test-task"
+    monkeypatch.setattr(bu, "TASK_MAX_TOKENS", 0)
+    monkeypatch.setattr(bu, "TASK_MAX_SECONDS", 0)
+    yield task_id
+    bu.task_budgets.pop(task_id, None)
+    with bu.progress_condition:
+        bu.task_progress.pop(task_id, None)
+
+
+def test_parse_task_budget():
+    assert bu.parse_task_budget({"max_tokens": 1000.0, "max_seconds": 30}) == {
+        "max_tokens": 1000,
+        "max_seconds": 30.0,
+    }
+    assert bu.parse_task_budget({}) == {}
+    for budget in ([], {"max_steps": 3}, {"max_tokens": -1}, {"max_seconds": True}, {"max_tokens": "10"}):
+        with pytest.raises(ValueError):
+            bu.parse_task_budget(budget)
+
+
+def test_check_task_budget(task, monkeypatch):
+    assert bu.check_task_budget(task) is None
+
+    bu.task_budgets[task] = bu.parse_task_budget({"max_tokens": 100, "max_seconds": 60})
+    clock = [1000.0]
+    monkeypatch.setattr(bu.time, "monotonic", lambda: clock[0])
+    bu.start_task_budget(task)
+    with bu.progress_condition:
+        progress = bu._get_task_progress(task)
+        progress["steps"] = 500
+    assert bu.check_task_budget(task) is None
+
+    clock[0] += 60
+    assert bu.check_task_budget(task) == "seconds"
+
+    with bu.progress_condition:
+        progress["input_tokens"], progress["output_tokens"] = 80, 20
+        assert bu.summarize_task_budget(task, progress)["limits"] == {"max_tokens": 100, "max_seconds": 60.0}
+    assert bu.check_task_budget(task) == "tokens"
+
+
+class FakeModel:
+    def __init__(self, model):
+        self.model = model
+
+
+def test_tiers_escalate_on_llm_failure_or_repeated_failed_steps():
+    switches = []
+    llm = bu.TieredChatModel(
+        [FakeModel("small"), FakeModel("large")],
+        cooldown_steps=2,
+        escalate_after_failures=2,
+        on_change=lambda tier, model, reason: switches.append((model, reason)),
+    )
+
+    llm.record_step(False)
+    llm.record_step(True)
+    llm.record_step(False)
+    assert llm.model == "small"
+
+    llm.record_step(False)
+    assert llm.model == "large"
+
+    llm.record_step(True)
+    llm.record_step(True)
+    assert llm.model == "small"
+
+    llm.record_step(False, llm_failed=True)
+    assert [model for model, _ in switches] == ["large", "small", "large"]
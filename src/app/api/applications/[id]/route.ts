@@ -87,32 +87,37 @@ export async function GET(
             // Try local Flask server first
             const FLASK_SERVER_URL = process.env.FLASK_SERVER_URL || "http://localhost:3001";
 
-            // Check if task exists in Flask server
-            const taskStatusResponse = await fetch(`${FLASK_SERVER_URL}/api/task-ready/${application.taskId}`, {
-                method: "GET",
+            // One compact status row per poll from the bulk endpoint
+            const taskStatusResponse = await fetch(`${FLASK_SERVER_URL}/task-status`, {
+                method: "POST",
                 headers: {
                     "Content-Type": "application/json",
                 },
+                body: JSON.stringify({ ids: [application.taskId] }),
             });
+            const taskRow = taskStatusResponse.ok
+                ? (await taskStatusResponse.json()).tasks?.[0]
+                : null;
 
-            if (taskStatusResponse.ok) {
+            if (taskRow) {
                 // Task exists in local Flask server
-                const taskStatus = await taskStatusResponse.json();
-                status = taskStatus.status || (taskStatus.ready ? "running" : "starting");
-
-                // Get task status from Flask server
-                const taskStatusEndpoint = await fetch(`${FLASK_SERVER_URL}/task-status/${application.taskId}`, {
-                    method: "GET",
-                    headers: {
-                        "Content-Type": "application/json",
-                    },
-                });
-
-                if (taskStatusEndpoint.ok) {
-                    const taskData = await taskStatusEndpoint.json();
-                    output = taskData.result || taskData.message || null;
-                    isSuccess = taskData.status === "completed" ? true : (taskData.status === "failed" ? false : null);
-                    status = taskData.status || status;
+                status = taskRow.status || "starting";
+                output = taskRow.message || null;
+                isSuccess = taskRow.status === "completed" ? true : (taskRow.status === "failed" ? false : null);
+
+                // The full status only once there is an agent result to show
+                if (taskRow.has_result) {
+                    const taskStatusEndpoint = await fetch(`${FLASK_SERVER_URL}/task-status/${application.taskId}`, {
+                        method: "GET",
+                        headers: {
+                            "Content-Type": "application/json",
+                        },
+                    });
+
+                    if (taskStatusEndpoint.ok) {
+                        const taskData = await taskStatusEndpoint.json();
+                        output = taskData.result || taskData.message || null;
+                    }
                 }
 
                 // Generate URLs for local Flask server viewer
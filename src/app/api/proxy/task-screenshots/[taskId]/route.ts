@@ -16,7 +16,7 @@ export async function GET(
             );
         }
 
-        const response = await fetch(`${FLASK_SERVER_URL}/api/task-screenshots/${taskId}`, {
+        const response = await fetch(`${FLASK_SERVER_URL}/api/task-screenshots/${taskId}${req.nextUrl.search}`, {
             method: "GET",
             headers: {
                 "Content-Type": "application/json",
@@ -0,0 +1,42 @@
+import { NextRequest, NextResponse } from "next/server";
+
+const FLASK_SERVER_URL = process.env.FLASK_SERVER_URL || "http://localhost:3001";
+
+// Bulk status for many tasks in one round trip: { ids: string[], since?: number }
+export async function POST(req: NextRequest) {
+    try {
+        const body = await req.json().catch(() => ({}));
+
+        if (body.ids !== undefined && !Array.isArray(body.ids)) {
+            return NextResponse.json(
+                { error: "ids must be an array of task IDs" },
+                { status: 400 }
+            );
+        }
+
+        const response = await fetch(`${FLASK_SERVER_URL}/task-status`, {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ ids: body.ids, since: body.since ?? 0 }),
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            return NextResponse.json(
+                { error: errorData.error || "Failed to get task statuses" },
+                { status: response.status }
+            );
+        }
+
+        const data = await response.json();
+        return NextResponse.json(data);
+    } catch (error) {
+        console.error("Error proxying bulk task-status request:", error);
+        return NextResponse.json(
+            { error: "Failed to get task statuses" },
+            { status: 500 }
+        );
+    }
+}
@@ -95,7 +95,7 @@ export function LiveAutomationViewer({
     // Check for available screenshots
     const checkScreenshots = useCallback(async () => {
         try {
-            const response = await fetch(`/api/proxy/task-screenshots/${taskId}`);
+            const response = await fetch(`/api/proxy/task-screenshots/${taskId}?limit=1`);
             const data = await response.json();
             setHasScreenshots(data.screenshots && data.screenshots.length > 0);
         } catch (err) {